@@ -7,13 +7,16 @@ Created on Wed Jul 27 15:42:45 2016
 
 import os
 import numpy as np
-import scipy.signal as sig
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib import gridspec
 from glob import glob
 
 import emapex
+import float_store as fst
+import batch_interp as bi
+import large_eddy_method as lem
+import profile_spectra as ps
 import misc_data_processing as mdp
 from my_savefig import my_savefig
 
@@ -31,8 +34,8 @@ wfi_files = glob(os.path.join(psdir, '*wfi*.p'))
 N2_files = glob(os.path.join(psdir, '*N2_ref*200dbar.p'))
 Floats = []
 for floatID in emapex.FIDS_DIMES:
-    load_file = emapex.find_file(floatID)
-    Float = emapex.EMApexFloat(load_file, floatID, verbose=False)
+    Float = fst.load(floatID, apply_w=False, apply_strain=False,
+                     apply_iso=False, verbose=False)
 
     # Ugly and probably unnecessary but should work as a check...
     if any(str(floatID) in wfi_file for wfi_file in wfi_files):
@@ -80,26 +83,19 @@ for Float in Floats:
         continue
 
     t = np.arange(tmin, tmax, dt)
-    ng, __, pt = Float.get_interp_grid(hpids, t, 'dUTC', 'P')
-
-    PPts = []
-
-    for i in ng[0, :]:
-        f, PPt = sig.periodogram(pt[:, i], fs=1./dt, window=window)
-        PPts.append(PPt)
-
-    PPts = np.asarray(PPts).T
+    f, PPts, PPmed = ps.get_spectra(Float, hpids, t, 'dUTC', 'P',
+                                    window=window, quantiles=50.)
 
     # Chop interpolation noise.
     fuse = f < 1./tres
 #    muse = m < 1./zres
-    f, PPts = f[fuse], PPts[fuse, :]
+    f, PPts, PPmed = f[fuse], PPts[fuse, :], PPmed[fuse]
 #    m, Pzs = m[muse], Pzs[muse, :]
-    PPts[0, :] = 0.
+    PPts[0, :], PPmed[0] = 0., 0.
 
     fig, axs = plt.subplots(2, 1, sharex='col', figsize=(3.125, 5))
 #    axs[0].loglog(1./f, np.median(Pts, axis=-1), linewidth=3., alpha=0.7)
-    axs[1].loglog(1./f, np.median(PPts, axis=-1), linewidth=3., alpha=0.7)
+    axs[1].loglog(1./f, PPmed, linewidth=3., alpha=0.7)
     axs[1].set_xlim(1e1, 1e4)
 
     axs[0].set_ylabel('Vertical kinetic energy')
@@ -131,7 +127,7 @@ for Float in Floats:
 
     __, idxs = Float.get_profiles(hpids, ret_idxs=True)
 
-    VKE, __, = mdp.w_scales_float(Float, hpids, xvar, x, width=width, lc=lc,
+    VKE, __, = lem.w_scales_float(Float, hpids, xvar, x, width=width, lc=lc,
                                   c=1, btype=btype, we=we, ret_noise=False)
 
     ieps = 0.*np.zeros_like(idxs)
@@ -141,11 +137,8 @@ for Float in Floats:
         __, __, X = Float.get_interp_grid(hpids, x, 'dUTC', 'dist_ctd')
     if xvar == 'eheight' or xvar == 'timeeheight':
         __, __, it = Float.get_interp_grid(hpids, x, 'zw', 'dUTC')
-        iZ = np.zeros_like(it)
-        X = np.zeros_like(it)
-        for i, pfl in enumerate(Float.get_profiles(hpids)):
-            iZ[:, i] = pfl.interp(it[:, i], 'dUTC', 'z')
-            X[:, i] = pfl.interp(it[:, i], 'dUTC', 'dist_ctd')
+        iZ, X = bi.interp_columns(it, Float.dUTC[:, idxs],
+                                  [Float.z[:, idxs], Float.dist_ctd[:, idxs]])
     elif xvar == 'height' or xvar == 'timeheight':
         __, __, iZ = Float.get_interp_grid(hpids, x, 'z', 'z')
         __, __, X = Float.get_interp_grid(hpids, x, 'z', 'dist_ctd')
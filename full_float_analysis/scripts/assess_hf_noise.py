@@ -6,20 +6,23 @@ Created on Mon Oct 10 12:15:02 2016
 """
 
 import numpy as np
-import scipy.signal as sig
-from scipy.io import loadmat
 import matplotlib
 import matplotlib.pyplot as plt
+import multiprocessing as mp
 import os
-import fnmatch
 from my_savefig import my_savefig
 
+import file_catalogue as fcat
+import ctd_spectra as cs
+
 import argparse
 
 # Figure save path.
 fsdir = '../figures/hf_noise'
 if not os.path.exists(fsdir):
     os.makedirs(fsdir)
+# Spectra save path.
+psdir = '../processed_data/hf_noise'
 
 # Universal figure font size.
 matplotlib.rc('font', **{'size': 8})
@@ -29,68 +32,40 @@ parser = argparse.ArgumentParser(
 
 parser.add_argument('--floatID', type=int, help='EM-APEX float ID number')
 parser.add_argument('--dirpath', type=str, help='float data directory')
+parser.add_argument('--processes', type=int, default=mp.cpu_count(),
+                    help='number of processes reading ctd files')
+parser.add_argument('--rebuild', action='store_true',
+                    help='recompute the spectra of every profile')
 args = parser.parse_args()
 
 floatID = args.floatID
 dirpath = args.dirpath
 
-# Find data files.
-ctd_files = []
-searchstr = '*{}*ctd.mat'.format(floatID)
-for root, dirnames, filenames in os.walk(dirpath):
-    for filename in fnmatch.filter(filenames, searchstr):
-        nameparts = filename.split('-')
-        hpid = int(nameparts[2])
-        fullname = os.path.join(root, filename)
-        ctd_files.append(fullname)
-
-np.sort(ctd_files)
-
-Npfls = len(ctd_files)
-
 # Spectra things.
 nperseg = 2**10
-noverlap = nperseg/2
-f = np.abs(np.fft.fftfreq(nperseg)[:nperseg/2+1])
+noverlap = nperseg//2
+dt = 1.  # Interpolation time step.
 dtm = 20.  # Average time step.
+
+# Only the ctd files that are new or have changed since the last run are
+# read, the spectra of the others come from the store. One store per data
+# directory, since a float may have several. Every file is checked, as
+# reprocessing rewrites files in place without touching their directories.
+cat = fcat.open_catalogue(dirpath, check_files=True)
+store_file = os.path.join(psdir, '{}_ctd_spectra.p'.format(
+    os.path.basename(os.path.normpath(dirpath))))
+store = cs.update_store(cat, floatID, store_file, dt, nperseg, noverlap,
+                        processes=args.processes, rebuild=args.rebuild,
+                        verbose=True)
+
+f = store.f
 use = (f < 1./dtm) & (f > 0)
 f = f[use]
-Nfreqs = f.size
-
-# Initialise arrays.
-PP = np.NaN*np.zeros((Nfreqs, Npfls))
-Pwf = np.NaN*np.zeros_like(PP)
-hpid = np.NaN*np.zeros((Npfls,))
-
-for i, ctd_file in enumerate(ctd_files):
-    data = loadmat(ctd_file, squeeze_me=True)
-
-    nout_ctd = data['nout_ctd']
-
-    if nout_ctd < 3:  # Not enough data.
-        continue
-
-    UXT = data['UXT']
-    P = data['P']
-#    S = data['S']
-    hpid[i] = data['hpid']
-#    T = data['T']
-#    ctdtime = data['ctdtime']
-#    pcb = data['pcb']
-#    pca = data['pca']
-
-    wf = -np.gradient(P)/np.gradient(UXT)
-
-    dt = 1.
-    UXTi = np.arange(UXT[0], UXT[-1], dt)
-    Pi = np.interp(UXTi, UXT, P)
-    wfi = np.interp(UXTi, UXT, wf)
-
-    __, PPi = sig.welch(Pi, nperseg=nperseg, noverlap=noverlap)
-    __, Pwfi = sig.welch(wfi, nperseg=nperseg, noverlap=noverlap)
 
-    PP[:, i] = PPi[use]
-    Pwf[:, i] = Pwfi[use]
+PP, hpid = store.matrix('PP')
+Pwf, __ = store.matrix('Pwf')
+PP = PP[use]
+Pwf = Pwf[use]
 
 # %%
 
@@ -6,13 +6,41 @@ Created on Mon Oct 10 15:48:44 2016
 """
 
 import os
+import argparse
+import job_runner as jr
 
 
+parser = argparse.ArgumentParser(
+    description='Assess pressure sensor noise on all floats.')
+parser.add_argument('--workers', type=int, default=4,
+                    help='number of floats processed at once')
+parser.add_argument('--processes', type=int, default=1,
+                    help='number of processes reading the files of each float')
+parser.add_argument('--rebuild', action='store_true',
+                    help='recompute the spectra of every profile')
+parser.add_argument('--resume', action='store_true',
+                    help='skip floats finished by an interrupted run')
+args = parser.parse_args()
+
 d = '/noc/soes/physics/jc3e13/DIMES/EM-APEX'
 dirpaths = [os.path.join(d,o) for o in os.listdir(d) if os.path.isdir(os.path.join(d,o))]
 
+# Every float is run after each data delivery, the spectra stores make this
+# cheap for profiles that were processed before.
+jobs = []
 for dirpath in dirpaths:
     floatID = os.path.basename(dirpath)[:4]
-    command = "python assess_hf_noise.py --floatID " + floatID + " --dirpath " + dirpath + " &"
-    print(command)
-    os.system(command)
+    script_args = ['--floatID', floatID, '--dirpath', dirpath,
+                   '--processes', str(args.processes)]
+    if args.rebuild:
+        script_args.append('--rebuild')
+    jobs.append(jr.python_job("hf_noise_{}".format(os.path.basename(dirpath)),
+                              'assess_hf_noise.py', script_args))
+
+log_dir = '../logs/hf_noise'
+status_file = os.path.join(log_dir, 'status.json')
+if not args.resume and os.path.exists(status_file):
+    os.remove(status_file)
+
+jr.run_jobs(jobs, workers=args.workers, log_dir=log_dir,
+            status_file=status_file, skip_existing=True)
@@ -9,10 +9,11 @@ import argparse
 import os
 import numpy as np
 import matplotlib
-import fnmatch
 from scipy.io import loadmat
 
-import emapex
+import file_catalogue as fcat
+import float_store as fst
+import steady_flight as sf
 import vertical_velocity_fitter as vvf
 
 # Figure save path.
@@ -28,10 +29,12 @@ matplotlib.rc('font', **{'size': 8})
 
 parser = argparse.ArgumentParser(description='Run w fitting on a float.')
 parser.add_argument('--floatID', type=int, help='EM-APEX float ID number')
+parser.add_argument('--processes', type=int, default=None,
+                    help='bootstrap worker processes, default all cores')
 args = parser.parse_args()
 
-Float = emapex.load(args.floatID, apply_w=False, apply_strain=False,
-                    apply_iso=False, verbose=False)
+Float = fst.load(args.floatID, apply_w=False, apply_strain=False,
+                 apply_iso=False, verbose=False)
 
 # %% Test
 profiles = 'updown'
@@ -41,28 +44,10 @@ floatfolder = str(Float.floatID) + 'a'
 dirpath = os.path.join(basepath, floatfolder)
 
 print('Searching for mission file.')
-filesdict = {}
-mis_file = None
-single_mis_file = False
-searchstr = '*{}*mis.mat'.format(Float.floatID)
-for root, dirnames, filenames in os.walk(dirpath):
-    for filename in fnmatch.filter(filenames, searchstr):
-        nameparts = filename.split('-')
-
-        try:
-            hpid = int(nameparts[2])
-        except ValueError:
-            if nameparts[2] == 'mis.mat':
-                single_mis_file = True
-                mis_file = os.path.join(root, filename)
-                continue
-
-        filetype = nameparts[3].split('.')[0]
-        fullname = os.path.join(root, filename)
-        if hpid in filesdict.keys():
-            filesdict[hpid][filetype] = fullname
-        else:
-            filesdict[hpid] = {filetype: fullname}
+cat = fcat.open_catalogue(dirpath)
+mis_file = cat.get(Float.floatID, None, 'mis')
+single_mis_file = mis_file is not None
+mis_files = cat.files(Float.floatID, 'mis')
 
 # Initial parameters
 V_0 = 2.62e-2
@@ -77,8 +62,7 @@ if single_mis_file:
     ppos_0 = mis['PistonParkPosition'][0]
     M = mis['FloatMass'][0]/1000.
 else:
-    key0 = filesdict.keys()[0]
-    mis = loadmat(filesdict[key0]['mis'], squeeze_me=True)
+    mis = loadmat(mis_files[min(mis_files)], squeeze_me=True)
 
     alpha_p = -mis['FloatAlpha']
     p_0 = mis['PressureBallastPoint']
@@ -114,8 +98,8 @@ if profiles == 'updown':
     p0 = np.array([V_0, CA, CA, alpha_p, p_0, alpha_ppos, ppos_0, M])
     pfixed = [V_0, None, None, None, None, None, None, M]
 
-wfi = vvf.fitter(Float, p0, pfixed, profiles=profiles, save_name=save_name,
-                 N_bootstrap=200, method='Nelder-Mead')
+wfi = sf.fitter(Float, p0, pfixed, profiles=profiles, save_name=save_name,
+                N_bootstrap=200, method='trf', processes=args.processes)
 print("Fitting completed, starting assessment.")
 
 Float.apply_w_model(wfi)
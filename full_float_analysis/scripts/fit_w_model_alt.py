@@ -9,7 +9,8 @@ import os
 import argparse
 import numpy as np
 import matplotlib
-import emapex
+import float_store as fst
+import steady_flight as sf
 import vertical_velocity_fitter as vvf
 
 # Figure save path.
@@ -25,10 +26,14 @@ matplotlib.rc('font', **{'size': 8})
 
 parser = argparse.ArgumentParser(description='Run w fitting on a float.')
 parser.add_argument('--floatID', type=int, help='EM-APEX float ID number')
+parser.add_argument('--processes', type=int, default=None,
+                    help='bootstrap worker processes, default all cores')
+parser.add_argument('--incremental', action='store_true',
+                    help='update an existing fit with new profiles')
 args = parser.parse_args()
 
-Float = emapex.load(args.floatID, apply_w=False, apply_strain=False,
-                    apply_iso=False, verbose=False)
+Float = fst.load(args.floatID, apply_w=False, apply_strain=False,
+                 apply_iso=False, verbose=False)
 
 
 # %% Test
@@ -138,8 +143,14 @@ if profiles == 'updown':
     p0 = np.array([V_0, CA, CA, alpha_p, p_0, alpha_ppos, ppos_0, M])
     pfixed = [None, None, None, None, p_0, None, ppos_0, M]
 
-wfi = vvf.fitter(Float, p0, pfixed, profiles=profiles, save_name=save_name,
-                 N_bootstrap=200, method='Nelder-Mead')
+if args.incremental and os.path.exists(save_name):
+    print('Updating existing fit {}.'.format(save_name))
+    wfi = sf.refit(Float, save_name, hpids=hpids, save_name=save_name,
+                   processes=args.processes)
+else:
+    wfi = sf.fitter(Float, p0, pfixed, profiles=profiles, hpids=hpids,
+                    save_name=save_name, N_bootstrap=200, method='trf',
+                    processes=args.processes)
 print("Fitting completed, starting assessment.")
 
 Float.apply_w_model(wfi)
@@ -6,10 +6,29 @@ Created on Thu Jul 21 14:36:44 2016
 """
 
 import os
+import argparse
+import multiprocessing as mp
 import emapex
+import job_runner as jr
 
 
+parser = argparse.ArgumentParser(description='Run w fitting on all floats.')
+parser.add_argument('--workers', type=int, default=4,
+                    help='number of floats fitted at once')
+parser.add_argument('--force', action='store_true',
+                    help='refit floats that already have a fit')
+args = parser.parse_args()
+
+psdir = '../processed_data/'
+# Share the cores between the bootstraps of the floats running at once.
+processes = max(1, mp.cpu_count()//args.workers)
+
+jobs = []
 for floatID in emapex.FIDS_DIMES:
-    command = 'python fit_w_model_alt.py --floatID ' + str(floatID) + ' &'
-    print(command)
-    os.system(command)
+    wfi_file = os.path.join(psdir, "{}_wfi.p".format(floatID))
+    jobs.append(jr.python_job("fit_w_{}".format(floatID), 'fit_w_model_alt.py',
+                              ['--floatID', floatID, '--processes', processes],
+                              outputs=[wfi_file]))
+
+jr.run_jobs(jobs, workers=args.workers, log_dir='../logs/fit_w_model',
+            skip_existing=not args.force)
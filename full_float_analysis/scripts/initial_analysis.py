@@ -12,7 +12,7 @@ import matplotlib.pyplot as plt
 from glob import glob
 from scipy import io
 
-import emapex
+import float_store as fst
 import utils
 from my_savefig import my_savefig
 
@@ -37,8 +37,8 @@ for ufid in ufids:
     print("{}".format(ufid))
 
 for ufid in ufids:
-    Float = emapex.load(ufid, apply_w=False, apply_strain=False,
-                        apply_iso=False)
+    Float = fst.load(ufid, apply_w=False, apply_strain=False,
+                     apply_iso=False)
 
     UTC = Float.UTC.flatten(order='F')
     UTC[UTC < 733774.] = np.NaN
@@ -39,43 +39,52 @@ def float_volume(p, k, V0=2.62e-2, alpha_p=3.6e-6, p0=2000., alpha_k=1.2e-6,
     return V0*(1 - alpha_p*(p - p0) + alpha_k*(k - k0))
 
 
-def w_cost(w, wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A):
+def w_residual(w, wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho,
+               C_D, A):
+    """Imbalance of forces on the float for water velocity w."""
     V = float_volume(p, k, V0, alpha_p, p0, alpha_k, k0)
     accel = M*dwfdt
     buoy = g*(M - rho*V)
     drag = rho*C_D*A*(wf - w)*np.abs(wf - w)
-    return (accel - buoy + drag)**2
-
-
-def calc_w(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A):
-    wf_ = wf.flatten()
-    p_ = p.flatten()
-    k_ = k.flatten()
-    dwfdt_ = dwfdt.flatten()
-    g_ = g.flatten()
-    rho_ = rho.flatten()
-    w_ = np.full_like(p_, np.nan)
-    ni = len(w_)
-
-    for i in range(ni):
-        if np.isnan(dwfdt_[i]):
-            continue
+    return accel - buoy + drag
 
-        args = (wf_[i], p_[i], k_[i], V0, alpha_p, p0, alpha_k, k0, M,
-                dwfdt_[i], g_[i], rho_[i], C_D, A)
-        res = opt.minimize(w_cost, 0., args=args, method='Nelder-Mead')
-        w_[i] = res.x
 
-    return w_.reshape(p.shape)
+def w_cost(w, wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A):
+    return w_residual(w, wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g,
+                      rho, C_D, A)**2
 
 
-def calc_w_2(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A):
+def calc_w(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A):
+    """Water vertical velocity for every sample at once.
+
+    The drag term is quadratic in (wf - w) so the force balance can be solved
+    exactly. Writing u = wf - w, u|u| = (buoy - accel)/(rho*C_D*A) =: q and
+    u = sign(q)*sqrt(|q|). All arguments broadcast against each other, C_D
+    may be an array (e.g. different up and down drag). Samples where dwfdt is
+    NaN are returned as NaN.
+    """
+    V = float_volume(p, k, V0, alpha_p, p0, alpha_k, k0)
+    accel = M*dwfdt
+    buoy = g*(M - rho*V)
+    q = (buoy - accel)/(rho*C_D*A)
+    w = wf - np.sign(q)*np.sqrt(np.abs(q))
+    w = np.where(np.isnan(dwfdt), np.nan, w)
+    return w.reshape(np.shape(p))
+
+
+def calc_w_2(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A,
+             tol=1e-10, maxiter=50):
+    """Water vertical velocity by batched Newton iteration on the force
+    residual, a numerical check on calc_w. Every sample is an independent
+    equation so the iteration is elementwise rather than using fsolve, which
+    would build a dense (samples x samples) Jacobian."""
     wf_ = wf.flatten()
     p_ = p.flatten()
     k_ = k.flatten()
     dwfdt_ = dwfdt.flatten()
     g_ = g.flatten()
     rho_ = rho.flatten()
+    C_D_ = np.broadcast_to(C_D, np.shape(p)).flatten()
     w_ = np.full_like(p_, np.nan)
 
     nnans = ~np.isnan(dwfdt_)
@@ -86,37 +95,28 @@ def calc_w_2(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D, A):
     dwfdt_ = dwfdt_[nnans]
     g_ = g_[nnans]
     rho_ = rho_[nnans]
+    C_D_ = C_D_[nnans]
 
     args = (wf_, p_, k_, V0, alpha_p, p0, alpha_k, k0, M, dwfdt_, g_, rho_,
-            C_D, A)
+            C_D_, A)
+
+    def dresdw(w, wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho,
+               C_D, A):
+        return -2.*rho*C_D*A*np.abs(wf - w)
+
+    # Start away from w = wf where the derivative vanishes.
     x0 = np.zeros_like(wf_)
-    res = opt.fsolve(w_cost, x0, args=args)
-    w_[nnans] = res.x
+    x0[wf_ == 0.] = 1e-3
+    w_[nnans] = opt.newton(w_residual, x0, fprime=dresdw, args=args, tol=tol,
+                           maxiter=maxiter)
 
     return w_.reshape(p.shape)
 
 
 def calc_w_ud(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho, C_D_u, C_D_d, A, up):
-    wf_ = wf.flatten()
-    p_ = p.flatten()
-    k_ = k.flatten()
-    dwfdt_ = dwfdt.flatten()
-    g_ = g.flatten()
-    rho_ = rho.flatten()
-    w_ = np.full_like(p_, np.nan)
-    C_D = (up*C_D_u + ~up*C_D_d).flatten()
-    ni = len(w_)
-
-    for i in range(ni):
-        if np.isnan(dwfdt_[i]):
-            continue
-
-        args = (wf_[i], p_[i], k_[i], V0, alpha_p, p0, alpha_k, k0, M,
-                dwfdt_[i], g_[i], rho_[i], C_D[i], A)
-        res = opt.minimize(w_cost, 0., args=args, method='Nelder-Mead')
-        w_[i] = res.x
-
-    return w_.reshape(p.shape)
+    C_D = np.where(up, C_D_u, C_D_d)
+    return calc_w(wf, p, k, V0, alpha_p, p0, alpha_k, k0, M, dwfdt, g, rho,
+                  C_D, A)
 
 
 def cost(params, wf, p, k, p0, k0, M, dwfdt, g, rho, A):
@@ -11,6 +11,7 @@ import os
 import numpy as np
 import matplotlib
 import emapex
+import float_store as fst
 import pickle
 import matplotlib.pyplot as plt
 from tabulate import tabulate
@@ -56,7 +57,8 @@ print(tabulate(data_stack, headers, tablefmt='latex', floatfmt='.3g'))
 # %%
 N = 6
 IDS = [4976, 4977, 6478, 6480, 6625, 6626]
-FLOATS = [emapex.EMApexFloat(emapex.find_file(ID), ID) for ID in IDS]
+FLOATS = [fst.load(ID, apply_w=False, apply_strain=False, apply_iso=False)
+          for ID in IDS]
 
 for i in range(N):
     fid = IDS[i]
@@ -70,7 +72,8 @@ E4976, E4977, E6478, E6480, E6625, E6626 = FLOATS
 # %%
 N = 2
 IDS_ = [4596, 4814]
-FLOATS_ALT = [emapex.EMApexFloat(emapex.find_file(ID), ID) for ID in IDS_]
+FLOATS_ALT = [fst.load(ID, apply_w=False, apply_strain=False,
+                       apply_iso=False) for ID in IDS_]
 
 for i in range(N):
     fid = IDS_[i]
@@ -15,7 +15,9 @@ from scipy.integrate import trapz
 from scipy.stats import binned_statistic
 import scipy.signal as sig
 
-import emapex
+import float_store as fst
+import batch_interp as bi
+import large_eddy_method as lem
 import misc_data_processing as mdp
 import TKED_parameterisations as TKED
 import plotting_functions as pf  # my_savefig
@@ -28,9 +30,9 @@ dz = 1.
 try:
     print("Floats {} and {} exist!.".format(E76.floatID, E77.floatID))
 except NameError:
-    E76 = emapex.load(4976)
+    E76 = fst.load(4976)
 #    E76.generate_regular_grids(zmin=zmin, dz=dz)
-    E77 = emapex.load(4977)
+    E77 = fst.load(4977)
 #    E77.generate_regular_grids(zmin=zmin, dz=dz)
 
 # %% Script params.
@@ -99,7 +101,7 @@ for Float, c in zip([E76, E77], cs):
 
     __, idxs = Float.get_profiles(hpids, ret_idxs=True)
 
-    epsilon, kappa, __, noise = mdp.w_scales_float(Float, hpids, xvar, x,
+    epsilon, kappa, __, noise = lem.w_scales_float(Float, hpids, xvar, x,
                                                    width=width, overlap=-1.,
                                                    lc=lc, c=c, btype=btype,
                                                    we=we, ret_noise=True)
@@ -111,11 +113,8 @@ for Float, c in zip([E76, E77], cs):
         __, __, X = Float.get_interp_grid(hpids, x, 'dUTC', 'dist_ctd')
     if xvar == 'eheight' or xvar == 'timeeheight':
         __, __, it = Float.get_interp_grid(hpids, x, 'zw', 'dUTC')
-        iZ = np.zeros_like(it)
-        X = np.zeros_like(it)
-        for i, pfl in enumerate(Float.get_profiles(hpids)):
-            iZ[:, i] = pfl.interp(it[:, i], 'dUTC', 'z')
-            X[:, i] = pfl.interp(it[:, i], 'dUTC', 'dist_ctd')
+        iZ, X = bi.interp_columns(it, Float.dUTC[:, idxs],
+                                  [Float.z[:, idxs], Float.dist_ctd[:, idxs]])
     elif xvar == 'height' or xvar == 'timeheight':
         __, __, iZ = Float.get_interp_grid(hpids, x, 'z', 'z')
         __, __, X = Float.get_interp_grid(hpids, x, 'z', 'dist_ctd')
@@ -538,7 +537,7 @@ for j, (Float, c) in enumerate(zip([E76, E77], cs)):
 
     __, idxs = Float.get_profiles(hpids, ret_idxs=True)
 
-    eps_lem, __, __, noise = mdp.w_scales_float(Float, hpids, xvar, x,
+    eps_lem, __, __, noise = lem.w_scales_float(Float, hpids, xvar, x,
                                                 width=width, overlap=-1.,
                                                 lc=lc, c=c, btype=btype,
                                                 we=we, ret_noise=True)
@@ -15,8 +15,8 @@ from matplotlib import gridspec
 from scipy.integrate import trapz
 import gsw
 
-import emapex
-import TKED_parameterisations as fs
+import float_store as fst
+import large_eddy_method as lem
 import plotting_functions as pf
 import sandwell
 #import window as wdw
@@ -28,9 +28,9 @@ dz = 1.
 try:
     print("Floats {} and {} exist!.".format(E76.floatID, E77.floatID))
 except NameError:
-    E76 = emapex.load(4976)
+    E76 = fst.load(4976)
     E76.generate_regular_grids(zmin=zmin, dz=dz)
-    E77 = emapex.load(4977)
+    E77 = fst.load(4977)
     E77.generate_regular_grids(zmin=zmin, dz=dz)
 
 # %% Script params.
@@ -73,11 +73,11 @@ btype = 'bandpass'
 we = 0.001
 
 epsilon_76, __, ep_noise_76, flag_76 = \
-    fs.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 epsilon_77, __, ep_noise_77, flag_77 = \
-    fs.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 
 epsilon_vmp = UK2_vmp['eps'][0][0][:, 25:30].flatten()
 z_vmp = gsw.z_from_p(UK2_vmp['press'][0][0], UK2_vmp['startlat'][0][0][0])
@@ -139,11 +139,11 @@ btype = 'bandpass'
 we = 0.001
 
 epsilon_76, __, ep_noise_76, flag_76 = \
-    fs.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 epsilon_77, __, ep_noise_77, flag_77 = \
-    fs.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 
 epsilon_vmp = UK2_vmp['eps'][0][0][:, 25:30].flatten()
 z_vmp = gsw.z_from_p(UK2_vmp['press'][0][0], UK2_vmp['startlat'][0][0][0])
@@ -210,11 +210,11 @@ __, __, z_76 = E76.get_interp_grid(hpids, t, 'dUTC', 'z')
 __, __, z_77 = E77.get_interp_grid(hpids, t, 'dUTC', 'z')
 
 epsilon_76, __, ep_noise_76, flag_76 = \
-    fs.w_scales_float(E76, hpids, xvar, t, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E76, hpids, xvar, t, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 epsilon_77, __, ep_noise_77, flag_77 = \
-    fs.w_scales_float(E77, hpids, xvar, t, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E77, hpids, xvar, t, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 
 epsilon_vmp = UK2_vmp['eps'][0][0][:, 25:30].flatten()
 z_vmp_flat = z_vmp[:, 25:30].flatten()
@@ -275,11 +275,11 @@ btype = 'highpass'
 we = 0.001
 
 epsilon_76, __, ep_noise_76, flag_76 = \
-    fs.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 epsilon_77, __, ep_noise_77, flag_77 = \
-    fs.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 
 vmp_pfls = slice(24, 29)
 #vmp_pfls = slice(1, 50)
@@ -347,11 +347,11 @@ btype = 'highpass'
 we = 0.001
 
 epsilon_76, __, ep_noise_76, flag_76 = \
-    fs.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 epsilon_77, __, ep_noise_77, flag_77 = \
-    fs.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 
 epsilon_vmp = UK2_vmp['eps'][0][0][:, 25:30].flatten()
 z_vmp = gsw.z_from_p(UK2_vmp['press'][0][0], UK2_vmp['startlat'][0][0][0])
@@ -445,11 +445,11 @@ btype = 'highpass'
 we = 0.001
 
 epsilon_76, __, ep_noise_76, flag_76 = \
-    fs.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E76, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 epsilon_77, __, ep_noise_77, flag_77 = \
-    fs.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
-                      btype=btype, we=we, ret_noise=True)
+    lem.w_scales_float(E77, hpids, xvar, z, width=width, lc=lc, c=c,
+                       btype=btype, we=we, ret_noise=True)
 
 epsilon_vmp = UK2_vmp['eps'][0][0][:, 25:30].flatten()
 z_vmp = gsw.z_from_p(UK2_vmp['press'][0][0], UK2_vmp['startlat'][0][0][0])
@@ -513,9 +513,9 @@ ax1 = plt.subplot(gs[0])
 
 __, idxs = Float.get_profiles(hpids, ret_idxs=True)
 
-epsilon, kappa = fs.w_scales_float(Float, hpids, xvar, x, width=width,
-                                   lc=lc, c=c, btype=btype, we=we,
-                                   ret_noise=False)
+epsilon, kappa = lem.w_scales_float(Float, hpids, xvar, x, width=width,
+                                    lc=lc, c=c, btype=btype, we=we,
+                                    ret_noise=False)
 
 ieps = 0.*np.zeros_like(idxs)
 
@@ -11,19 +11,19 @@ import scipy.signal as sig
 import matplotlib
 import matplotlib.pyplot as plt
 import gsw
-import emapex
+import float_store as fst
 import TKED_parameterisations as TKED
 import plotting_functions as pf
 import misc_data_processing as mdp
-import window as wdw
+import window_views as wv
 
 
 try:
     print("Floats {} and {} exist!.".format(E76.floatID, E77.floatID))
 except NameError:
-    E76 = emapex.load(4976)
+    E76 = fst.load(4976)
 #    E76.generate_regular_grids(zmin=zmin, dz=dz)
-    E77 = emapex.load(4977)
+    E77 = fst.load(4977)
 #    E77.generate_regular_grids(zmin=zmin, dz=dz)
 
 # %% Script params.
@@ -117,12 +117,9 @@ eps_thorpe = (0.8*thorpe_scales)**2 * Nthorpe**(3./2.)
 
 
 width = 200.
-binned = wdw.window(zw, eps_thorpe, width=width, overlap=0)
-eps_av = np.zeros(len(binned))
-z_av = np.zeros(len(binned))
-for i, (z_, ep_) in enumerate(binned):
-    eps_av[i] = np.trapz(ep_, z_)/width
-    z_av[i] = np.mean(z_)
+z_, ep_, mask = wv.window_views(zw, eps_thorpe, width=width, overlap=0)
+eps_av = wv.window_trapz(ep_, z_, mask)/width
+z_av = wv.window_mean(z_, mask)
 
 # Integrated dissipation from Thorpe
 use = z < -100.
@@ -15,7 +15,7 @@ import gsw
 
 import emapex
 from my_savefig import my_savefig
-import gravity_waves as gw
+import gravity_wave_fields as gwf
 
 try:
     print("Floats {} and {} exist!.".format(E76.floatID, E77.floatID))
@@ -42,20 +42,7 @@ matplotlib.rc('font', **{'size': 9})
 
 
 def w_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    time, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    w = gw.w(x, y, z, time, phi_0, k, l, m, om, N, U=U, V=V, phase_0=phase_0)
-
-    return w
+    return gwf.model_fields(params, data)[2]
 
 
 pfl = E77.get_profiles(26)
@@ -12,7 +12,9 @@ import matplotlib.pyplot as plt
 import gsw
 
 import finescale as fs
-import window as wdw
+import finescale_spectra as fsp
+import gm_tables as gmt
+import window_views as wv
 import GM79
 
 reload(fs)
@@ -65,15 +67,7 @@ default_params = {
     }
 
 
-def sin2taper(L):
-    """A boxcar window that tapers the last 10% of points of both ends using a
-    sin^2 function."""
-    win = np.ones(L)
-    idx10 = int(np.ceil(L/10.))
-    idxs = np.arange(idx10)
-    win[:idx10] = np.sin(np.pi*idxs/(2.*idx10))**2
-    win[-idx10:] = np.cos(np.pi*(idxs + 1 - L)/(2.*idx10))**2
-    return win
+sin2taper = fsp.sin2taper
 
 
 def h_gregg(R=3.):
@@ -226,162 +220,32 @@ def integrated_ps(m, P, m_c, m_0):
     return np.trapz(P_int, x=m_int)
 
 
-def spectral_correction(m, use_range=True, use_diff=True, use_interp=True,
-                        use_tilt=True, use_bin=True, use_volt=True, dzt=8.,
-                        dzr=8., dzfd=8., dzg=8., ddash=5.4, dzs=8., vfi=50.,
-                        mfr=0.12):
-    """
-    Calculates the appropriate transfer function to scale power spectra.
-
-    Parameters
-    ----------
-    m : ndarray
-        Vertical wavenumber. [rad s-1]
-    use_range : boolean, optional (LADCP)
-        Switch for range correction.
-    use_diff : boolean, optional (LADCP)
-        Switch for differencing correction.
-    use_interp : boolean, optional (LADCP/EM-APEX)
-        Switch for interpolation correction.
-    use_tilt : boolean, optional (LADCP)
-        Switch for tilt correction.
-    use_bin : boolean, optional (LADCP)
-        Switch for binning correction.
-    use_volt : boolean, optional (EM-APEX)
-        Switch for voltmeter noise correction.
-    dzt : float, optional (LADCP)
-        Transmitted sound pulse length projected on the vertical. [m]
-    dzr : float, optional (LADCP/EM-APEX)
-        Receiver processing bin length. [m]
-    dzfd : float, optional (LADCP)
-        First-differencing interval. [m]
-    dzg : float, optional (LADCP/EM-APEX)
-        Interval of depth grid onto which single-ping piecewise-linear
-        continuous profiles of vertical shear are binned. [m]
-    ddash : float, optional (LADCP)
-        ?
-    dzs : float, optional (LADCP)
-        Superensemble pre-averaging interval, usually chosen to be dzg. [m]
-    vfi : float, optional (EM-APEX)
-        ? [s-1]
-    mfr : float, optional (EM-APEX)
-        ? [m s-1]
-
-    Returns
-    -------
-    T : ndarray
-        Transfer function, which is the product of all of the individual
-        transfer functions for each separate spectral correction.
-
-
-    Notes
-    -----
-    Spectral corrections for LADCP data - see Polzin et. al. 2002.
-
-    There is another possible correction which isn't used.
-
-    Notes from MATLAB code
-    ----------------------
-
-    A quadratic fit to the range maxima (r_max) pairs given by Polzin et al.
-    (2002) yields.
-
-    ddash = -1.2+0.0857r_max - 0.000136r_max^2 ,
-
-    which has an intercept near r_max = 14 m. It should be noted that
-    expressions (4) and (5) are semi-empirical and apply strictly only to the
-    data set of Polzin et al. (2002). Estimating r_max ? 255 m as the range at
-    which 80% of all ensembles have valid velocities yields d? ? 11.8 m in case
-    of this data set (i.e as in Thurherr 2011 NOT DIMES - need to update!!).
-    ddash is determined empirically by Polzin et al. (2002) and is dependent
-    on range and the following assumptions:
-        Small tilts (~ 3 deg).
-        Instrument tilt and orientation are constant over measurement period.
-        Instrument tilt and orientation are independent.
-        Tilt attenuation is limited by bin-mapping capabilities of RDI (1996)
-        processing.
-
-    """
-
-    pi2 = np.pi*2
-
-    # Range averaging.
-    if use_range:
-        T_range = np.sinc(m*dzt/pi2)**2 * np.sinc(m*dzr/pi2)**2
-    else:
-        T_range = 1.
-
-    # First differencing.
-    if use_diff:
-        T_diff = np.sinc(m*dzfd/pi2)**2
-    else:
-        T_diff = 1.
-
-    # Interpolation.
-    if use_interp:
-        T_interp = np.sinc(m*dzr/pi2)**4 * np.sinc(m*dzg/pi2)**2
-    else:
-        T_interp = 1.
+spectral_correction = fsp.spectral_correction
 
-    # Tilting.
-    if use_tilt:
-        T_tilt = np.sinc(m*ddash/pi2)**2
-    else:
-        T_tilt = 1.
-
-    # Binning
-    if use_bin:
-        T_bin = np.sinc(m*dzg/pi2)**2 * np.sinc(m*dzs/pi2)**2
-    else:
-        T_bin = 1.
-
-    # Voltmeter
-    if use_volt:
-        T_volt = 1./np.sinc(m*vfi*mfr/pi2)
-    else:
-        T_volt = 1.
-
-    T = T_range*T_diff*T_interp*T_tilt*T_bin*T_volt
 
-    return T
+def window_ps(dz, U, V, dUdz, dVdz, strain, N2_ref, mask=None,
+              params=default_params):
+    """Calculate the power spectra for a window of data, or for many windows
+    at once if the variables are 2D (n_windows, window_len) with a mask of
+    valid points, as returned by window_views. Each variable is transformed
+    once."""
 
+    single = np.ndim(U) == 1
 
-def window_ps(dz, U, V, dUdz, dVdz, strain, N2_ref, params=default_params):
-    """Calculate the power spectra for a window of data."""
-
-    # Normalise the shear by the mean buoyancy frequency.
-    ndUdz = dUdz/np.mean(np.sqrt(N2_ref))
-    ndVdz = dVdz/np.mean(np.sqrt(N2_ref))
-
-    # Compute the (co)power spectral density.
-    m, PdU, PdV, PdUdV = coperiodogram(ndUdz, ndVdz, fs=1./dz,
-                                       **params['periodogram_params'])
-    # We only really want the cospectrum for shear so the next two lines are
-    # something of a hack where we ignore unwanted output.
-    __, PU, PV, __ = coperiodogram(U, V, fs=1./dz,
-                                   **params['periodogram_params'])
-    __, Pstrain, __, __ = coperiodogram(strain, U, fs=1./dz,
-                                        **params['periodogram_params'])
-
-    # Clockwise and counter clockwise spectra.
-    PCW = CW_ps(PdU, PdV, PdUdV)
-    PCCW = CCW_ps(PdU, PdV, PdUdV)
-    # Shear spectra.
-    Pshear = PdU + PdV
+    m, Pshear, Pstrain, PCW, PCCW, PEK = \
+        fsp.window_spectra(dz, U, V, dUdz, dVdz, strain, N2_ref, mask,
+                           **params['periodogram_params'])
 
     if params['apply_corrections']:
         T = spectral_correction(m, **params['corrections'])
-        PCW /= T
-        PCCW /= T
-        Pshear /= T
-        PU /= T
-        PV /= T
+        for P in (Pshear, PCW, PCCW, PEK):
+            P /= T
 
         if params['print_diagnostics']:
             print("T = {}".format(T))
 
-    # Kinetic energy spectra.
-    PEK = (PU + PV)/2.
+    if single:
+        return m, Pshear[0], Pstrain[0], PCW[0], PCCW[0], PEK[0]
 
     return m, Pshear, Pstrain, PCW, PCCW, PEK
 
@@ -414,80 +278,72 @@ def analyse(z, U, V, dUdz, dVdz, strain, N2_ref, lat, params=default_params):
         axs[3].set_xlabel(r'$\xi_z$ (-)')
 
     # Split varables into overlapping window segments, bare in mind the last
-    # window may not be full.
+    # windows may not be full. Where they are not the mask is False.
     width = params['bin_width']
     overlap = params['bin_overlap']
-    wdws = [wdw.window(z, x, width=width, overlap=overlap) for x in X]
-
-    n = wdws[0].shape[0]
-    z_mean = np.empty(n)
-    EK = np.empty(n)
-    R_pol = np.empty(n)
-    R_om = np.empty(n)
-    epsilon = np.empty(n)
-    kappa = np.empty(n)
+    wz, wX, mask = wv.window_views(z, X, width=width, overlap=overlap)
 
-    for i, w in enumerate(zip(*wdws)):
-
-        # This takes the z values from the horizontal velocity.
-        wz = w[0][0]
-        z_mean[i] = np.mean(wz)
-        # This (poor code) removes the z values from windowed variables.
-        w = [var[1] for var in w]
-        N2_mean = np.mean(w[-1])
-        N_mean = np.sqrt(N2_mean)
+    n = wz.shape[0]
+    z_mean = wv.window_mean(wz, mask)
+    N2_mean = wv.window_mean(wX[-1], mask)
+    N_mean = np.sqrt(N2_mean)
 
-        # Get the useful power spectra.
-        m, PCW, PCCW, Pshear, Pstrain, PEK = \
-            window_ps(params['dz'], *w, params=params)
+    # Get the useful power spectra of all windows at once.
+    m, Pshear, Pstrain, PCW, PCCW, PEK = \
+        window_ps(params['dz'], *wX, mask=mask, params=params)
 
-        # Integrate the spectra.
-        I = [integrated_ps(m, P, params['m_c'], params['m_0'])
-             for P in [Pshear, Pstrain, PCW, PCCW, PEK]]
+    # Integrate the spectra.
+    I = [fsp.band_integral(m, P, params['m_c'], params['m_0'])
+         for P in [Pshear, Pstrain, PCW, PCCW, PEK]]
 
-        Ishear, Istrain, ICW, ICCW, IEK = I
+    Ishear, Istrain, ICW, ICCW, IEK = I
 
-        # Garrett-Munk shear power spectral density normalised.
-        GMshear = GM79.E_she_z(2*np.pi*m, N_mean)/N_mean
+    # Garrett-Munk shear power spectral density normalised, interpolated from
+    # a table for all windows at once.
+    GMshear_table = gmt.get_table(GM79.E_she_z, m, 2*np.pi, params['m_0'],
+                                  params['m_c'])
+    IGMshear = GMshear_table.integral(N_mean, N_power=1)
 
-        IGMshear = integrated_ps(m, GMshear, params['m_c'], params['m_0'])
+    EK = IEK
+    R_pol = ICCW/ICW
+    R_om = Ishear/Istrain
+    epsilon = GM79.epsilon_0*N2_mean/GM79.N_0**2*Ishear**2/IGMshear**2
+    # Apply correcting factors
 
-        EK[i] = IEK
-        R_pol[i] = ICCW/ICW
-        R_om[i] = Ishear/Istrain
-        epsilon[i] = GM79.epsilon_0*N2_mean/GM79.N_0**2*Ishear**2/IGMshear**2
-        # Apply correcting factors
+    epsilon *= L(gsw.f(lat), N_mean)*h_gregg(R_om)
 
-        epsilon[i] *= L(gsw.f(lat), N_mean)*h_gregg(R_om[i])
+    kappa = params['mixing_efficiency']*epsilon/N2_mean
 
-        kappa[i] = params['mixing_efficiency']*epsilon[i]/N2_mean
+    for i in range(n):
 
         if params['print_diagnostics']:
-            print("Ishear = {}".format(Ishear))
-            print("IGMshear = {}".format(IGMshear))
+            print("Ishear = {}".format(Ishear[i]))
+            print("IGMshear = {}".format(IGMshear[i]))
             print("lat = {}. f = {}.".format(lat, gsw.f(lat)))
-            print("N_mean = {}".format(N_mean))
+            print("N_mean = {}".format(N_mean[i]))
             print("R_om = {}".format(R_om[i]))
-            print("L = {}".format(L(gsw.f(lat), N_mean)))
+            print("L = {}".format(L(gsw.f(lat), N_mean[i])))
             print("h = {}".format(h_gregg(R_om[i])))
 
         # Plotting here generates a crazy number of plots.
         if params['plot_spectra']:
 
-            GMstrain = GM79.E_str_z(2*np.pi*m, N_mean)
-            GMvel = GM79.E_vel_z(2*np.pi*m, N_mean)
+            GMshear = GMshear_table.spectrum(N_mean[i], N_power=1)
+            GMstrain = gmt.get_table(GM79.E_str_z, m,
+                                     2*np.pi).spectrum(N_mean[i])
+            GMvel = gmt.get_table(GM79.E_vel_z, m, 2*np.pi).spectrum(N_mean[i])
 
             fig, axs = plt.subplots(4, 1, sharex=True)
 
-            axs[0].loglog(m, PEK, 'k-', label="$E_{KE}$")
+            axs[0].loglog(m, PEK[i], 'k-', label="$E_{KE}$")
             axs[0].loglog(m, GMvel, 'k--', label="GM $E_{KE}$")
             axs[0].set_title("height {:1.0f} m".format(z_mean[i]))
-            axs[1].loglog(m, Pshear, 'k-', label="$V_z$")
+            axs[1].loglog(m, Pshear[i], 'k-', label="$V_z$")
             axs[1].loglog(m, GMshear, 'k--', label="GM $V_z$")
-            axs[2].loglog(m, Pstrain, 'k', label=r"$\xi_z$")
+            axs[2].loglog(m, Pstrain[i], 'k', label=r"$\xi_z$")
             axs[2].loglog(m, GMstrain, 'k--', label=r"GM $\xi_z$")
-            axs[3].loglog(m, PCW, 'r-', label="CW")
-            axs[3].loglog(m, PCCW, 'k-', label="CCW")
+            axs[3].loglog(m, PCW[i], 'r-', label="CW")
+            axs[3].loglog(m, PCCW[i], 'k-', label="CCW")
 
             axs[-1].set_xlabel('$k_z$ (m$^{-1}$)')
 
@@ -589,15 +445,19 @@ if regrid:
 # 3.
 width = 240.
 overlap = 180.
-dudz_bins = wdw.window(P_ladcp, dudz, width, overlap, x_0=P_top)
-dvdz_bins = wdw.window(P_ladcp, dvdz, width, overlap, x_0=P_top)
-etaz_bins = wdw.window(P_ctd, etaz, width, overlap, x_0=P_top)
-N2_ref_bins = wdw.window(P_ctd, N2_ref, width, overlap, x_0=P_top)
+P_shear_bins, (dudz_bins, dvdz_bins), ladcp_mask = \
+    wv.window_views(P_ladcp, [dudz, dvdz], width, overlap, x_0=P_top)
+P_strain_bins, (etaz_bins, N2_ref_bins), ctd_mask = \
+    wv.window_views(P_ctd, [etaz, N2_ref], width, overlap, x_0=P_top)
 
 # Bare in mind that these could be different lengths -- a possible problem.
-N_bins = len(dudz_bins)
+N_bins = min(len(dudz_bins), len(etaz_bins))
 
-P_mean = np.empty(N_bins)
+N2_means = wv.window_mean(N2_ref_bins, ctd_mask)[:N_bins]
+# Centre of the data in each bin.
+last = ladcp_mask.sum(axis=1) - 1
+P_mean = (P_shear_bins[:, 0] + P_shear_bins[np.arange(last.size),
+                                             last])[:N_bins]/2.
 R_pol = np.empty(N_bins)
 R_om = np.empty(N_bins)
 epsilon = np.empty(N_bins)
@@ -605,35 +465,42 @@ kappa = np.empty(N_bins)
 
 print_diagnostics = True
 
+# The bins are on regular grids.
+dP_shear = P_shear_bins[0, 1] - P_shear_bins[0, 0]
+dP_strain = P_strain_bins[0, 1] - P_strain_bins[0, 0]
+
+# Compute the (co)power spectral density of all bins at once, transforming
+# each variable only once.
+nN = np.sqrt(N2_means)[:, np.newaxis]
+FdU, FdV = fsp.window_ffts([dudz_bins[:N_bins]/nN, dvdz_bins[:N_bins]/nN],
+                           ladcp_mask[:N_bins], fs=1./dP_shear,
+                           window='hanning', detrend='linear',
+                           scaling='density')
+Fstrain, = fsp.window_ffts([etaz_bins[:N_bins]], ctd_mask[:N_bins],
+                           fs=1./dP_strain, window='hanning',
+                           detrend='linear', scaling='density')
+m_shear = fsp.wavenumbers(ladcp_mask.shape[1], dP_shear)
+m_strain = fsp.wavenumbers(ctd_mask.shape[1], dP_strain)
+PdU_bins = np.abs(FdU)**2
+PdV_bins = np.abs(FdV)**2
+PdUdV_bins = FdU*FdV.conj()
+Pstrain_bins = np.abs(Fstrain)**2
+
+m_c = 1./90.
+m_0 = 1./180.
+
+# Garrett-Munk spectra are interpolated from tables.
+GMstrain_table = gmt.get_table(GM79.E_str_z, m_strain, 2*np.pi, m_0, m_c)
+GMvel_table = gmt.get_table(GM79.E_vel_z, m_shear, 2*np.pi)
+GMshear_table = gmt.get_table(GM79.E_she_z, m_shear, 2*np.pi, m_0, m_c)
+
 for i in xrange(N_bins):
 
-    N2_mean = np.mean(N2_ref_bins[i][1])
+    N2_mean = N2_means[i]
     N_mean = np.sqrt(N2_mean)
 
-    P_shear = dudz_bins[i][0]
-    nUz = dudz_bins[i][1]/N_mean
-    nVz = dvdz_bins[i][1]/N_mean
-    P_strain = netaz = etaz_bins[i][0]
-    ietaz = etaz_bins[i][1]
-
-    P_mean[i] = (P_shear[-1] + P_shear[0])/2.
-
-    # This should always be true...
-    dP_shear = P_shear[1] - P_shear[0]
-    dP_strain = P_strain[1] - P_strain[0]
-
-    # Compute the (co)power spectral density.
-    m_shear, PdU, PdV, PdUdV = coperiodogram(nUz, nVz, fs=1./dP_shear,
-                                             window='hanning', nfft=None,
-                                             detrend='linear',
-                                             scaling='density')
-    # We only really want the cospectrum for shear so the next two lines are
-    # something of a hack where we ignore unwanted output.
-
-    m_strain, Pstrain, __, __ = coperiodogram(ietaz, ietaz, fs=1./dP_strain,
-                                              window='hanning', nfft=None,
-                                              detrend='linear',
-                                              scaling='density')
+    PdU, PdV, PdUdV = PdU_bins[i], PdV_bins[i], PdUdV_bins[i]
+    Pstrain = Pstrain_bins[i].copy()
 
     # Clockwise and counter clockwise spectra.
     PCW = CW_ps(PdU, PdV, PdUdV)
@@ -642,9 +509,9 @@ for i in xrange(N_bins):
     Pshear = PdU + PdV
 
     # Also Garrett-Munk. Factor of 2 pi to convert to cyclical units
-    GMstrain = 2*np.pi*GM79.E_str_z(2*np.pi*m_strain, N_mean)
-    GMvel = 2*np.pi*GM79.E_vel_z(2*np.pi*m_shear, N_mean)
-    GMshear = 2*np.pi*GM79.E_she_z(2*np.pi*m_shear, N_mean)/N_mean
+    GMstrain = GMstrain_table.spectrum(N_mean, 2*np.pi)
+    GMvel = GMvel_table.spectrum(N_mean, 2*np.pi)
+    GMshear = GMshear_table.spectrum(N_mean, 2*np.pi, N_power=1)
 
     # Now apply the corrections.
     T_shear = spectral_correction(m_shear, use_range=True, use_diff=True,
@@ -665,15 +532,12 @@ for i in xrange(N_bins):
     Pstrain /= T_strain
 
     # Now calculate what we wanted in the first place.
-    m_c = 1./90.
-    m_0 = 1./180.
-
     I_strain = integrated_ps(m_strain, Pstrain, m_c, m_0)
     I_shear = integrated_ps(m_shear, Pshear, m_c, m_0)
     I_CW = integrated_ps(m_shear, PCW, m_c, m_0)
     I_CCW = integrated_ps(m_shear, PCCW, m_c, m_0)
-    I_GMshear = integrated_ps(m_shear, GMshear, m_c, m_0)
-    I_GMstrain = integrated_ps(m_strain, GMstrain, m_c, m_0)
+    I_GMshear = GMshear_table.integral(N_mean, 2*np.pi, N_power=1)
+    I_GMstrain = GMstrain_table.integral(N_mean, 2*np.pi)
 
     R_pol[i] = I_CCW/I_CW
     R_om[i] = I_shear/I_strain
@@ -5,40 +5,54 @@ Created on Thu Aug 27 12:38:27 2015
 @author: jc3e13
 """
 
-import itertools
+import multiprocessing as mp
 import os
+import argparse
+import job_runner as jr
+
+
+parser = argparse.ArgumentParser(description='Run a parallel tempering MCMC '
+                                 'fit of every profile.')
+parser.add_argument('--workers', type=int, default=1,
+                    help='number of profiles fitted at once')
+parser.add_argument('--force', action='store_true',
+                    help='rerun fits that already have a trace')
+args = parser.parse_args()
+
+pdir = '/noc/users/jc3e13/storage/processed/'
 
 #info = [('4976', ['30', '31', '32'], [['-1000', '-200'], ['-1600', '-600'], ['-1600', '-400']]),
 #        ('4977', ['25', '26', '27'], [['-1000', '-500'], ['-1600', '-600'], ['-1100', '-150']])]
 #
 #opts = ['-1000', '1000']
 #detrend = '1'
-#
-#for floatID, hpids, zranges in info:
-#    for hpid, zrange in zip(hpids, zranges):
-#        for XYZ in itertools.product(opts, opts, opts):
-#            zmin, zmax = zrange
-#            X0, Y0, Z0 = XYZ
-#            command = 'python run_pymc.py --floatID ' + floatID + ' --hpid ' \
-#                + hpid + ' --zrange ' + zmin + ' ' + zmax + ' --xyz ' + X0 + \
-#                ' ' + Y0 + ' ' + Z0 + ' --detrend ' + detrend + ' &'
-#            print(command)
-#            os.system(command)
 
 
 info = [('4976', ['32'], [['-1600', '-400']]),
         ('4977', ['26'], [['-1600', '-600']])]
 
+# Replicas start from the grid of these wavelengths in X, Y and Z, replica
+# exchange moves between the modes so one run per profile replaces a run
+# from every point of the grid.
 opts = ['-500', '-1000', '-2000']
 detrend = '1'
 
+# Each fit spreads its temperature ladder over its share of the cores.
+processes = max(1, mp.cpu_count()//args.workers)
+
+jobs = []
 for floatID, hpids, zranges in info:
     for hpid, zrange in zip(hpids, zranges):
-        for XYZ in itertools.product(opts, opts, opts):
-            zmin, zmax = zrange
-            X0, Y0, Z0 = XYZ
-            command = 'python run_pymc.py --floatID ' + floatID + ' --hpid ' \
-                + hpid + ' --zrange ' + zmin + ' ' + zmax + ' --xyz ' + X0 + \
-                ' ' + Y0 + ' ' + Z0 + ' --detrend ' + detrend + ' &'
-            print(command)
-            os.system(command)
\ No newline at end of file
+        zmin, zmax = zrange
+        save_string = floatID + '_' + hpid + '_PT'
+        script_args = ['--floatID', floatID, '--hpid', hpid, '--zrange',
+                       zmin, zmax, '--starts'] + opts + \
+                      ['--detrend', detrend, '--sampler', 'tempering',
+                       '--processes', str(processes)]
+        trace_header = os.path.join(pdir, 'trace_' + save_string,
+                                    'header.json')
+        jobs.append(jr.python_job('pymc_' + save_string, 'run_pymc.py',
+                                  script_args, outputs=[trace_header]))
+
+jr.run_jobs(jobs, workers=args.workers, log_dir='../logs/run_pymc',
+            skip_existing=not args.force)
@@ -5,12 +5,16 @@ Created on Fri Jan 15 15:20:19 2016
 @author: jc3e13
 """
 
+import multiprocessing as mp
 import numpy as np
 import scipy as sp
+import scipy.integrate
 import matplotlib.pyplot as plt
 
 import gravity_waves as gw
 import detect_peaks as dp
+import batch_ode as bo
+import grid_search as gs
 
 
 def drdt(r, t, phi_0, k, l, m, N=2e-3, U=0.3, V=0., Wf=0.1, f=0., phase_0=0.):
@@ -170,10 +174,10 @@ for ax in axs:
 # %% Error in hydrostatic approximation.
 
 # Define the wave.
-Xl = np.arange(-4000., 0., 200.)
+Xl = np.arange(-4000., 0., 50.)
 Y = 1e7
 Z = -2000.
-phi_0l = np.arange(0.001, 0.101, 0.001)
+phi_0l = np.arange(0.001, 0.1005, 0.0005)
 N = 2e-3
 f = 1.2e-4
 U = 0.3
@@ -182,73 +186,75 @@ Wf = 0.12
 phase_0 = 0.
 rho0 = 1025.
 
-Xg, phi_0g = np.meshgrid(Xl, phi_0l)
-shp = Xg.shape
-Ni = Xg.size
+# Floats see short waves Doppler shifted to periods of a few hundred seconds
+# and the flux is integrated between peaks of the sampled w, so keep the 1 s
+# output of the odeint version and take one RK4 step per output interval.
+t = np.arange(0., 50000.)
+
+
+def hydrostatic_pressure(z, b):
+    """Nash method of estimating pressure perturbation from buoyancy."""
+    if z[0] > z[-1]:
+        zud = np.flipud(z)
+        bud = np.flipud(b)
+    else:
+        zud = z
+        bud = b
+
+    bi = sp.integrate.cumtrapz(bud, zud, initial=0.)
+    bii = sp.integrate.cumtrapz(bi, zud, initial=0.)
+    H = zud.max() - zud.min()
+    pi = bi + (bii[0] - bii[-1])/H
 
-alphag = np.zeros_like(Xg)
-Erat = np.zeros_like(Xg)
+    if z[0] > z[-1]:
+        pi = np.flipud(pi)
 
-print("Progress:")
-for il, (X, phi_0) in enumerate(zip(Xg.flatten(), phi_0g.flatten())):
+    return pi
 
-    print("{:1.1f}%".format(100.*float(il)/float(Ni)))
 
-    i, j = np.unravel_index(il, shp)
+def energy_flux_ratio(ps):
+    """Measured over actual vertical energy flux for a batch of
+    [phi_0, X] vectors. All the float paths of the batch are integrated
+    together."""
+    phi_0, X = ps.T
 
     k = 2.*np.pi/X
     l = 2.*np.pi/Y
     m = 2.*np.pi/Z
     om = gw.omega(N, k, m, l, f)
-    alpha = gw.alpha(k, m, l)
-    alphag[i, j] = alpha
     w_0 = gw.W_0(phi_0, m, om, N)
-    Edens = gw.Edens(w_0, k, m, l, rho0)
     Efluxz = gw.Efluxz(w_0, k, m, N, l, f, rho0)
 
-    t = np.arange(0., 50000.)
-    r0 = np.array([0., 0., 0.])
-    args = (phi_0, k, l, m, N, U, V, Wf, f, phase_0)
-    r = sp.integrate.odeint(drdt, r0, t, args=args)
-    x, y, z = r[:, 0], r[:, 1], r[:, 2]
-
-    vel = gw.wave_vel(r, t, phi_0, N, f, k, l, m, om, U=U, V=V, phase_0=phase_0)
-    u, v, w = vel[:, 0], vel[:, 1], vel[:, 2]
-    b = gw.buoy(r, t, phi_0, N, k, l, m, om, U=U, V=V, phase_0=phase_0)
-    p = gw.phi(r[:, 0], r[:, 1], r[:, 2], t, phi_0, k, l, m, om, U=U, V=V)
-
-    # Nash method of estimating pressure perturbation
-    if z[0] > z[-1]:
-        print("Downward Profile!\n")
-        zud = np.flipud(z)
-        bud = np.flipud(b)
-        bi = sp.integrate.cumtrapz(bud, zud, initial=0.)
-        bii = sp.integrate.cumtrapz(bi, zud, initial=0.)
-
-        H = zud.max() - zud.min()
+    # Only the height, w and b along the paths are kept, 1.2 MB per cell.
+    zs, w, b = bo.wave_float_zwb(t, phi_0, k, l, m, N, U, V, Wf, f, phase_0)
 
-        pi = bi + (bii[0] - bii[-1])/H
+    Erat = np.empty(len(ps))
+    for j in range(len(ps)):
+        z = zs[:, j]
+        pi = hydrostatic_pressure(z, b[:, j])
 
-        pi = np.flipud(pi)
+        # Measurements over one wave period.
+        idxs = dp.detect_peaks(w[:, j])
+        idx1, idx2 = idxs[0], idxs[1]
+        use = slice(idx1, idx2)
+        dT = t[idx2] - t[idx1]
 
-    else:
-        bi = sp.integrate.cumtrapz(b, z, initial=0.)
-        bii = sp.integrate.cumtrapz(bi, z, initial=0.)
+        pwbar = rho0*sp.integrate.trapz(w[use, j]*pi[use], t[use])/dT
+        Erat[j] = pwbar/Efluxz[j]
 
-        H = zud.max() - zud.min()
+    return Erat
 
-        pi = bi + (bii[0] - bii[-1])/H
 
-    # Measurements of momentum flux
-    idxs = dp.detect_peaks(w)
-    idx1, idx2 = idxs[0], idxs[1]
-    use = slice(idx1, idx2)
-    dT = t[idx2] - t[idx1]
+Xg, phi_0g = np.meshgrid(Xl, phi_0l)
+alphag = gw.alpha(2.*np.pi/Xg, 2.*np.pi/Z, 2.*np.pi/Y)
 
-    pwbar = rho0*sp.integrate.trapz(w[use]*pi[use], t[use])/dT
-    Erat[i, j] = pwbar/Efluxz
+# Chunks of cells are spread over all cores, which is where the time is
+# saved: at 1 s output a chunk costs about as much per cell as odeint. Each
+# worker holds about 250 MB for a chunk of 200 cells.
+Erat = gs.grid_search(energy_flux_ratio, [phi_0l, Xl], chunk_size=200,
+                      processes=mp.cpu_count(), verbose=True)
 
 plt.figure()
 plt.plot(alphag[0, :-4], np.mean(Erat[:, :-4], axis=0))
 plt.xlabel('Aspect Ratio')
-plt.ylabel('Energy flux error factor')
\ No newline at end of file
+plt.ylabel('Energy flux error factor')
@@ -7,9 +7,10 @@ Created on Mon Dec 15 14:43:24 2014
 
 import os
 import glob
-import itertools
 import pickle
+import multiprocessing as mp
 import numpy as np
+import gsw
 import matplotlib
 import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1 import make_axes_locatable
@@ -19,7 +20,9 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 import emapex
 import float_advection_routines as far
 import utils
-import gravity_waves as gw
+import gravity_wave_fields as gwf
+import grid_search as gs
+import trajectory_cache as tc
 
 
 try:
@@ -38,6 +41,8 @@ if not os.path.exists(sdir):
     os.makedirs(sdir)
 # Universal figure font size.
 matplotlib.rc('font', **{'size': 9})
+# Processes used by the grid searches.
+processes = mp.cpu_count()
 
 # %% ##########################################################################
 
@@ -59,96 +64,74 @@ vf = pfl.interp(zf, 'zef', 'V_abs')
 wf = pfl.interp(zf, 'zef', 'Ww')
 bf = bscale*pfl.interp(zf, 'z', 'b')
 
-ps = []
-cost = []
 
-for LX, LY, LZ, Phase in itertools.product(Xs, Ys, Zs, Phases):
+# Trajectories are cached on disk, rerunning the search (or refining it)
+# only integrates parameter sets not seen before.
+mc = tc.ModelCache()
 
-    ps.append((LX, LY, LZ, Phase))
+# Interpolating between precomputed profiles instead of integrating every
+# trajectory makes far larger searches practical, at some loss of accuracy.
+use_surrogate = False
 
-    if LX == 0. or LY == 0. or LZ == 0.:
-        cost.append(1e10)
-        continue
 
-    X = far.model_verbose(LX, LY, LZ, Phase, params)
+def profile_cost(um, vm, wm, bm):
+    return (np.std(um - uf, axis=-1) + np.std(vm - vf, axis=-1) +
+            np.std(wm - wf, axis=-1) + np.std(bm - bf, axis=-1))
 
-    um = np.interp(zf, X.r[:, 2], X.u[:, 0])
-    vm = np.interp(zf, X.r[:, 2], X.u[:, 1])
-    wm = np.interp(zf, X.r[:, 2], X.u[:, 2])
-    bm = bscale*np.interp(zf, X.r[:, 2], X.b)
 
-    c = np.std(um - uf) + np.std(vm - vf) + np.std(wm - wf) + np.std(bm - bf)
-    cost.append(c)
+def trajectory_cost(ps):
+    """Misfit of modelled float trajectories for a batch of
+    [X, Y, Z, phase] vectors. Each needs its own integration, the batch is
+    spread over processes by the grid search."""
+    cost = np.full(len(ps), 1e10)
 
-    print(LX, LY, LZ, Phase, c)
+    for i, (LX, LY, LZ, Phase) in enumerate(ps):
 
-with open('pfl32_param_search_cost.p', 'wb') as f:
-    pickle.dump(c, f)
-
-with open('pfl32_param_search_params.p', 'wb') as f:
-    pickle.dump(ps, f)
-
-
-# %% Search using cost determined by fit to data
-
-
-def w_model(params, data):
-
-    X, Y, Z, phase_0 = params
-
-    time, dist, depth, U, V, W, B, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-    phi_0 = np.max(W)*(N**2 - f**2)*m/(om*(k**2 + l**2 + m**2))
-
-    w = gw.w(dist, 0., depth, time, phi_0, k, l, m, om, N, phase_0=phase_0)
-
-    return w - W
-
-
-def u_model(params, data):
-
-    X, Y, Z, phase_0 = params
-
-    time, dist, depth, U, V, W, B, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
+        if LX == 0. or LY == 0. or LZ == 0.:
+            continue
 
-    om = gw.omega(N, k, m, l, f)
-    phi_0 = np.max(W)*(N**2 - f**2)*m/(om*(k**2 + l**2 + m**2))
+        X = mc(LX, LY, LZ, Phase, params=params)
+        cost[i] = profile_cost(*tc.model_profiles(X, zf, bscale))
 
-    u = gw.u(dist, 0., depth, time, phi_0, k, l, m, om, phase_0=phase_0)
+    return cost
 
-    return u - U
 
+if use_surrogate:
+    # Zero wavelengths are not valid model input and the phase axis must
+    # not repeat 0 at 2 pi to be periodic.
+    sur = tc.surrogate([Xs[Xs != 0.], Ys[Ys != 0.], Zs[Zs != 0.],
+                        np.linspace(0., 2.*np.pi, 12, endpoint=False)],
+                       zf, params, cache=mc, bscale=bscale,
+                       periodic=[False, False, False, True],
+                       processes=processes, verbose=True)
 
-def v_model(params, data):
+    def surrogate_cost(ps):
+        cost = profile_cost(*sur(ps))
+        bad = np.isnan(cost) | np.any(ps[:, :3] == 0., axis=1)
+        return np.where(bad, 1e10, cost)
 
-    X, Y, Z, phase_0 = params
+    cost_func = surrogate_cost
+else:
+    cost_func = trajectory_cost
 
-    time, dist, depth, U, V, W, B, N, f = data
 
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
+axes = [Xs, Ys, Zs, Phases]
+cost = gs.grid_search(cost_func, axes, chunk_size=64, processes=processes,
+                      verbose=True)
 
-    om = gw.omega(N, k, m, l, f)
-    phi_0 = np.max(W)*(N**2 - f**2)*m/(om*(k**2 + l**2 + m**2))
+with open('pfl32_param_search_cost.p', 'wb') as f:
+    pickle.dump({'names': ['X', 'Y', 'Z', 'phase'], 'axes': axes,
+                 'cost': cost}, f)
 
-    v = gw.v(dist, 0., depth, time, phi_0, k, l, m, om, phase_0=phase_0)
 
-    return v - V
+# %% Search using cost determined by fit to data
 
 
-def b_model(params, data):
+def full_model(params, data):
+    """Residuals of w, u, v and b stacked end to end, from a single phase
+    evaluation. params is [X, Y, Z, phase_0] or an (n_params, 4) batch."""
 
-    X, Y, Z, phase_0 = params
+    X, Y, Z, phase_0 = np.asarray(params, dtype=float).T[..., np.newaxis]
 
     time, dist, depth, U, V, W, B, N, f = data
 
@@ -156,21 +139,14 @@ def b_model(params, data):
     l = 2*np.pi/Y
     m = 2*np.pi/Z
 
-    om = gw.omega(N, k, m, l, f)
+    om = gwf.omega(N, k, m, l, f)
     phi_0 = np.max(W)*(N**2 - f**2)*m/(om*(k**2 + l**2 + m**2))
 
-    b = gw.b(dist, 0., depth, time, phi_0, k, l, m, om, N, phase_0=phase_0)
+    # Horizontal velocities are evaluated without rotation (f = 0).
+    u, v, w, b, __ = gwf.fields(dist, 0., depth, time, phi_0, k, l, m, om, N,
+                                phase_0=phase_0)
 
-    resid = b - B
-
-    return 250.*resid
-
-
-def full_model(params, data):
-    return np.hstack((w_model(params, data),
-                      u_model(params, data),
-                      v_model(params, data),
-                      b_model(params, data)))
+    return np.concatenate((w - W, u - U, v - V, 250.*(b - B)), axis=-1)
 
 
 # Previously this looked like E76.get_timeseries([31, 32], ) etc. and the below
@@ -224,32 +200,34 @@ dist -= np.min(dist)
 data = [time, dist, depth, U, V, W, B, N, f]
 
 
-ps = []
-cost = []
+def data_cost(ps):
+    """Sum of squared residuals for a batch of [X, Y, Z, phase] vectors,
+    evaluated in one go."""
+    cost = np.full(len(ps), 1e10)
+    ok = np.all(ps[:, :3] != 0., axis=1)
+    if np.any(ok):
+        cost[ok] = np.sum(full_model(ps[ok], data)**2, axis=-1)
+    return cost
+
+
 Xs = np.arange(-40000., 0., 500.)
 Ys = np.arange(-40000., 0., 500.)
 Zs = np.arange(-6000., 0., 200.)
 Phases = np.linspace(0., 2.*np.pi, 10)
 
-for LX, LY, LZ, Phase in itertools.product(Xs, Ys, Zs, Phases):
+# The full cube, then finer grids around the 10 best cells. Batches are kept
+# small enough that the residual arrays stay a few tens of MB.
+axes = [Xs, Ys, Zs, Phases]
+chunk_size = max(1, 2**22//(4*len(time)))
+grids, p_best, c_best = gs.coarse_to_fine(data_cost, axes, levels=2,
+                                          n_best=10, factor=4,
+                                          chunk_size=chunk_size,
+                                          processes=processes, verbose=True)
+cost = grids[0][1]
 
-    ps.append((LX, LY, LZ, Phase))
-
-    if LX == 0. or LY == 0. or LZ == 0.:
-        cost.append(1e10)
-        continue
-
-    params = [LX, LY, LZ, Phase]
-
-    c = np.sum(full_model(params, data)**2)
-    cost.append(c)
-
-#    print(LX, LY, LZ, Phase, c)
-
-cost = np.asarray(cost)
+print("Best X, Y, Z, phase: {}, cost {}".format(p_best, c_best))
 
 with open('pfl3132_param_search_cost.p', 'wb') as f:
-    pickle.dump(cost, f)
-
-with open('pfl3132_param_search_params.p', 'wb') as f:
-    pickle.dump(ps, f)
+    pickle.dump({'names': ['X', 'Y', 'Z', 'phase'], 'axes': axes,
+                 'cost': cost, 'refined': grids[1:], 'best': p_best,
+                 'best_cost': c_best}, f)
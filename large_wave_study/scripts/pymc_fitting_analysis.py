@@ -14,11 +14,12 @@ import glob
 import pickle
 import gsw
 import corner
-import pymc
 
 import emapex
 import utils
 import gravity_waves as gw
+import gravity_wave_fields as gwf
+import trace_store as ts
 import plotting_functions as pf
 
 
@@ -44,105 +45,37 @@ matplotlib.rc('font', **{'size': 8})
 # %% Fitting to profiles
 
 def w_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    time, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    w = gw.w(x, y, z, time, phi_0, k, l, m, om, N, U=U, V=V, phase_0=phase_0)
-
-    return w
+    return gwf.model_fields(params, data)[2]
 
 
 def u_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    time, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    u = gw.u(x, y, z, time, phi_0, k, l, m, om, f=f, U=U, V=V, phase_0=phase_0)
-
-    return u
+    return gwf.model_fields(params, data)[0]
 
 
 def v_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    time, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    v = gw.v(x, y, z, time, phi_0, k, l, m, om, f=f, U=U, V=V, phase_0=phase_0)
-
-    return v
+    return gwf.model_fields(params, data)[1]
 
 
 def b_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    time, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    b = gw.b(x, y, z, time, phi_0, k, l, m, om, N, U=U, V=V, phase_0=phase_0)
-
-    return b
+    return gwf.model_fields(params, data)[3]
 
 
 def p_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    t, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    p = gw.phi(x, y, z, t, phi_0, k, l, m, om, U=U, V=V, phase_0=phase_0)
-
-    return p
+    return gwf.model_fields(params, data)[4]
 
 
 def full_model(params, data):
-    return np.hstack((u_model(params, data),
-                      v_model(params, data),
-                      w_model(params, data),
-                      b_model(params, data),
-                      p_model(params, data)))
+    # All five fields from one phase evaluation.
+    return gwf.full_model(params, data)
 
 
 # %% Combined plots.
-# Rewrite this for new trace files!
+# Traces are opened lazily, samples are read from disk when indexed.
 data_dir = '/noc/users/jc3e13/storage/processed/'
-#M1 = pymc.database.pickle.load(os.path.join(data_dir, 'trace_4976_31_X1000_Y1000_Z1000.p'))
-M2 = pymc.database.pickle.load(os.path.join(data_dir, 'trace_4976_32_X-1000_Y-1000_Z-1000.p'))
-M3 = pymc.database.pickle.load(os.path.join(data_dir, 'trace_4977_26_X-1000_Y-1000_Z-1000.p'))
-#M4 = pymc.database.pickle.load(os.path.join(data_dir, 'trace_4977_27_X1000_Y-1000_Z-1000.p'))
+#M1 = ts.load(os.path.join(data_dir, 'trace_4976_31_PT'))
+M2 = ts.load(os.path.join(data_dir, 'trace_4976_32_PT'))
+M3 = ts.load(os.path.join(data_dir, 'trace_4977_26_PT'))
+#M4 = ts.load(os.path.join(data_dir, 'trace_4977_27_PT'))
 
 # %% Post-load.
 
@@ -381,7 +314,6 @@ for pfl, axs in zip(pfls, axm):
         ax.axhspan(*ylims[pfl.hpid[0]], color='grey', alpha=0.5)
         ax.set_ylim(-1600., 0.)
 
-    Ns = len(M1.trace('X')[:])
     M = Ms[pfl.hpid[0]]
 
     time = pfl.UTC
@@ -421,9 +353,9 @@ for pfl, axs in zip(pfls, axm):
 
     data = [time, x, y, z, Umean, Vmean, N, f]
 
-    for i in xrange(0, Ns, 40):
-        params = [M.trace('phi_0')[i], M.trace('X')[i], M.trace('Y')[i],
-                  M.trace('Z')[i], M.trace('phase')[i]]
+    # Read every 40th sample of all parameters at once.
+    for params in M.samples(['phi_0', 'X', 'Y', 'Z', 'phase'],
+                            slice(None, None, 40)):
         axs[0].plot(100.*u_model(params, data), z, color='red', alpha=0.03)
         axs[1].plot(100.*v_model(params, data), z, color='red', alpha=0.03)
         axs[2].plot(100.*w_model(params, data), z, color='red', alpha=0.03)
@@ -445,19 +377,17 @@ pf.my_savefig(fig, 'both', 'profiles_fit', sdir, ftype='pdf',
 
 # %% Figure for a profile
 
-M_files = glob.glob('/noc/users/jc3e13/storage/processed/trace_497*.p')
+M_files = [M_file for M_file in
+           glob.glob('/noc/users/jc3e13/storage/processed/trace_497*')
+           if ts.exists(M_file)]
 
 info = {32: (-1600, -400),
         26: (-1600, -650)}
 
-samples = 10000000
-burn = 9800000
-thin = 10
-
 for M_file in M_files:
 
-    M = pymc.database.pickle.load(M_file)
-    savename = os.path.basename(M_file)[6:-2]
+    M = ts.load(M_file)
+    savename = os.path.basename(M_file)[6:]
     hpid = int(M_file.split('_')[2])
     zmin, zmax = info[hpid]
 
@@ -571,11 +501,8 @@ for M_file in M_files:
     axs[4].plot(100.*PP, z, color='black')
     axs[4].set_xlabel('$p^\prime$ ($10^{-2}$\nm$^2$ s$^{-2}$)')
 
-    Ns = (samples - burn)/thin
-
-    for i in xrange(0, Ns, 200):
-        params = [M.trace('phi_0')[i], M.trace('X')[i], M.trace('Y')[i],
-                  M.trace('Z')[i], M.trace('phase')[i]]
+    for params in M.samples(['phi_0', 'X', 'Y', 'Z', 'phase'],
+                            slice(None, None, 200)):
         axs[0].plot(100.*u_model(params, data), z, color='red', alpha=0.03)
         axs[1].plot(100.*v_model(params, data), z, color='red', alpha=0.03)
         axs[2].plot(100.*w_model(params, data), z, color='red', alpha=0.03)
@@ -608,10 +535,6 @@ hpids = [32, 26]
 info = {32: (-1600, -400),
         26: (-1600, -650)}
 
-samples = 10000000
-burn = 9800000
-thin = 10
-
 fig, axs = plt.subplots(2, 5, sharey='row', sharex='col', figsize=(3.125, 3))
 #fig.tight_layout()
 
@@ -749,11 +672,9 @@ for i in xrange(2):
         axs[i, -1].text(axs[i, -1].get_xlim()[1], thrs[idxs[j]], s,
                             fontdict={'size': 4}, rotation=-50.)
 
-    Ns = (samples - burn)/thin
+    Ps = M.samples(['phi_0', 'X', 'Y', 'Z', 'phase'], slice(None, None, 200))
 
-    for j in xrange(0, Ns, 200):
-        params = [M.trace('phi_0')[j], M.trace('X')[j], M.trace('Y')[j],
-                  M.trace('Z')[j], M.trace('phase')[j]]
+    for j, params in enumerate(Ps):
         if j == 0:
             label = 'fit'
         else:
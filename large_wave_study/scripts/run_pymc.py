@@ -6,6 +6,7 @@ Created on Thu Aug 27 11:59:10 2015
 """
 
 import argparse
+import itertools
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
@@ -17,6 +18,9 @@ import pymc
 import emapex
 import utils
 import gravity_waves as gw
+import gravity_wave_fields as gwf
+import adaptive_mcmc as am
+import trace_store as ts
 import plotting_functions as pf
 
 
@@ -35,7 +39,21 @@ parser.add_argument('--zrange', nargs=2, type=float,
                     help='min max height range for fit')
 parser.add_argument('--xyz', nargs=3, type=float, help='initial conditions for'
                     ' fit X, Y, Z')
+parser.add_argument('--starts', nargs='+', type=float,
+                    default=[-500., -1000., -2000.], help='wavelengths '
+                    'combined into the grid of X, Y, Z starting points of the '
+                    'tempering sampler')
 parser.add_argument('--detrend', type=int, help='detrend polynomial order')
+parser.add_argument('--sampler', choices=['adaptive', 'tempering', 'pymc'],
+                    default='adaptive', help='adaptive Metropolis that stops '
+                    'once converged, parallel tempering over the grid of '
+                    'starts, or the original fixed length pymc run')
+parser.add_argument('--temps', type=int, default=16,
+                    help='number of temperatures for parallel tempering')
+parser.add_argument('--processes', type=int, default=1,
+                    help='processes the temperature ladder is split over')
+parser.add_argument('--seed', type=int, default=None,
+                    help='random seed for the adaptive samplers')
 args = parser.parse_args()
 
 # Model
@@ -44,96 +62,28 @@ bscale = 250.
 pscale = 10.
 
 def w_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    t, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    w = gw.w(x, y, z, t, phi_0, k, l, m, om, N, U=U, V=V, phase_0=phase_0)
-
-    return wscale*w
+    return wscale*gwf.model_fields(params, data)[2]
 
 
 def u_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    t, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    u = gw.u(x, y, z, t, phi_0, k, l, m, om, f=f, U=U, V=V, phase_0=phase_0)
-
-    return u
+    return gwf.model_fields(params, data)[0]
 
 
 def v_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    t, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    v = gw.v(x, y, z, t, phi_0, k, l, m, om, f=f, U=U, V=V, phase_0=phase_0)
-
-    return v
+    return gwf.model_fields(params, data)[1]
 
 
 def b_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    t, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    b = gw.b(x, y, z, t, phi_0, k, l, m, om, N, U=U, V=V, phase_0=phase_0)
-
-    return bscale*b
+    return bscale*gwf.model_fields(params, data)[3]
 
 
 def p_model(params, data):
-
-    phi_0, X, Y, Z, phase_0 = params
-
-    t, x, y, z, U, V, N, f = data
-
-    k = 2*np.pi/X
-    l = 2*np.pi/Y
-    m = 2*np.pi/Z
-
-    om = gw.omega(N, k, m, l, f)
-
-    p = gw.phi(x, y, z, t, phi_0, k, l, m, om, U=U, V=V, phase_0=phase_0)
-
-    return pscale*p
+    return pscale*gwf.model_fields(params, data)[4]
 
 
 def full_model(params, data):
-    return np.hstack((u_model(params, data),
-                      v_model(params, data),
-                      w_model(params, data),
-                      b_model(params, data),
-                      p_model(params, data)))
+    # All five fields from one phase evaluation.
+    return gwf.full_model(params, data, (1., 1., wscale, bscale, pscale))
 
 
 Float = emapex.load(args.floatID)
@@ -193,13 +143,22 @@ data = [time, x, y, z, Umean, Vmean, N, f]
 
 data_stack = np.hstack((U, V, wscale*W, bscale*B, pscale*PP))
 
-X0, Y0, Z0 = args.xyz
+if args.sampler == 'tempering':
+    X0, Y0, Z0 = np.median(args.starts)*np.ones(3)
+else:
+    X0, Y0, Z0 = args.xyz
+
+# Uniform priors, shared by both samplers.
+sig = 0.02
+names = ['phi_0', 'X', 'Y', 'Z', 'phase']
+lower = np.array([0., -5000., -100000., -5000., -np.pi*100])
+upper = np.array([0.1, 0., 100000., 0., np.pi*100])
+p0 = np.array([0.02, X0, Y0, Z0, 0.])
 
 
 def model():
 
     # Priors.
-    sig = 0.02
     phi_0 = pymc.Uniform('phi_0', 0, 0.1, value=0.02)
     X = pymc.Uniform('X', -5000., 0., value=X0)
     Y = pymc.Uniform('Y', -100000., 100000., value=Y0)
@@ -217,17 +176,102 @@ def model():
 
     return locals()
 
-save_string = str(args.floatID) + '_' + str(args.hpid) + '_X' + str(int(X0)) \
-    + '_Y' + str(int(Y0)) + '_Z'+str(int(Z0))
 
-dbname = '/noc/users/jc3e13/storage/processed/trace_' + save_string + '.p'
+def log_prior(params):
+    """Uniform log prior of a batch of parameter vectors."""
+    inside = np.all((params > lower) & (params < upper), axis=-1)
+    return np.where(inside, 0., -np.inf)
+
+
+def log_likelihood(params):
+    """Gaussian log likelihood of a batch of parameter vectors."""
+    resid = full_model(params, data) - data_stack
+    return -0.5*np.sum(resid**2, axis=-1)/sig**2
+
+
+def log_posterior(params):
+    """Log posterior of a batch of parameter vectors, one per chain."""
+    params = np.atleast_2d(params)
+    logp = log_prior(params)
+    inside = np.isfinite(logp)
+    if np.any(inside):
+        logp[inside] += log_likelihood(params[inside])
+    return logp
+
+
+if args.sampler == 'tempering':
+    # One run covers the whole grid of starting points.
+    save_string = str(args.floatID) + '_' + str(args.hpid) + '_PT'
+else:
+    save_string = str(args.floatID) + '_' + str(args.hpid) + '_X' + \
+        str(int(X0)) + '_Y' + str(int(Y0)) + '_Z'+str(int(Z0))
+
+# Trace directory, see trace_store.
+dbname = '/noc/users/jc3e13/storage/processed/trace_' + save_string
 tfname = '/noc/users/jc3e13/storage/processed/results_' + save_string + '.txt'
 
-M = pymc.MCMC(model(), db='pickle', dbname=dbname)
-samples = 10000000
-burn = 9800000
-thin = 10
-M.sample(samples, burn, thin)
+if args.sampler == 'pymc':
+    M = pymc.MCMC(model(), db='ram')
+    samples = 10000000
+    burn = 9800000
+    thin = 10
+    M.sample(samples, burn, thin)
+    Ns = (samples - burn)//thin
+    ts.save(dbname, {name: M.trace(name)[:] for name in names},
+            meta={'sampler': 'pymc', 'samples': samples, 'burn': burn,
+                  'thin': thin})
+elif args.sampler == 'tempering':
+    # Every replica of every ladder starts from a random point of the grid
+    # of starting wavelengths, so all modes near the grid are explored.
+    rng = np.random.RandomState(args.seed)
+    n_chains = 8
+    grid = np.array(list(itertools.product(args.starts, repeat=3)))
+    x0 = np.empty((n_chains, args.temps, 5))
+    x0[..., 0] = 0.02
+    x0[..., 1:4] = grid[rng.randint(0, len(grid), (n_chains, args.temps))]
+    x0[..., 4] = 0.
+    scale0 = np.hstack((0.002, 0.02*np.abs(np.median(grid, axis=0)), 0.5))
+    M = am.parallel_tempering(log_likelihood, log_prior, x0, names,
+                              n_chains=n_chains, n_temps=args.temps,
+                              beta_min=1e-4, scale0=scale0, swap_every=20,
+                              n_adapt=50000, check_every=10000,
+                              max_iter=2000000, rhat_target=1.01,
+                              ess_target=2000., processes=args.processes,
+                              seed=args.seed)
+    print("Swap acceptance: " + ", ".join("{:1.2f}".format(a) for a in
+                                         M.swap_acceptance))
+else:
+    # Chains start scattered around the initial guess. The initial step is
+    # a few percent of each wavelength, the phase step is large because
+    # it is poorly constrained a priori.
+    rng = np.random.RandomState(args.seed)
+    n_chains = 8
+    scale0 = np.hstack((0.002, 0.02*np.maximum(np.abs([X0, Y0, Z0]), 100.),
+                        0.5))
+    x0 = p0 + scale0*rng.standard_normal((n_chains, 5))
+    x0 = np.clip(x0, lower + 1e-6*(upper - lower),
+                 upper - 1e-6*(upper - lower))
+    M = am.adaptive_metropolis(log_posterior, x0, names, n_chains=n_chains,
+                               scale0=scale0, n_adapt=50000,
+                               check_every=10000, max_iter=2000000,
+                               rhat_target=1.01, ess_target=2000.,
+                               seed=args.seed)
+
+if args.sampler != 'pymc':
+    print(M.summary())
+    if not M.converged:
+        print("WARNING: convergence targets not met after {} iterations."
+              "".format(M.n_evals))
+
+    meta = {'sampler': args.sampler, 'n_chains': M.chains.shape[0],
+            'rhat': M.rhat.tolist(), 'ess': M.ess.tolist(),
+            'converged': bool(M.converged), 'n_evals': int(M.n_evals),
+            'acceptance': float(M.acceptance)}
+    if args.sampler == 'tempering':
+        meta.update(betas=M.betas.tolist(),
+                    swap_acceptance=M.swap_acceptance.tolist())
+    ts.save(dbname, {name: M.trace(name) for name in names}, meta=meta)
+    Ns = len(M.trace('X'))
 
 # Analysis and plotting.
 phi_0 = M.trace('phi_0')[:]
@@ -283,9 +327,7 @@ axs[3].set_xlabel('$b$ ($10^{-4}$ m s$^{-2}$)')
 axs[4].plot(100.*PP, z, color='black')
 axs[4].set_xlabel('$\phi$ ($10^{-2}$ m$^2$ s$^{-2}$)')
 
-Ns = (samples - burn)/thin
-
-for i in xrange(0, Ns, 40):
+for i in xrange(0, Ns, max(Ns//500, 1)):
     params = [M.trace('phi_0')[i], M.trace('X')[i], M.trace('Y')[i],
               M.trace('Z')[i], M.trace('phase')[i]]
     axs[0].plot(100.*u_model(params, data), z, color='red', alpha=0.03)
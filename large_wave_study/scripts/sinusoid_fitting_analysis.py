@@ -24,6 +24,7 @@ import utils
 import emapex
 import plotting_functions as pf
 import float_advection_routines as far
+import trajectory_cache as tc
 import gravity_waves as gw
 
 try:
@@ -134,7 +135,9 @@ pfl = E77.get_profiles(26)
 params['z_0'] = np.nanmin(pfl.z)
 params['N'] = 2.0e-3
 
-X = far.model_verbose(phi_0, lx, ly, lz, phase_0, params)
+# Cached on disk, reruns with the same parameters skip the integration.
+mc = tc.ModelCache()
+X = mc(phi_0, lx, ly, lz, phase_0, params=params)
 X.u[:, 0] -= X.U
 
 fig, axs = plt.subplots(1, 6, sharey=True, figsize=(16,6))
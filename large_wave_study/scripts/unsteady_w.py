@@ -6,11 +6,13 @@ Created on Wed Mar 25 11:55:19 2015
 """
 
 import numpy as np
-import scipy as sp
 import matplotlib.pyplot as plt
 
 import emapex
 import gravity_waves as gw
+import batch_ode as bo
+import float_dynamics as fd
+import steady_flight as sf
 
 
 try:
@@ -20,44 +22,42 @@ except NameError:
     E77 = emapex.load(4977)
 
 
-def dXdt(X, t, z, rho, p, k, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g):
-    """The fully nonlinear equation of motion for a float."""
-
-    zs = X[0]
-    ws = X[1]
-
+def simulate(rhs, z, rho, p, ppos, X_0, t, *args):
+    """Integrate one float through one profile with the fixed step
+    integrator. The environment is tabulated once up front."""
     # Should these be reference profiles rather than measured? Or use time as
     # the interpolant instead.
-    rhoi = np.interp(zs, z, rho)
-    pi = np.interp(zs, z, p)
-    ki = np.interp(zs, z, k)
-
-    F_grav = g
-    F_buoy = -g*rhoi*V_0/M
-    F_comp = g*rhoi*V_0/M*alpha_p*(pi - p_0)
-    F_pist = -g*rhoi/M*alpha_k*(ki - k_0)
-    F_drag = -rhoi/M*CA*ws**2
-
-    dwsdt = F_grav + F_buoy + F_comp + F_pist + F_drag
+    table = fd.EnvironmentTable(z, {'rho': rho, 'p': p, 'ppos': ppos})
+    X = bo.rk4(rhs, X_0[np.newaxis], t, (table, np.zeros(1, int)) + args)
+    return X[:, 0]
 
-    dzsdt = ws
 
-    return np.array([dzsdt, dwsdt])
+def steady_params(wfi, hpid):
+    """Fitted steady flight parameters by name. Fits with separate drag
+    coefficients for ascending (even hpid) and descending profiles give the
+    CA of each half profile in hpid."""
+    params = dict(zip(wfi.param_names, wfi.pmean))
+    if 'CA_up' in params:
+        params['CA'] = np.where(np.asarray(hpid) % 2 == 0, params['CA_up'],
+                                params['CA_down'])
+    return params
 
 # %%
 
 Float = E76
 
-pfl = Float.get_profiles(186)
+hpid = 186
+pfl = Float.get_profiles(hpid)
 
 g = -9.8
-V_0 = Float.__wfi.pmean[0]
-CA = Float.__wfi.pmean[1]
-alpha_p = Float.__wfi.pmean[2]
-p_0 = Float.__wfi.pmean[3]
-alpha_k = Float.__wfi.pmean[4]
-k_0 = Float.__wfi.pmean[5]
-M = Float.__wfi.pmean[6]
+params = steady_params(Float.__wfi, hpid)
+V_0 = params['V_0']
+CA = params['CA']
+alpha_p = params['alpha_p']
+p_0 = params['p_0']
+alpha_k = params['alpha_ppos']
+k_0 = params['ppos_0']
+M = params['M']
 
 z = pfl.z[~np.isnan(pfl.z)]
 rho = pfl.interp(z, 'z', 'rho')
@@ -76,9 +76,9 @@ t_max = 11000.
 dt = 1.
 t = np.arange(0., t_max+dt, dt)
 
-args = (z, rho, p, k, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
+args = (V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
 
-X = sp.integrate.odeint(dXdt, X_0, t, args)
+X = simulate(fd.still_water_rhs, z, rho, p, k, X_0, t, *args)
 
 plt.figure()
 plt.plot(X[:, 1], X[:, 0])
@@ -116,12 +116,12 @@ t_max = 50.
 dt = 1.
 t = np.arange(0., t_max+dt, dt)
 
-args = (z, rho, p, k, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
+args = (V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
 
-X = sp.integrate.odeint(dXdt, X_0, t, args)
+X = simulate(fd.still_water_rhs, z, rho, p, k, X_0, t, *args)
 
-w_stdy = Float.__wfi.model_func((V_0, CA, alpha_p, p_0, alpha_k, k_0, M),
-                                (k, p, rho), 7*[None])
+w_stdy = sf.still_water_model((V_0, CA, alpha_p, p_0, alpha_k, k_0, M),
+                               (k, p, rho))
 
 plt.figure()
 plt.plot(X[:, 1], X[:, 0])
@@ -139,34 +139,6 @@ plt.grid()
 
 # %%
 
-
-def dX2dt(X, t, z, rho, p, ppos, wave, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g):
-    """The fully nonlinear equation of motion for a float."""
-
-    zs = X[0]
-    ws = X[1]
-
-    k, l, m, om, phi_0, N = wave
-
-    # Should these be reference profiles rather than measured? Or use time as
-    # the interpolant instead.
-    rhoi = np.interp(zs, z, rho)
-    pi = np.interp(zs, z, p)
-    pposi = np.interp(zs, z, ppos)
-    wi = gw.w(0., 0., zs, t, phi_0, k, l, m, om, N)
-
-    V = V_0*(1 + alpha_p*(pi + p_0)) + alpha_k*(pposi - k_0)
-
-    F_buoy = g - g*rhoi*V/M
-    F_drag = -(rhoi/M)*CA*np.abs(ws - wi)*(ws - wi)
-
-    dwsdt = F_buoy + F_drag
-
-    dzsdt = ws
-
-    return np.array([dzsdt, dwsdt])
-
-
 z = np.arange(-1500., -600.)
 rho = 1030.*np.ones_like(z)
 p = -z.copy()
@@ -205,12 +177,12 @@ g = -9.8
 alpha_p = 3.50e-6
 alpha_k = 1.58e-6
 
-args = (z, rho, p, ppos, wave, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
+args = (wave, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
 
-X = sp.integrate.odeint(dX2dt, X_0, t, args)
+X = simulate(fd.wave_rhs, z, rho, p, ppos, X_0, t, *args)
 
-w_stdy = -Float.__wfi.model_func((V_0, CA, alpha_p, p_0, alpha_k, k_0, M),
-                                 (ppos, p, rho), 7*[None])
+w_stdy = -sf.still_water_model((V_0, CA, alpha_p, p_0, alpha_k, k_0, M),
+                                (ppos, p, rho))
 
 w_stdyi = np.interp(X[:, 0], z, w_stdy)
 
@@ -221,4 +193,49 @@ plt.plot(X[:, 1] - w_stdyi, X[:, 0])
 plt.plot(gw.w(0., 0., X[:, 0], t, phi_0, k, l, m, om, N), X[:, 0])
 plt.xlabel('$w$ (m s$^{-1}$)')
 plt.ylabel('$z$ (m)')
-plt.grid()
\ No newline at end of file
+plt.grid()
+
+# %% Whole mission in one batch.
+
+# Every profile of the float is simulated at once, each float looking up its
+# own profile's environment, using the fitted steady model parameters.
+zs, rhos, ps, pposs = [], [], [], []
+X_0 = []
+hpids = []
+for i, hpid in enumerate(Float.hpid):
+    nans = np.isnan(Float.z[:, i]) | np.isnan(Float.Ws[:, i])
+    if np.sum(~nans) < 10:
+        continue
+    z = Float.z[~nans, i]
+    zs.append(z)
+    rhos.append(Float.rho[~nans, i])
+    ps.append(Float.P[~nans, i])
+    pposs.append(Float.ppos[~nans, i])
+    X_0.append([z[0], Float.Ws[~nans, i][0]])
+    hpids.append(hpid)
+
+table = fd.EnvironmentTable(zs, {'rho': rhos, 'p': ps, 'ppos': pposs})
+X_0 = np.asarray(X_0)
+pidx = np.arange(len(hpids))
+
+params = steady_params(Float.__wfi, hpids)
+V_0 = params['V_0']
+CA = params['CA']
+alpha_p = params['alpha_p']
+p_0 = params['p_0']
+alpha_k = params['alpha_ppos']
+k_0 = params['ppos_0']
+M = params['M']
+
+t_max = 11000.
+dt = 1.
+t = np.arange(0., t_max+dt, dt)
+
+args = (table, pidx, V_0, M, alpha_p, alpha_k, p_0, k_0, CA, g)
+Xs = bo.rk4(fd.still_water_rhs, X_0, t, args)
+
+plt.figure()
+plt.plot(t, Xs[:, :, 1], color='k', alpha=0.1)
+plt.xlabel('$t$ (s)')
+plt.ylabel('$w_s$ (m s$^{-1}$)')
+plt.grid()
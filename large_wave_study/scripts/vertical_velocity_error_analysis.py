@@ -18,6 +18,7 @@ import plotting_functions as pf
 import coloured_noise as cn
 import GM
 import vertical_velocity_model as vvm
+import profile_spectra as ps
 
 try:
     print("Floats {} and {}.".format(E76.floatID, E77.floatID))
@@ -147,40 +148,24 @@ for Float in [E76, E77]:
 
     z = np.arange(zmin, zmax, dz)
     t = np.arange(tmin, tmax, dt)
-    ng, __, wt = Float.get_interp_grid(hpids, t, 'dUTC', 'Ww')
-#    __, __, wz = Float.get_interp_grid(hpids, z, 'z', 'Ww')
-    __, __, pt = Float.get_interp_grid(hpids, t, 'dUTC', 'P')
-
-    Pts = []
-    Pzs = []
-    PPts = []
-
-    for i in ng[0, :]:
-
-        f, Pt = sp.signal.periodogram(wt[:, i], fs=1./dt, window=window)
-        __, PPt = sp.signal.periodogram(pt[:, i], fs=1./dt, window=window)
-#        m, Pz = sp.signal.periodogram(wz[:, i], fs=1./dz, window=window)
-
-        Pts.append(Pt)
-        PPts.append(PPt)
-#        Pzs.append(Pz)
-
-    Pts = np.asarray(Pts).T
-    PPts = np.asarray(PPts).T
-#    Pzs = np.asarray(Pzs).T
+    f, Pts, Ptmed = ps.get_spectra(Float, hpids, t, 'dUTC', 'Ww',
+                                   window=window, quantiles=50.)
+#    m, Pzs = ps.get_spectra(Float, hpids, z, 'z', 'Ww', window=window)
+    __, PPts, PPtmed = ps.get_spectra(Float, hpids, t, 'dUTC', 'P',
+                                      window=window, quantiles=50.)
 
     # Chop interpolation noise.
     fuse = f < 1./tres
 #    muse = m < 1./zres
-    f, Pts, PPts = f[fuse], Pts[fuse, :], PPts[fuse, :]
+    f, Ptmed, PPtmed = f[fuse], Ptmed[fuse], PPtmed[fuse]
 #    m, Pzs = m[muse], Pzs[muse, :]
-    Pts[0, :], PPts[0, :] = 0., 0.
+    Ptmed[0], PPtmed[0] = 0., 0.
 
     # Convert to radian units.
 
-    axs[0].loglog(1./f, np.median(Pts, axis=-1), linewidth=3., alpha=0.7,
+    axs[0].loglog(1./f, Ptmed, linewidth=3., alpha=0.7,
                   label=Float.floatID)
-    axs[1].loglog(1./f, np.median(PPts, axis=-1), linewidth=3., alpha=0.7,
+    axs[1].loglog(1./f, PPtmed, linewidth=3., alpha=0.7,
                   label=Float.floatID)
 
 
@@ -210,16 +195,16 @@ fig, ax = plt.subplots(1, 1, sharex='col', figsize=(3.125, 3))
 for Float in [E76, E77]:
 
     z = np.arange(zmin, zmax, dz)
-    ng, __, wt = Float.get_interp_grid(hpids, z, 'z', 'Ww')
-
-    m, Pzs = sp.signal.periodogram(wt, fs=1./dz, window=window, axis=0)
+    m, Pzs, Pzmed = ps.get_spectra(Float, hpids, z, 'z', 'Ww', window=window,
+                                   quantiles=50.)
     # Convert to angular units
     Pzs /= 2.*np.pi
+    Pzmed /= 2.*np.pi
 
     # Chop interpolation noise.
     muse = m < 1./zres
-    m, Pzs = m[muse], Pzs[muse, :]
-    Pzs[0, :] = 0.
+    m, Pzs, Pzmed = m[muse], Pzs[muse, :], Pzmed[muse]
+    Pzs[0, :], Pzmed[0] = 0., 0.
 
     if Float.floatID == 4977:
         label = 'Floats'
@@ -235,7 +220,7 @@ for Float in [E76, E77]:
 
     ax.loglog(m, Pzs, color='grey', linewidth=2.,
               alpha=0.01, label=None)
-    ax.loglog(m, np.median(Pzs, axis=-1), '-k', linewidth=2.,
+    ax.loglog(m, Pzmed, '-k', linewidth=2.,
               alpha=1, label=label)
 
 
@@ -368,25 +353,25 @@ for j, Float in enumerate([E76, E77]):
 
     pfls = Float.get_profiles(hpids)
 
-    om_pgrams = np.empty((om.size, pfls.size))
-    m_pgrams = np.empty((m.size, pfls.size))
+    ws, ts, zs = [], [], []
 
-    for i, pfl in enumerate(pfls):
+    for pfl in pfls:
         nans = np.isnan(pfl.Ww)
         w = pfl.Ww[~nans]
         t = pfl.UTC[~nans]*24*60*60
         z = pfl.z[~nans]
 
         invalid = (z > zmax) | (z < zmin)
-        w = w[~invalid]
-        t = t[~invalid]
-        z = z[~invalid]
+        ws.append(w[~invalid])
+        ts.append(t[~invalid])
+        zs.append(z[~invalid])
 
-        om_pgrams[:, i] = sp.signal.lombscargle(t, w, om)/om
-        m_pgrams[:, i] = sp.signal.lombscargle(t, w, m)/m
+    # All profiles at once.
+    om_pgrams = ps.lombscargle(ts, ws, om)/om[:, np.newaxis]
+    m_pgrams = ps.lombscargle(zs, ws, m)/m[:, np.newaxis]
 
     f = om/(np.pi*2)
-    m = m/(np.pi*2)
+    mf = m/(np.pi*2)
 
     ax1.loglog(1./f, om_pgrams, color='grey', alpha=0.05)
     ax1.loglog(1./f, np.median(om_pgrams, axis=-1), color='black',
@@ -394,8 +379,8 @@ for j, Float in enumerate([E76, E77]):
 
 
 
-#    ax2.loglog(1./m, m_pgrams, color='grey', alpha=0.05)
-#    ax2.loglog(1./m, np.median(m_pgrams, axis=-1), color='black',
+#    ax2.loglog(1./mf, m_pgrams, color='grey', alpha=0.05)
+#    ax2.loglog(1./mf, np.median(m_pgrams, axis=-1), color='black',
 #               linewidth=3.)
 
 
@@ -0,0 +1,599 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:31:40 2026
+
+@author: jc3e13
+
+Adaptive Metropolis sampling with convergence based stopping.
+
+Running a fixed, very long chain and discarding nearly all of it wastes most
+likelihood evaluations and says nothing about convergence. Here several
+chains are run side by side (the log posterior is evaluated for all chains
+in one call so vectorised models pay off), the Gaussian proposal covariance
+is adapted to the chain history during warm up (Haario et al. 2001) and is
+then frozen. Sampling stops as soon as the split-R-hat and effective sample
+size of every parameter meet their targets (Gelman et al. 2013, Vehtari et
+al. 2021), or at a maximum number of iterations.
+
+The result mimics the pymc MCMC trace interface, e.g. M.trace('X')[:].
+
+For multimodal posteriors parallel_tempering runs a ladder of tempered
+replicas of every chain, spread over processes, and exchanges states between
+neighbouring temperatures so the cold chains can hop between modes.
+
+"""
+
+import multiprocessing as mp
+import numpy as np
+
+
+def split_rhat(chains):
+    """
+    Split potential scale reduction factor.
+
+    Parameters
+    ----------
+    chains : ndarray
+        Samples with shape (n_chains, n_samples) or (n_chains, n_samples, d).
+
+    Returns
+    -------
+    rhat : float or ndarray
+        One value per parameter.
+
+    """
+    chains = np.asarray(chains, dtype=float)
+    n = chains.shape[1]//2
+    # Split every chain in half to detect trends within chains.
+    halves = np.concatenate((chains[:, :n], chains[:, -n:]), axis=0)
+
+    W = np.mean(np.var(halves, axis=1, ddof=1), axis=0)
+    B = n*np.var(np.mean(halves, axis=1), axis=0, ddof=1)
+    var_plus = (n - 1.)/n*W + B/n
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(var_plus/W)
+
+
+def _autocovariance(x):
+    """Autocovariance of each row of x along axis 1, by FFT."""
+    n = x.shape[1]
+    nfft = 2**int(np.ceil(np.log2(2*n)))
+    x = x - np.mean(x, axis=1, keepdims=True)
+    xft = np.fft.rfft(x, nfft, axis=1)
+    return np.fft.irfft(xft*xft.conj(), nfft, axis=1)[:, :n]/n
+
+
+def effective_sample_size(chains):
+    """
+    Effective sample size of multiple chains using Geyer's initial monotone
+    sequence estimator on split chains.
+
+    Parameters
+    ----------
+    chains : ndarray
+        Samples with shape (n_chains, n_samples) or (n_chains, n_samples, d).
+
+    Returns
+    -------
+    ess : float or ndarray
+        One value per parameter.
+
+    """
+    chains = np.asarray(chains, dtype=float)
+
+    if chains.ndim == 3:
+        return np.array([effective_sample_size(chains[:, :, i])
+                         for i in range(chains.shape[2])])
+
+    n = chains.shape[1]//2
+    halves = np.concatenate((chains[:, :n], chains[:, -n:]), axis=0)
+    m = halves.shape[0]
+
+    acov = _autocovariance(halves)
+    W = np.mean(acov[:, 0])*n/(n - 1.)
+    var_plus = W*(n - 1.)/n + np.var(np.mean(halves, axis=1), ddof=1)
+
+    if var_plus == 0.:
+        return float(m*n)
+
+    rho = 1. - (W - np.mean(acov, axis=0))/var_plus
+    rho[0] = 1.
+
+    # Sum of autocorrelation pairs while positive, forced monotone.
+    npairs = (n - 1)//2
+    pairs = rho[:2*npairs:2] + rho[1:2*npairs:2]
+    if np.any(pairs <= 0.):
+        pairs = pairs[:np.argmax(pairs <= 0.)]
+    pairs = np.minimum.accumulate(pairs)
+
+    tau = -1. + 2.*np.sum(pairs)
+    tau = max(tau, 1./np.log10(m*n))
+
+    return m*n/tau
+
+
+class AdaptiveResult(object):
+    """
+    Output of adaptive_metropolis.
+
+    Attributes
+    ----------
+    names : list of str
+        Parameter names.
+    chains : ndarray
+        Post warm up samples, (n_chains, n_samples, n_params).
+    logp : ndarray
+        Log posterior of the samples, (n_chains, n_samples).
+    rhat, ess : ndarray
+        Convergence diagnostics at the end of sampling.
+    converged : bool
+        Whether the targets were met before max_iter.
+    n_evals : int
+        Total number of log posterior evaluations (per chain).
+    acceptance : float
+        Post warm up acceptance rate.
+    cov : ndarray
+        Final proposal covariance.
+
+    """
+
+    def __init__(self, names, chains, logp, rhat, ess, converged, n_evals,
+                 acceptance, cov, thin=1):
+        self.names = list(names)
+        self.chains = chains
+        self.logp = logp
+        self.rhat = rhat
+        self.ess = ess
+        self.converged = converged
+        self.n_evals = n_evals
+        self.acceptance = acceptance
+        self.cov = cov
+        self.thin = thin
+
+    def trace(self, name):
+        """Pooled, thinned samples of one parameter from all chains."""
+        i = self.names.index(name)
+        return self.chains[:, ::self.thin, i].flatten()
+
+    def summary(self):
+        """Mean, standard deviation, R-hat and ESS of every parameter."""
+        lines = ["{:>8s} {:>12s} {:>12s} {:>7s} {:>8s}".format(
+            'name', 'mean', 'std', 'R-hat', 'ESS')]
+        for i, name in enumerate(self.names):
+            x = self.chains[:, :, i]
+            lines.append("{:>8s} {:12.4g} {:12.4g} {:7.4f} {:8.0f}".format(
+                name, np.mean(x), np.std(x), self.rhat[i], self.ess[i]))
+        return '\n'.join(lines)
+
+
+def adaptive_metropolis(log_posterior, x0, names, n_chains=8, scale0=None,
+                        n_adapt=20000, adapt_every=100, check_every=5000,
+                        max_iter=1000000, rhat_target=1.01, ess_target=1000.,
+                        thin=1, seed=None, verbose=True):
+    """
+    Adaptive Metropolis sampler that stops once converged.
+
+    Parameters
+    ----------
+    log_posterior : function
+        Takes an (n_chains, n_params) array and returns the log posterior of
+        every row, -inf outside the prior support.
+    x0 : array_like
+        Starting point (n_params,) shared by all chains, or one starting point
+        per chain (n_chains, n_params).
+    names : list of str
+        Parameter names.
+    n_chains : int, optional
+        Number of chains, at least 2 for R-hat.
+    scale0 : array_like, optional
+        Initial proposal standard deviation of each parameter. Defaults to
+        1% of |x0|, or 1 where x0 is zero.
+    n_adapt : int, optional
+        Warm up iterations during which the proposal is adapted. Warm up
+        samples are discarded.
+    adapt_every : int, optional
+        Iterations between proposal covariance updates during warm up.
+    check_every : int, optional
+        Iterations between convergence checks after warm up.
+    max_iter : int, optional
+        Maximum post warm up iterations.
+    rhat_target : float, optional
+        Stop when split-R-hat of every parameter is below this...
+    ess_target : float, optional
+        ...and the effective sample size of every parameter is above this.
+    thin : int, optional
+        Thinning applied by AdaptiveResult.trace.
+    seed : int, optional
+        Random seed.
+    verbose : bool, optional
+        Print diagnostics at every check.
+
+    Returns
+    -------
+    result : AdaptiveResult
+
+    """
+    rng = np.random.RandomState(seed)
+
+    x0 = np.asarray(x0, dtype=float)
+    d = x0.shape[-1]
+    x = np.array(np.broadcast_to(x0, (n_chains, d)))
+
+    if scale0 is None:
+        scale0 = 0.01*np.abs(x0.reshape(-1, d)[0])
+        scale0[scale0 == 0.] = 1.
+    cov = np.diag(np.asarray(scale0, dtype=float)**2)
+
+    # Optimal scaling for Gaussian targets (Gelman et al. 1996).
+    sd = 2.38**2/d
+
+    logp = np.asarray(log_posterior(x), dtype=float)
+    if not np.all(np.isfinite(logp)):
+        raise ValueError('Starting points must have finite log posterior.')
+
+    def step(x, logp, chol):
+        xp = x + rng.standard_normal((n_chains, d)).dot(chol.T)
+        logpp = np.asarray(log_posterior(xp), dtype=float)
+        accept = np.log(rng.uniform(size=n_chains)) < logpp - logp
+        x = np.where(accept[:, np.newaxis], xp, x)
+        logp = np.where(accept, logpp, logp)
+        return x, logp, accept
+
+    # Warm up with adaptation.
+    history = np.empty((n_adapt, n_chains, d))
+    chol = np.linalg.cholesky(cov)
+    for i in range(n_adapt):
+        x, logp, __ = step(x, logp, chol)
+        history[i] = x
+
+        if (i + 1) % adapt_every == 0 and i + 1 >= 2*adapt_every:
+            # Use the latter half of the history so early transients are
+            # forgotten.
+            recent = history[(i + 1)//2:i + 1].reshape(-1, d)
+            emp = np.cov(recent, rowvar=False)
+            new_cov = sd*emp + 1e-10*np.diag(np.diag(emp) + 1e-30)
+            try:
+                chol = np.linalg.cholesky(new_cov)
+                cov = new_cov
+            except np.linalg.LinAlgError:
+                pass
+
+    del history
+
+    # Sampling with a frozen proposal.
+    blocks = []
+    logp_blocks = []
+    naccept = 0
+    niter = 0
+    converged = False
+    rhat = np.full(d, np.nan)
+    ess = np.zeros(d)
+
+    while niter < max_iter:
+        nblock = min(check_every, max_iter - niter)
+        block = np.empty((n_chains, nblock, d))
+        logp_block = np.empty((n_chains, nblock))
+        for i in range(nblock):
+            x, logp, accept = step(x, logp, chol)
+            block[:, i] = x
+            logp_block[:, i] = logp
+            naccept += np.sum(accept)
+
+        blocks.append(block)
+        logp_blocks.append(logp_block)
+        niter += nblock
+
+        chains = np.concatenate(blocks, axis=1)
+        rhat = split_rhat(chains)
+        ess = effective_sample_size(chains)
+
+        if verbose:
+            print("{:d} iterations, max R-hat {:1.4f}, min ESS {:1.0f}, "
+                  "acceptance {:1.2f}".format(niter, np.max(rhat),
+                                              np.min(ess),
+                                              naccept/float(niter*n_chains)))
+
+        if np.all(rhat < rhat_target) and np.all(ess > ess_target):
+            converged = True
+            break
+
+    return AdaptiveResult(names, np.concatenate(blocks, axis=1),
+                          np.concatenate(logp_blocks, axis=1), rhat, ess,
+                          converged, n_adapt + niter,
+                          naccept/float(max(niter, 1)*n_chains), cov, thin)
+
+
+# Log likelihood and log prior used by the tempering workers, set by
+# _init_tempering_worker so that the functions are not sent with every task.
+_shared = {}
+
+
+def _init_tempering_worker(log_likelihood, log_prior):
+    _shared.clear()
+    _shared['log_likelihood'] = log_likelihood
+    _shared['log_prior'] = log_prior
+
+
+def _tempered_steps(args):
+    """
+    Advance a group of temperatures of every chain by n_steps Metropolis
+    steps. Each temperature has its own random stream so the result does not
+    depend on how temperatures are grouped over processes.
+
+    Returns the new state, the acceptance counts, the sums and sums of outer
+    products of the visited states of each temperature (for adaptation) and
+    the visited states of the first temperature of the group.
+
+    """
+    seeds, x, ll, lp, betas, chols, n_steps = args
+    log_likelihood = _shared['log_likelihood']
+    log_prior = _shared['log_prior']
+
+    n_chains, n_temps, d = x.shape
+    rngs = [np.random.RandomState(seed) for seed in seeds]
+
+    naccept = np.zeros(n_temps)
+    xsum = np.zeros((n_temps, d))
+    xxsum = np.zeros((n_temps, d, d))
+    first = np.empty((n_chains, n_steps, d))
+    first_logp = np.empty((n_chains, n_steps))
+
+    for i in range(n_steps):
+        z = np.stack([rng.standard_normal((n_chains, d)) for rng in rngs],
+                     axis=1)
+        logu = np.log(np.stack([rng.uniform(size=n_chains) for rng in rngs],
+                               axis=1))
+
+        xp = x + np.einsum('tij,ctj->cti', chols, z)
+        lpp = np.asarray(log_prior(xp.reshape(-1, d)),
+                         dtype=float).reshape(n_chains, n_temps)
+        llp = np.full_like(lpp, -np.inf)
+        inside = np.isfinite(lpp)
+        if np.any(inside):
+            llp[inside] = log_likelihood(xp[inside])
+
+        with np.errstate(invalid='ignore'):
+            logr = lpp + betas*llp - lp - betas*ll
+        accept = inside & np.isfinite(llp) & (logu < logr)
+
+        x = np.where(accept[..., np.newaxis], xp, x)
+        ll = np.where(accept, llp, ll)
+        lp = np.where(accept, lpp, lp)
+
+        naccept += np.sum(accept, axis=0)
+        xsum += np.sum(x, axis=0)
+        xxsum += np.einsum('cti,ctj->tij', x, x)
+        first[:, i] = x[:, 0]
+        first_logp[:, i] = lp[:, 0] + ll[:, 0]
+
+    return x, ll, lp, naccept, xsum, xxsum, first, first_logp
+
+
+def temperature_ladder(n_temps, beta_min):
+    """Geometrically spaced inverse temperatures from 1 to beta_min."""
+    if n_temps == 1:
+        return np.array([1.])
+    return np.logspace(0., np.log10(beta_min), n_temps)
+
+
+def parallel_tempering(log_likelihood, log_prior, x0, names, n_chains=8,
+                       n_temps=16, beta_min=1e-3, betas=None, scale0=None,
+                       swap_every=20, n_adapt=20000, check_every=5000,
+                       max_iter=1000000, rhat_target=1.01, ess_target=1000.,
+                       thin=1, processes=1, seed=None, verbose=True):
+    """
+    Parallel tempering with adaptive proposals and convergence based
+    stopping.
+
+    Every chain is a ladder of replicas targeting prior*likelihood**beta.
+    Replicas take swap_every adaptive Metropolis steps (the ladder is split
+    into contiguous groups, one per process), then states are exchanged
+    between neighbouring temperatures. Only the beta = 1 replicas are
+    samples of the posterior, convergence is judged on those.
+
+    Parameters
+    ----------
+    log_likelihood : function
+        Takes an (n, n_params) array and returns n log likelihoods. Only
+        called for points inside the prior support.
+    log_prior : function
+        Takes an (n, n_params) array and returns n log prior densities, -inf
+        outside the support.
+    x0 : array_like
+        Starting points, (n_params,), (n_chains, n_params) or
+        (n_chains, n_temps, n_params).
+    names : list of str
+        Parameter names.
+    n_chains : int, optional
+        Number of independent ladders, at least 2 for R-hat.
+    n_temps : int, optional
+        Number of temperatures if betas is not given.
+    beta_min : float, optional
+        Inverse temperature of the hottest replica if betas is not given.
+    betas : array_like, optional
+        Decreasing inverse temperatures starting at 1.
+    scale0 : array_like, optional
+        Initial proposal standard deviation of each parameter, the same for
+        all temperatures. Hotter replicas adapt to larger steps.
+    swap_every : int, optional
+        Steps between exchange attempts. This is also the amount of work
+        sent to each process at a time.
+    n_adapt, check_every, max_iter, rhat_target, ess_target, thin :
+        As for adaptive_metropolis, in iterations of the cold chain. They
+        are rounded up to multiples of swap_every.
+    processes : int, optional
+        Number of processes the temperature ladder is split over, None for
+        all cores. Results do not depend on it.
+    seed : int, optional
+        Random seed.
+    verbose : bool, optional
+        Print diagnostics at every check.
+
+    Returns
+    -------
+    result : AdaptiveResult
+        With the extra attributes betas and swap_acceptance (acceptance rate
+        of exchanges between temperature i and i + 1).
+
+    """
+    if betas is None:
+        betas = temperature_ladder(n_temps, beta_min)
+    betas = np.asarray(betas, dtype=float)
+    n_temps = betas.size
+    if betas[0] != 1.:
+        raise ValueError('The first inverse temperature must be 1.')
+
+    if processes is None:
+        processes = mp.cpu_count()
+    processes = max(1, min(processes, n_temps))
+
+    rng = np.random.RandomState(seed)
+
+    x0 = np.asarray(x0, dtype=float)
+    d = x0.shape[-1]
+    if x0.ndim == 2:
+        x0 = x0[:, np.newaxis, :]
+    x = np.array(np.broadcast_to(x0, (n_chains, n_temps, d)))
+
+    if scale0 is None:
+        scale0 = 0.01*np.abs(x0.reshape(-1, d)[0])
+        scale0[scale0 == 0.] = 1.
+    cov = np.tile(np.diag(np.asarray(scale0, dtype=float)**2),
+                  (n_temps, 1, 1))
+    chols = np.linalg.cholesky(cov)
+    sd = 2.38**2/d
+
+    lp = np.asarray(log_prior(x.reshape(-1, d)),
+                    dtype=float).reshape(n_chains, n_temps)
+    if not np.all(np.isfinite(lp)):
+        raise ValueError('Starting points must be inside the prior support.')
+    ll = np.asarray(log_likelihood(x.reshape(-1, d)),
+                    dtype=float).reshape(n_chains, n_temps)
+    if not np.all(np.isfinite(ll)):
+        raise ValueError('Starting points must have finite likelihood.')
+
+    groups = np.array_split(np.arange(n_temps), processes)
+    n_adapt_rounds = -(-n_adapt//swap_every)
+    check_rounds = max(1, -(-check_every//swap_every))
+    max_rounds = -(-max_iter//swap_every)
+
+    if processes > 1:
+        pool = mp.Pool(processes, initializer=_init_tempering_worker,
+                       initargs=(log_likelihood, log_prior))
+        mapper = pool.map
+    else:
+        _init_tempering_worker(log_likelihood, log_prior)
+        mapper = map
+
+    # Per round sums of states for adapting the proposals.
+    stats = []
+    nswap = np.zeros(n_temps - 1)
+    nswap_tries = np.zeros(n_temps - 1)
+    naccept = 0
+    blocks = []
+    logp_blocks = []
+    converged = False
+    rhat = np.full(d, np.nan)
+    ess = np.zeros(d)
+    niter = 0
+
+    try:
+        for rnd in range(n_adapt_rounds + max_rounds):
+            warm = rnd < n_adapt_rounds
+            seeds = rng.randint(0, 2**31 - 1, n_temps)
+            tasks = [(seeds[g], x[:, g], ll[:, g], lp[:, g], betas[g],
+                      chols[g], swap_every) for g in groups]
+            results = list(mapper(_tempered_steps, tasks))
+
+            xsum = np.zeros((n_temps, d))
+            xxsum = np.zeros((n_temps, d, d))
+            for g, (xg, llg, lpg, nacc, xs, xxs, first,
+                    first_logp) in zip(groups, results):
+                x[:, g] = xg
+                ll[:, g] = llg
+                lp[:, g] = lpg
+                xsum[g] = xs
+                xxsum[g] = xxs
+            cold, cold_logp, cold_nacc = (results[0][6], results[0][7],
+                                          results[0][3][0])
+
+            # Exchange states between neighbours, alternating between even
+            # and odd pairs so every pair is tried every other round.
+            for t in range(rnd % 2, n_temps - 1, 2):
+                logr = (betas[t] - betas[t + 1])*(ll[:, t + 1] - ll[:, t])
+                swap = np.log(rng.uniform(size=n_chains)) < logr
+                for arr in (x, ll, lp):
+                    tmp = arr[swap, t].copy()
+                    arr[swap, t] = arr[swap, t + 1]
+                    arr[swap, t + 1] = tmp
+                nswap[t] += np.sum(swap)
+                nswap_tries[t] += n_chains
+
+            if warm:
+                stats.append((xsum, xxsum))
+                if rnd >= 1:
+                    # Latter half of the warm up so far.
+                    recent = stats[len(stats)//2:]
+                    n = len(recent)*swap_every*n_chains
+                    mean = sum(s[0] for s in recent)/n
+                    emp = (sum(s[1] for s in recent)/n -
+                           np.einsum('ti,tj->tij', mean, mean))*n/(n - 1.)
+                    for t in range(n_temps):
+                        new_cov = sd*emp[t] + 1e-10*np.diag(
+                            np.diag(emp[t]) + 1e-30)
+                        try:
+                            chols[t] = np.linalg.cholesky(new_cov)
+                            cov[t] = new_cov
+                        except np.linalg.LinAlgError:
+                            pass
+                if rnd == n_adapt_rounds - 1:
+                    del stats
+                    nswap[:] = 0.
+                    nswap_tries[:] = 0.
+                continue
+
+            blocks.append(cold)
+            logp_blocks.append(cold_logp)
+            naccept += cold_nacc
+            niter += swap_every
+
+            if (rnd - n_adapt_rounds + 1) % check_rounds != 0:
+                continue
+
+            chains = np.concatenate(blocks, axis=1)
+            rhat = split_rhat(chains)
+            ess = effective_sample_size(chains)
+
+            if verbose:
+                print("{:d} iterations, max R-hat {:1.4f}, min ESS {:1.0f}, "
+                      "acceptance {:1.2f}, min swap rate {:1.2f}".format(
+                          niter, np.max(rhat), np.min(ess),
+                          naccept/float(niter*n_chains),
+                          np.min(nswap/np.maximum(nswap_tries, 1.))
+                          if n_temps > 1 else 0.))
+
+            if np.all(rhat < rhat_target) and np.all(ess > ess_target):
+                converged = True
+                break
+
+    finally:
+        if processes > 1:
+            pool.close()
+            pool.join()
+        _shared.clear()
+
+    chains = np.concatenate(blocks, axis=1)
+    if not converged:
+        rhat = split_rhat(chains)
+        ess = effective_sample_size(chains)
+
+    result = AdaptiveResult(names, chains,
+                            np.concatenate(logp_blocks, axis=1), rhat, ess,
+                            converged, (n_adapt_rounds*swap_every + niter),
+                            naccept/float(max(niter, 1)*n_chains), cov[0],
+                            thin)
+    result.betas = betas
+    result.swap_acceptance = nswap/np.maximum(nswap_tries, 1.)
+
+    return result
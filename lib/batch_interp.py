@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:12:55 2026
+
+@author: jc3e13
+
+Linear interpolation of many columns at once.
+
+Float data are (depth x profile) arrays with NaN padding below the end of
+each profile. Interpolating every profile onto its own target coordinates
+used to be a Python loop of np.interp calls, one per profile and variable.
+Here the valid points of all columns are laid out end to end in one sorted
+array, each column offset so that its coordinates lie above those of the
+column before, and all targets are located with a single searchsorted.
+Several variables sharing the same coordinate reuse the search.
+
+    import batch_interp as bi
+    __, idxs = Float.get_profiles(hpids, ret_idxs=True)
+    iZ, X = bi.interp_columns(it, Float.dUTC[:, idxs],
+                              [Float.z[:, idxs], Float.dist_ctd[:, idxs]])
+
+"""
+
+import numpy as np
+
+
+class ColumnInterpolator(object):
+    """
+    Interpolator from ragged, NaN padded columns.
+
+    Parameters
+    ----------
+    x : 2D array
+        Coordinates, (n, ncols). Points where x is NaN are ignored and the
+        remaining points of each column are sorted.
+
+    The result of interpolating a column matches np.interp on its valid,
+    sorted points: values beyond the ends are held constant, columns with
+    no valid points give NaN.
+
+    """
+
+    def __init__(self, x):
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            x = x[:, np.newaxis]
+        self.shape = x.shape
+        n, ncols = x.shape
+
+        good = ~np.isnan(x)
+        self.counts = good.sum(axis=0)
+        self.starts = np.hstack((0, np.cumsum(self.counts)[:-1]))
+
+        # Valid points column by column (Fortran order), keeping their flat
+        # index so values can be gathered in the same order.
+        goodT = good.T
+        self.src = np.flatnonzero(goodT.ravel())
+        self.src = (self.src % n)*ncols + self.src//n
+        xv = x.T[goodT]
+        cv = np.repeat(np.arange(ncols), self.counts)
+
+        # Offsetting each column by more than the range of all coordinates
+        # makes the keys increase through the whole flat array once each
+        # column is sorted.
+        if xv.size > 0:
+            self._xmin = xv.min()
+            self._span = 2.*(xv.max() - self._xmin) + 1.
+        else:
+            self._xmin, self._span = 0., 1.
+        keys = self._key(xv, cv)
+
+        if np.any(np.diff(keys) < 0.):
+            order = np.argsort(keys, kind='mergesort')
+            keys, xv, self.src = keys[order], xv[order], self.src[order]
+
+        self.x = xv
+        self._keys = keys
+
+    def _key(self, x, cols):
+        return cols*self._span + (x - self._xmin)
+
+    def weights(self, xq):
+        """
+        Interpolation indices and weights for targets xq, (m, ncols).
+
+        Returns
+        -------
+        lo, hi : int arrays
+            Indices into the flat valid points of the lower and upper
+            neighbours.
+        frac : array
+            Weight of the upper neighbour, NaN where the target is NaN or its
+            column has no data.
+
+        """
+        xq = np.asarray(xq, dtype=float)
+        if xq.ndim == 1:
+            xq = xq[:, np.newaxis]
+        if xq.shape[1] != self.shape[1]:
+            raise ValueError("Targets have {} columns, data have {}."
+                             .format(xq.shape[1], self.shape[1]))
+
+        # Work column by column in memory, searching is much faster when
+        # neighbouring queries are close.
+        xq = xq.T
+        cols = np.arange(xq.shape[0])[:, np.newaxis]
+        starts = self.starts[:, np.newaxis]
+        counts = self.counts[:, np.newaxis]
+
+        with np.errstate(invalid='ignore'):
+            keys = self._key(np.clip(xq, self._xmin,
+                                     self._xmin + 0.5*self._span), cols)
+        i = np.searchsorted(self._keys, np.nan_to_num(keys), side='right') - 1
+
+        # Stay within the column, the last interval of a column being used
+        # beyond its upper end.
+        lo = np.clip(i, starts, starts + np.maximum(counts - 2, 0))
+        hi = np.minimum(lo + 1, starts + np.maximum(counts - 1, 0))
+        lo = np.minimum(lo, self.x.size - 1)
+        hi = np.minimum(hi, self.x.size - 1)
+
+        if self.x.size == 0:
+            return lo.T, hi.T, np.full(xq.T.shape, np.nan)
+
+        x0, x1 = self.x[lo], self.x[hi]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.where(x1 > x0, (xq - x0)/(x1 - x0),
+                            (xq >= x1).astype(float))
+        np.clip(frac, 0., 1., out=frac)
+        frac[np.isnan(xq) | (counts == 0)] = np.nan
+
+        return lo.T, hi.T, frac.T
+
+    def __call__(self, xq, ys):
+        """
+        Interpolate one or several variables to targets xq.
+
+        Parameters
+        ----------
+        xq : 2D array
+            Targets, (m, ncols), one column of targets per data column.
+        ys : 2D array or list of 2D arrays
+            Values at x, same shape as x. Values that are NaN where x is valid
+            are propagated to the targets that use them.
+
+        Returns
+        -------
+        yq : 2D array or list of 2D arrays
+            Interpolated values, (m, ncols).
+
+        """
+        lo, hi, frac = self.weights(xq)
+
+        single = not isinstance(ys, (list, tuple))
+        if single:
+            ys = [ys]
+
+        out = []
+        for y in ys:
+            y = np.asarray(y, dtype=float).reshape(self.shape).ravel()
+            yv = y[self.src]
+            if yv.size == 0:
+                out.append(np.full(frac.shape, np.nan))
+                continue
+            y0, y1 = yv[lo], yv[hi]
+            out.append(y0 + frac*(y1 - y0))
+
+        return out[0] if single else out
+
+
+def interp_columns(xq, x, ys):
+    """
+    Interpolate each column of ys, with coordinates the same column of x, to
+    the same column of xq. See ColumnInterpolator.
+    """
+    return ColumnInterpolator(x)(xq, ys)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:14:37 2026
+
+@author: jc3e13
+
+Fixed step integration of many independent ODE systems at once.
+
+odeint integrates one system per call and calls the right hand side once
+per internal step, so sweeping a model over a grid of parameters is a Python
+loop around a Python loop. Here the states of all systems are stacked along
+the first axis and advanced together with the classical fourth order
+Runge-Kutta scheme, so every right hand side evaluation is a single numpy
+operation over the whole batch. Parameters may be scalars or arrays that
+broadcast against the batch.
+
+The right hand side has the odeint call signature, func(y, t, *args).
+
+"""
+
+import numpy as np
+
+import gravity_wave_fields as gwf
+
+
+def rk4(func, y0, t, args=(), substeps=1):
+    """
+    Integrate a batch of ODE systems with fixed step fourth order
+    Runge-Kutta.
+
+    Parameters
+    ----------
+    func : function
+        Right hand side, func(y, t, *args) returning dy/dt with the shape of
+        y.
+    y0 : array_like
+        Initial states, e.g. (n_systems, n_vars).
+    t : 1D array
+        Output times, the first being the initial time. Steps are the
+        intervals between output times.
+    args : tuple, optional
+        Extra arguments of func.
+    substeps : int, optional
+        Number of equal steps per output interval.
+
+    Returns
+    -------
+    y : ndarray
+        States at the output times, shape (len(t),) + y0.shape.
+
+    """
+    y = np.array(y0, dtype=float)
+    t = np.asarray(t, dtype=float)
+
+    out = np.empty((len(t),) + y.shape)
+    out[0] = y
+
+    for i in range(len(t) - 1):
+        h = (t[i + 1] - t[i])/substeps
+        ti = t[i]
+        for __ in range(substeps):
+            k1 = func(y, ti, *args)
+            k2 = func(y + 0.5*h*k1, ti + 0.5*h, *args)
+            k3 = func(y + 0.5*h*k2, ti + 0.5*h, *args)
+            k4 = func(y + h*k3, ti + h, *args)
+            y = y + h/6.*(k1 + 2.*k2 + 2.*k3 + k4)
+            ti += h
+        out[i + 1] = y
+
+    return out
+
+
+def wave_drdt(r, t, phi_0, k, l, m, N=2e-3, U=0.3, V=0., Wf=0.1, f=0.,
+              phase_0=0.):
+    """
+    Velocity of floats advected by a mean flow, a plane wave and their own
+    vertical velocity Wf. r is (n, 3) positions, wave parameters are
+    scalars or (n,) arrays.
+    """
+    om = gwf.omega(N, k, m, l, f)
+    u, v, w, __, __ = gwf.fields(r[:, 0], r[:, 1], r[:, 2], t, phi_0, k, l,
+                                 m, om, N, f=f, U=U, V=V, phase_0=phase_0)
+    return np.column_stack((U + u, V + v, Wf + w))
+
+
+def wave_float_paths(t, phi_0, k, l, m, N=2e-3, U=0.3, V=0., Wf=0.1, f=0.,
+                     phase_0=0., r0=(0., 0., 0.), substeps=1):
+    """
+    Float paths through plane waves and the wave fields along them.
+
+    Wave parameters are scalars or (n,) arrays, one entry per float.
+
+    Returns
+    -------
+    r : ndarray
+        Positions, (len(t), n, 3).
+    u, v, w, b, phi : ndarrays
+        Wave fields at the float, (len(t), n).
+
+    """
+    n = np.broadcast(phi_0, k, l, m, N, U, V, Wf, f, phase_0).shape
+    n = n[0] if len(n) > 0 else 1
+    y0 = np.tile(np.asarray(r0, dtype=float), (n, 1))
+
+    args = (phi_0, k, l, m, N, U, V, Wf, f, phase_0)
+    r = rk4(wave_drdt, y0, t, args, substeps)
+
+    om = gwf.omega(N, k, m, l, f)
+    fields = gwf.fields(r[..., 0], r[..., 1], r[..., 2], t[:, np.newaxis],
+                        phi_0, k, l, m, om, N, f=f, U=U, V=V,
+                        phase_0=phase_0)
+
+    return (r,) + fields
+
+
+def wave_float_zwb(t, phi_0, k, l, m, N=2e-3, U=0.3, V=0., Wf=0.1, f=0.,
+                   phase_0=0., r0=(0., 0., 0.), substeps=1, block_size=1000):
+    """
+    Heights of floats through plane waves and the vertical velocity and
+    buoyancy of the waves along them, as wave_float_paths but holding only
+    these three for the whole of t. The paths are integrated block_size
+    output steps at a time, so horizontal positions and the other fields
+    only exist for one block. The results are those of wave_float_paths.
+
+    Returns
+    -------
+    z, w, b : ndarrays
+        (len(t), n).
+
+    """
+    n = np.broadcast(phi_0, k, l, m, N, U, V, Wf, f, phase_0).shape
+    n = n[0] if len(n) > 0 else 1
+    y = np.tile(np.asarray(r0, dtype=float), (n, 1))
+    t = np.asarray(t, dtype=float)
+
+    args = (phi_0, k, l, m, N, U, V, Wf, f, phase_0)
+    om = gwf.omega(N, k, m, l, f)
+
+    z, w, b = [np.empty((len(t), n)) for __ in range(3)]
+
+    # Blocks share their end points, the last state of one being the
+    # initial state of the next.
+    for i0 in range(0, max(len(t) - 1, 1), block_size):
+        tb = t[i0:i0 + block_size + 1]
+        r = rk4(wave_drdt, y, tb, args, substeps)
+        __, __, wb, bb, __ = gwf.fields(r[..., 0], r[..., 1], r[..., 2],
+                                        tb[:, np.newaxis], phi_0, k, l, m,
+                                        om, N, f=f, U=U, V=V,
+                                        phase_0=phase_0)
+        z[i0:i0 + len(tb)] = r[..., 2]
+        w[i0:i0 + len(tb)] = wb
+        b[i0:i0 + len(tb)] = bb
+        y = r[-1]
+
+    return z, w, b
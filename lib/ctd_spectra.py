@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:20:41 2026
+
+@author: jc3e13
+
+Incremental spectra of the CTD pressure record of every half profile of a
+float, for checking the health of the pressure sensors.
+
+Only UXT, P, hpid and nout_ctd are read from each ctd file. The Welch
+spectra of pressure and of the float velocity derived from it are computed as
+if the series had been interpolated onto a regular time grid, but the
+interpolation is done a block of segments at a time so the regular series is
+never held in memory at full length. Spectra are kept in a store on disk
+keyed by hpid together with the size and modification time of the file they
+came from, so a rerun after a data delivery only reads new or changed files.
+
+    import file_catalogue as fcat
+    import ctd_spectra as cs
+    cat = fcat.open_catalogue(dirpath)
+    store = cs.update_store(cat, 4976, '../processed_data/4976_ctd_spectra.p',
+                            processes=4)
+    f = store.f
+    PP, hpids = store.matrix('PP')
+
+"""
+
+import os
+import pickle
+import multiprocessing as mp
+import numpy as np
+from scipy.io import loadmat
+import scipy.signal as sig
+
+
+STORE_VERSION = 1
+CTD_VARIABLES = ['UXT', 'P', 'hpid', 'nout_ctd']
+
+
+def read_ctd(ctd_file):
+    """Read the variables needed for the spectra from a ctd file."""
+    return loadmat(ctd_file, squeeze_me=True, variable_names=CTD_VARIABLES)
+
+
+def welch_interp(t, xs, dt=1., nperseg=1024, noverlap=512, block=64):
+    """
+    Welch power spectral densities of series sampled at irregular times, as
+    if they had first been linearly interpolated onto the regular grid
+    np.arange(t[0], t[-1], dt). The result is the same as sig.welch with its
+    default Hann window, constant detrending and density scaling.
+
+    Parameters
+    ----------
+    t : 1D array
+        Increasing sample times.
+    xs : list of 1D arrays
+        Series sampled at t.
+    dt : float, optional
+        Regular time step.
+    nperseg : int, optional
+        Length of each segment.
+    noverlap : int, optional
+        Overlap between segments.
+    block : int, optional
+        Number of segments interpolated at once, which bounds the memory
+        used to block*nperseg values per series.
+
+    Returns
+    -------
+    f : 1D array
+        Frequencies, in cycles per unit of t.
+    Pxx : ndarray
+        Spectra, (len(xs), len(f)). None if the regular series would be
+        shorter than one segment.
+
+    """
+    t = np.asarray(t, dtype=float)
+    n = int(np.ceil((t[-1] - t[0])/dt))
+    f = np.fft.rfftfreq(nperseg, dt)
+
+    if n < nperseg:
+        return f, None
+
+    step = nperseg - noverlap
+    starts = np.arange(0, n - nperseg + 1, step)
+
+    win = sig.get_window('hann', nperseg)
+    scale = 2.*dt/np.sum(win**2)
+
+    Pxx = np.zeros((len(xs), f.size))
+    offsets = np.arange(nperseg)
+
+    for i in range(0, len(starts), block):
+        ti = t[0] + (starts[i:i+block, np.newaxis] + offsets)*dt
+        for j, x in enumerate(xs):
+            xi = np.interp(ti, t, x)
+            xi -= np.mean(xi, axis=1, keepdims=True)
+            Pxx[j] += np.sum(np.abs(np.fft.rfft(win*xi, axis=1))**2, axis=0)
+
+    Pxx *= scale/len(starts)
+    # The mean and, for even segments, the Nyquist frequency are not
+    # doubled in a one sided spectrum.
+    Pxx[:, 0] /= 2.
+    if nperseg % 2 == 0:
+        Pxx[:, -1] /= 2.
+
+    return f, Pxx
+
+
+def profile_spectra(ctd_file, dt=1., nperseg=1024, noverlap=512):
+    """
+    Spectra of pressure and float vertical velocity of one half profile.
+
+    Returns
+    -------
+    hpid : int
+        Half profile number stored in the file.
+    PP, Pwf : 1D arrays or None
+        Spectra, None if there is not enough data.
+
+    """
+    data = read_ctd(ctd_file)
+    hpid = int(data['hpid'])
+
+    if data['nout_ctd'] < 3:  # Not enough data.
+        return hpid, None, None
+
+    UXT = np.asarray(data['UXT'], dtype=float)
+    P = np.asarray(data['P'], dtype=float)
+    wf = -np.gradient(P)/np.gradient(UXT)
+
+    __, Pxx = welch_interp(UXT, [P, wf], dt, nperseg, noverlap)
+
+    if Pxx is None:
+        return hpid, None, None
+
+    return hpid, Pxx[0], Pxx[1]
+
+
+def _profile_spectra(args):
+    """Wrapper of profile_spectra for Pool.imap."""
+    key, ctd_file, params = args
+    return key, profile_spectra(ctd_file, **params)
+
+
+class SpectraStore(object):
+    """
+    Spectra of half profiles kept on disk.
+
+    Parameters
+    ----------
+    store_file : str
+        Pickle file the store is loaded from and saved to.
+    dt, nperseg, noverlap : optional
+        Parameters of the spectra. A store made with different parameters is
+        discarded.
+
+    """
+
+    def __init__(self, store_file, dt=1., nperseg=1024, noverlap=512):
+        self.store_file = store_file
+        self.params = {'dt': float(dt), 'nperseg': int(nperseg),
+                       'noverlap': int(noverlap)}
+        self.f = np.fft.rfftfreq(nperseg, dt)
+        # key -> {'path', 'size', 'mtime', 'hpid', 'PP', 'Pwf'}
+        self.entries = {}
+
+        if os.path.exists(store_file):
+            with open(store_file, 'rb') as f:
+                state = pickle.load(f)
+            if (state.get('version') == STORE_VERSION and
+                    state['params'] == self.params):
+                self.entries = state['entries']
+
+    def save(self):
+        state = {'version': STORE_VERSION, 'params': self.params,
+                 'entries': self.entries}
+
+        dirpath = os.path.dirname(self.store_file)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+
+        tmp_file = self.store_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, self.store_file)
+
+    def is_current(self, key, entry):
+        """Whether the spectra of a catalogue entry are up to date."""
+        old = self.entries.get(key)
+        return (old is not None and old['path'] == entry['path'] and
+                old['size'] == entry['size'] and
+                old['mtime'] == entry['mtime'])
+
+    def prune(self, keys):
+        """Forget entries whose key is not in keys, e.g. deleted files."""
+        keys = set(keys)
+        for key in list(self.entries.keys()):
+            if key not in keys:
+                del self.entries[key]
+
+    def matrix(self, name):
+        """
+        Spectra of all half profiles as a matrix.
+
+        Returns
+        -------
+        S : ndarray
+            Spectra, (len(self.f), n_profiles) ordered by hpid, NaN for half
+            profiles without enough data.
+        hpids : 1D array
+            Half profile numbers.
+
+        """
+        keys = sorted(self.entries.keys(),
+                      key=lambda key: self.entries[key]['hpid'])
+        S = np.full((self.f.size, len(keys)), np.nan)
+        hpids = np.empty(len(keys))
+        for i, key in enumerate(keys):
+            entry = self.entries[key]
+            hpids[i] = entry['hpid']
+            if entry[name] is not None:
+                S[:, i] = entry[name]
+        return S, hpids
+
+
+def update_store(cat, floatID, store_file, dt=1., nperseg=1024,
+                 noverlap=512, processes=1, save_every=200, rebuild=False,
+                 verbose=False):
+    """
+    Bring the spectra store of a float up to date with its ctd files.
+
+    Parameters
+    ----------
+    cat : file_catalogue.FileCatalogue
+        Catalogue of the float's files.
+    floatID : int
+        Float ID.
+    store_file : str
+        Pickle file of the store.
+    dt, nperseg, noverlap : optional
+        Parameters of the spectra, see welch_interp.
+    processes : int, optional
+        Number of processes reading files and computing spectra.
+    save_every : int, optional
+        Save the store after this many new spectra, so an interrupted run
+        keeps most of its work.
+    rebuild : bool, optional
+        Recompute the spectra of every file.
+    verbose : bool, optional
+        Print progress.
+
+    Returns
+    -------
+    store : SpectraStore
+
+    """
+    store = SpectraStore(store_file, dt, nperseg, noverlap)
+    if rebuild:
+        store.entries = {}
+
+    entries = {hpid: cat.entry(floatID, hpid, 'ctd')
+               for hpid in cat.hpids(floatID, 'ctd')}
+    store.prune(entries.keys())
+
+    todo = [(hpid, entry['path'], store.params)
+            for hpid, entry in sorted(entries.items())
+            if not store.is_current(hpid, entry)]
+
+    if verbose:
+        print("{} of {} ctd files to process.".format(len(todo),
+                                                      len(entries)))
+
+    if len(todo) == 0:
+        return store
+
+    if processes == 1:
+        pool = None
+        results = (_profile_spectra(args) for args in todo)
+    else:
+        pool = mp.Pool(processes)
+        results = pool.imap(_profile_spectra, todo, chunksize=4)
+
+    try:
+        for i, (key, (hpid, PP, Pwf)) in enumerate(results):
+            entry = entries[key]
+            store.entries[key] = {'path': entry['path'],
+                                  'size': entry['size'],
+                                  'mtime': entry['mtime'], 'hpid': hpid,
+                                  'PP': PP, 'Pwf': Pwf}
+            if (i + 1) % save_every == 0:
+                store.save()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        store.save()
+
+    return store
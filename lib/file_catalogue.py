@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:47 2026
+
+@author: jc3e13
+
+Persistent catalogue of EM-APEX half profile files.
+
+Per half profile files are named like "ema-3763a-0065-vel.mat" where 3763 is
+the float serial number, a is the run suffix, 0065 is the hpid and vel is the
+file type. Some missions have a single file without an hpid, e.g.
+"ema-4976a-mis.mat", which is catalogued with hpid None.
+
+The catalogue maps (floatID, run, hpid, filetype) to the path, size and
+modification time of each file and remembers the modification time and
+contents of every directory it has listed. A refresh only lists directories
+whose modification time has changed, which on a network filesystem is much
+cheaper than walking tens of thousands of files again. Where a float has
+files from more than one run, lookups without a run return the file of the
+last run in alphabetical order.
+
+    import file_catalogue as fcat
+    cat = fcat.open_catalogue('/noc/users/jc3e13/storage/DIMES/EM-APEX/4976a')
+    ctd_files = cat.files(4976, 'ctd')
+
+"""
+
+import os
+import re
+import pickle
+
+
+CATALOGUE_NAME = '.{}_ema_catalogue.p'
+CATALOGUE_VERSION = 2
+
+# ema-<serial><run>-<hpid>-<filetype>.mat or ema-<serial><run>-<filetype>.mat
+FILE_PATTERN = re.compile(r'^ema-(\d+)([a-zA-Z]*)-(?:(\d+)-)?([a-zA-Z0-9]+)\.mat$')
+
+
+def parse_filename(filename):
+    """
+    Parse an EM-APEX file name.
+
+    Returns
+    -------
+    floatID : int
+    run : str
+    hpid : int or None
+    filetype : str
+
+    None is returned if the name does not match.
+
+    """
+    match = FILE_PATTERN.match(filename)
+    if match is None:
+        return None
+
+    floatID, run, hpid, filetype = match.groups()
+    hpid = None if hpid is None else int(hpid)
+
+    return int(floatID), run, hpid, filetype
+
+
+class FileCatalogue(object):
+    """
+    Catalogue of EM-APEX files under one or more root directories.
+
+    Parameters
+    ----------
+    catalogue_file : str, optional
+        Pickle file the catalogue is loaded from and saved to. If None the
+        catalogue is kept in memory only.
+
+    """
+
+    def __init__(self, catalogue_file=None):
+        self.catalogue_file = catalogue_file
+        # (floatID, run, hpid, filetype) -> {'path', 'run', 'size', 'mtime'}
+        self.entries = {}
+        # dirpath -> {'mtime', 'subdirs', 'keys'}
+        self.dirs = {}
+        # (floatID, filetype) -> {hpid: {run: key}}, rebuilt after
+        # refreshes.
+        self._index = None
+
+        if catalogue_file is not None and os.path.exists(catalogue_file):
+            with open(catalogue_file, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') == CATALOGUE_VERSION:
+                self.entries = state['entries']
+                self.dirs = state['dirs']
+
+    def save(self):
+        if self.catalogue_file is None:
+            return
+
+        state = {'version': CATALOGUE_VERSION, 'entries': self.entries,
+                 'dirs': self.dirs}
+
+        tmp_file = self.catalogue_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, self.catalogue_file)
+
+    def _forget_dir(self, dirpath):
+        """Remove a directory, its files and its subdirectories."""
+        info = self.dirs.pop(dirpath, None)
+        if info is None:
+            return
+        for key in info['keys']:
+            self.entries.pop(key, None)
+        for subdir in info['subdirs']:
+            self._forget_dir(subdir)
+
+    def _list_dir(self, dirpath, mtime):
+        subdirs = []
+        keys = []
+
+        for name in sorted(os.listdir(dirpath)):
+            fullname = os.path.join(dirpath, name)
+
+            if os.path.isdir(fullname):
+                subdirs.append(fullname)
+                continue
+
+            parsed = parse_filename(name)
+            if parsed is None:
+                continue
+
+            floatID, run, hpid, filetype = parsed
+            st = os.stat(fullname)
+            key = (floatID, run, hpid, filetype)
+            self.entries[key] = {'path': fullname, 'run': run,
+                                 'size': st.st_size, 'mtime': st.st_mtime}
+            keys.append(key)
+
+        self.dirs[dirpath] = {'mtime': mtime, 'subdirs': subdirs,
+                              'keys': keys}
+
+    def _refresh_dir(self, dirpath, check_files):
+        try:
+            mtime = os.stat(dirpath).st_mtime
+        except OSError:
+            # Directory has been removed.
+            self._forget_dir(dirpath)
+            return 0
+
+        info = self.dirs.get(dirpath)
+        nlisted = 0
+
+        if info is None or info['mtime'] != mtime:
+            old_subdirs = set() if info is None else set(info['subdirs'])
+            if info is not None:
+                for key in info['keys']:
+                    self.entries.pop(key, None)
+            self._list_dir(dirpath, mtime)
+            for subdir in old_subdirs - set(self.dirs[dirpath]['subdirs']):
+                self._forget_dir(subdir)
+            nlisted += 1
+        elif check_files:
+            for key in info['keys']:
+                entry = self.entries[key]
+                try:
+                    st = os.stat(entry['path'])
+                except OSError:
+                    continue
+                entry['size'] = st.st_size
+                entry['mtime'] = st.st_mtime
+
+        for subdir in self.dirs[dirpath]['subdirs']:
+            nlisted += self._refresh_dir(subdir, check_files)
+
+        return nlisted
+
+    def refresh(self, dirpath, check_files=False, save=True):
+        """
+        Bring the catalogue of a root directory up to date.
+
+        Only directories whose modification time has changed are listed
+        again. Files modified in place do not change their directory's
+        modification time, set check_files to also re-stat every known file
+        in unchanged directories.
+
+        Returns
+        -------
+        nlisted : int
+            Number of directories that had to be listed.
+
+        """
+        nlisted = self._refresh_dir(os.path.normpath(dirpath), check_files)
+
+        if nlisted > 0:
+            self._index = None
+
+        if save and (nlisted > 0 or check_files):
+            self.save()
+
+        return nlisted
+
+    def _build_index(self):
+        self._index = {}
+        for key in self.entries:
+            floatID, run, hpid, filetype = key
+            runs = self._index.setdefault((floatID, filetype), {})
+            runs.setdefault(hpid, {})[run] = key
+
+    def _key(self, floatID, hpid, filetype, run=None):
+        """Key of a file, the last run if run is None, or None."""
+        if self._index is None:
+            self._build_index()
+        runs = self._index.get((int(floatID), filetype), {}).get(hpid, {})
+        if not runs:
+            return None
+        if run is None:
+            run = max(runs.keys())
+        return runs.get(run)
+
+    def runs(self, floatID, filetype):
+        """Sorted runs with a file of a given type."""
+        if self._index is None:
+            self._build_index()
+        files = self._index.get((int(floatID), filetype), {})
+        return sorted(set(run for runs in files.values() for run in runs))
+
+    def get(self, floatID, hpid, filetype, run=None):
+        """Path of a file, or None if it is not in the catalogue."""
+        key = self._key(floatID, hpid, filetype, run)
+        return None if key is None else self.entries[key]['path']
+
+    def entry(self, floatID, hpid, filetype, run=None):
+        """Full catalogue entry (path, run, size, mtime) of a file."""
+        key = self._key(floatID, hpid, filetype, run)
+        if key is None:
+            raise KeyError((floatID, run, hpid, filetype))
+        return self.entries[key]
+
+    def files(self, floatID, filetype, run=None):
+        """Dictionary mapping hpid to path for one float and file type,
+        excluding single mission files without an hpid. Without a run, each
+        hpid has the file of its last run."""
+        files = {}
+        for hpid in self.hpids(floatID, filetype, run):
+            files[hpid] = self.get(floatID, hpid, filetype, run)
+        return files
+
+    def hpids(self, floatID, filetype, run=None):
+        """Sorted hpids with a file of a given type."""
+        if self._index is None:
+            self._build_index()
+        files = self._index.get((int(floatID), filetype), {})
+        return sorted(hpid for hpid, runs in files.items()
+                      if hpid is not None and (run is None or run in runs))
+
+
+def open_catalogue(dirpath, catalogue_file=None, refresh=True,
+                   check_files=False):
+    """
+    Open the catalogue of a float data directory.
+
+    Parameters
+    ----------
+    dirpath : str
+        Root directory containing the float files.
+    catalogue_file : str, optional
+        Where to keep the catalogue. Defaults to a hidden file next to
+        dirpath, not inside it, since saving the catalogue would otherwise
+        change the modification time of the directory being catalogued.
+    refresh : bool, optional
+        Bring the catalogue up to date before returning it.
+    check_files : bool, optional
+        See FileCatalogue.refresh.
+
+    Returns
+    -------
+    cat : FileCatalogue
+
+    """
+    if catalogue_file is None:
+        dirpath = os.path.normpath(dirpath)
+        catalogue_file = os.path.join(os.path.dirname(dirpath),
+                                      CATALOGUE_NAME.format(
+                                          os.path.basename(dirpath)))
+
+    cat = FileCatalogue(catalogue_file)
+
+    if refresh:
+        cat.refresh(dirpath, check_files=check_files)
+
+    return cat
@@ -0,0 +1,491 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 14:08:19 2026
+
+@author: jc3e13
+
+Shear and strain spectra of many finescale windows at once.
+
+The finescale method needs, for every window of a profile, the spectra of
+buoyancy frequency normalised shear, the rotary (clockwise and counter
+clockwise) shear spectra, the strain spectrum and the kinetic energy
+spectrum. Computing these pairwise with coperiodogram transforms the same
+series several times and throws half of the output away. Here each windowed
+variable is detrended, tapered and transformed exactly once, every window of
+every profile in one FFT, and all the auto and co-spectra are assembled from
+those transforms. Windows come from window_views and ragged ones are
+detrended and tapered over their valid points only and zero padded, so all
+windows share the same wavenumbers.
+
+    import finescale_spectra as fsp
+    m, Pshear, Pstrain, PCW, PCCW, PEK = \\
+        fsp.window_spectra(4., U, V, dUdz, dVdz, strain, N2_ref, mask)
+
+"""
+
+import multiprocessing as mp
+import numpy as np
+import scipy.signal as sig
+
+import interp_cache as ic
+import window_views as wv
+
+
+TRANSFER_CACHE_BYTES = 32*2**20
+
+# Transfer functions of spectral_correction.
+_transfer_cache = ic.InterpCache(TRANSFER_CACHE_BYTES)
+
+# Parameters used by the workers, set by _init_worker.
+_shared = {}
+
+
+def sin2taper(L):
+    """A boxcar window that tapers the last 10% of points of both ends using a
+    sin^2 function."""
+    win = np.ones(L)
+    idx10 = int(np.ceil(L/10.))
+    idxs = np.arange(idx10)
+    win[:idx10] = np.sin(np.pi*idxs/(2.*idx10))**2
+    win[-idx10:] = np.cos(np.pi*(idxs + 1 - L)/(2.*idx10))**2
+    return win
+
+
+def get_window(window, L):
+    """Window of length L, None being a boxcar and 'sin2taper' allowed."""
+    if window is None:
+        return sig.get_window('boxcar', L)
+    elif window == 'sin2taper':
+        return sin2taper(L)
+    else:
+        return sig.get_window(window, L)
+
+
+def wavenumbers(L, dz, nfft=None):
+    """Wavenumbers of the spectra of windows L points long, dz apart."""
+    if nfft is None:
+        nfft = L
+    return np.arange(nfft//2 + 1)/(dz*nfft)
+
+
+def _spectral_correction(m, use_range=True, use_diff=True, use_interp=True,
+                         use_tilt=True, use_bin=True, use_volt=True, dzt=8.,
+                         dzr=8., dzfd=8., dzg=8., ddash=5.4, dzs=8., vfi=50.,
+                         mfr=0.12):
+    """
+    Calculates the appropriate transfer function to scale power spectra.
+
+    Parameters
+    ----------
+    m : ndarray
+        Vertical wavenumber. [rad s-1]
+    use_range : boolean, optional (LADCP)
+        Switch for range correction.
+    use_diff : boolean, optional (LADCP)
+        Switch for differencing correction.
+    use_interp : boolean, optional (LADCP/EM-APEX)
+        Switch for interpolation correction.
+    use_tilt : boolean, optional (LADCP)
+        Switch for tilt correction.
+    use_bin : boolean, optional (LADCP)
+        Switch for binning correction.
+    use_volt : boolean, optional (EM-APEX)
+        Switch for voltmeter noise correction.
+    dzt : float, optional (LADCP)
+        Transmitted sound pulse length projected on the vertical. [m]
+    dzr : float, optional (LADCP/EM-APEX)
+        Receiver processing bin length. [m]
+    dzfd : float, optional (LADCP)
+        First-differencing interval. [m]
+    dzg : float, optional (LADCP/EM-APEX)
+        Interval of depth grid onto which single-ping piecewise-linear
+        continuous profiles of vertical shear are binned. [m]
+    ddash : float, optional (LADCP)
+        ?
+    dzs : float, optional (LADCP)
+        Superensemble pre-averaging interval, usually chosen to be dzg. [m]
+    vfi : float, optional (EM-APEX)
+        ? [s-1]
+    mfr : float, optional (EM-APEX)
+        ? [m s-1]
+
+    Returns
+    -------
+    T : ndarray
+        Transfer function, which is the product of all of the individual
+        transfer functions for each separate spectral correction.
+
+
+    Notes
+    -----
+    Spectral corrections for LADCP data - see Polzin et. al. 2002.
+
+    There is another possible correction which isn't used.
+
+    Notes from MATLAB code
+    ----------------------
+
+    A quadratic fit to the range maxima (r_max) pairs given by Polzin et al.
+    (2002) yields.
+
+    ddash = -1.2+0.0857r_max - 0.000136r_max^2 ,
+
+    which has an intercept near r_max = 14 m. It should be noted that
+    expressions (4) and (5) are semi-empirical and apply strictly only to the
+    data set of Polzin et al. (2002). Estimating r_max ? 255 m as the range at
+    which 80% of all ensembles have valid velocities yields d? ? 11.8 m in case
+    of this data set (i.e as in Thurherr 2011 NOT DIMES - need to update!!).
+    ddash is determined empirically by Polzin et al. (2002) and is dependent
+    on range and the following assumptions:
+        Small tilts (~ 3 deg).
+        Instrument tilt and orientation are constant over measurement period.
+        Instrument tilt and orientation are independent.
+        Tilt attenuation is limited by bin-mapping capabilities of RDI (1996)
+        processing.
+
+    """
+
+    pi2 = np.pi*2
+
+    # Range averaging.
+    if use_range:
+        T_range = np.sinc(m*dzt/pi2)**2 * np.sinc(m*dzr/pi2)**2
+    else:
+        T_range = 1.
+
+    # First differencing.
+    if use_diff:
+        T_diff = np.sinc(m*dzfd/pi2)**2
+    else:
+        T_diff = 1.
+
+    # Interpolation.
+    if use_interp:
+        T_interp = np.sinc(m*dzr/pi2)**4 * np.sinc(m*dzg/pi2)**2
+    else:
+        T_interp = 1.
+
+    # Tilting.
+    if use_tilt:
+        T_tilt = np.sinc(m*ddash/pi2)**2
+    else:
+        T_tilt = 1.
+
+    # Binning
+    if use_bin:
+        T_bin = np.sinc(m*dzg/pi2)**2 * np.sinc(m*dzs/pi2)**2
+    else:
+        T_bin = 1.
+
+    # Voltmeter
+    if use_volt:
+        T_volt = 1./np.sinc(m*vfi*mfr/pi2)
+    else:
+        T_volt = 1.
+
+    T = T_range*T_diff*T_interp*T_tilt*T_bin*T_volt
+
+    return T
+
+
+# Parameters of _spectral_correction after m, and their defaults.
+_CORRECTION_NAMES = _spectral_correction.__code__.co_varnames[
+    1:_spectral_correction.__code__.co_argcount]
+_CORRECTION_DEFAULTS = dict(zip(_CORRECTION_NAMES,
+                                _spectral_correction.__defaults__))
+
+
+def spectral_correction(m, *args, **kwargs):
+    """
+    Memoised _spectral_correction, which see for the parameters.
+
+    Finescale analyses ask for the same transfer function for every window,
+    so results are kept in a cache keyed on the wavenumbers and all of the
+    correction parameters, defaults included. The returned array is read only
+    and shared between calls, copy it before modifying it in place.
+    """
+    params = dict(_CORRECTION_DEFAULTS)
+    params.update(zip(_CORRECTION_NAMES, args))
+    params.update(kwargs)
+    m = np.ascontiguousarray(m, dtype=float)
+    key = (m.shape, m.tobytes(), tuple(sorted(params.items())))
+    T = _transfer_cache.get(key)
+    if T is None:
+        T = np.asarray(_spectral_correction(m, **params), dtype=float)
+        T.setflags(write=False)
+        _transfer_cache.put(key, T)
+    return T
+
+
+def clear_transfer_cache():
+    """Empty the cache of spectral_correction."""
+    _transfer_cache.clear()
+
+
+def _spans(mask):
+    length = mask.sum(axis=1)
+    start = np.where(length > 0, np.argmax(mask, axis=1), 0)
+    return start, length
+
+
+def _tapers(mask, window):
+    """Window over the valid points of each row, zero elsewhere."""
+    start, length = _spans(mask)
+    W = np.zeros(mask.shape)
+    for L in np.unique(length):
+        if L == 0:
+            continue
+        win = get_window(window, L)
+        for i in np.flatnonzero(length == L):
+            W[i, start[i]:start[i] + L] = win
+    return W
+
+
+def _detrend(Y, mask, detrend):
+    """Detrend rows of Y over their valid points, returning zero elsewhere.
+    Y may have leading axes of variables."""
+    Y = np.where(mask, Y, 0.)
+    if detrend is None or detrend is False:
+        return Y
+    n = np.maximum(mask.sum(axis=-1), 1)[..., np.newaxis]
+    Ym = Y.sum(axis=-1)[..., np.newaxis]/n
+    if detrend == 'constant':
+        return Y - mask*Ym
+    elif detrend == 'linear':
+        s = np.where(mask, np.arange(mask.shape[-1]), 0.)
+        sm = s.sum(axis=-1)[..., np.newaxis]/n
+        ds = mask*(s - sm)
+        ss = np.maximum((ds**2).sum(axis=-1), 1e-300)[..., np.newaxis]
+        slope = (ds*(Y - Ym)).sum(axis=-1)[..., np.newaxis]/ss
+        return Y - mask*(Ym + slope*(s - sm))
+    else:
+        raise ValueError("Unknown detrend {!r}.".format(detrend))
+
+
+def window_ffts(Ys, mask, fs=1., window=None, nfft=None, detrend='linear',
+                scaling='density'):
+    """
+    Scaled one sided transforms of several windowed variables.
+
+    Parameters
+    ----------
+    Ys : 3D array
+        Variables, (n_vars, n_windows, L).
+    mask : 2D boolean array
+        Valid points, (n_windows, L).
+    fs, window, nfft, detrend, scaling : optional
+        As for coperiodogram. nfft defaults to L for all windows.
+
+    Returns
+    -------
+    F : 3D complex array
+        (n_vars, n_windows, nfft//2 + 1). The co-spectrum of variables i and
+        j is F[i]*F[j].conj(), the same as the Pxy of coperiodogram on the
+        valid points of each window when they fill it.
+
+    """
+    Ys = np.asarray(Ys, dtype=float)
+    L = mask.shape[-1]
+    if nfft is None:
+        nfft = L
+
+    W = _tapers(mask, window)
+    if scaling == 'density':
+        scale = 1./(fs*(W*W).sum(axis=1))
+    elif scaling == 'spectrum':
+        scale = 1./W.sum(axis=1)**2
+    else:
+        raise ValueError("Unknown scaling {!r}.".format(scaling))
+
+    F = np.fft.rfft(W*_detrend(Ys, mask, detrend), nfft, axis=-1)
+
+    # Both factors of the products carry the square root of the scaling and
+    # of the doubling of all but the constant and last wavenumbers.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        F *= np.sqrt(scale)[:, np.newaxis]
+    F[..., 1:-1] *= np.sqrt(2.)
+
+    # As in coperiodogram, make sure the zero wavenumber is zero.
+    if detrend is not None and detrend is not False:
+        F[..., 0] = 0.
+
+    return F
+
+
+def window_spectra(dz, U, V, dUdz, dVdz, strain, N2_ref, mask=None,
+                   window='sin2taper', nfft=None, detrend='linear',
+                   scaling='density', T=None):
+    """
+    Finescale spectra of many windows, the batched equivalent of window_ps.
+
+    Parameters
+    ----------
+    dz : float
+        Grid spacing.
+    U, V, dUdz, dVdz, strain, N2_ref : 2D arrays
+        Windowed variables, (n_windows, L), e.g. from window_views.
+    mask : 2D boolean array, optional
+        Valid points of each window, all points by default.
+    window, nfft, detrend, scaling : optional
+        As for coperiodogram.
+    T : 1D array, optional
+        Transfer function at the wavenumbers, which the shear, rotary and
+        kinetic energy spectra are divided by.
+
+    Returns
+    -------
+    m : 1D array
+        Wavenumbers.
+    Pshear, Pstrain, PCW, PCCW, PEK : 2D arrays
+        Spectra, (n_windows, len(m)). Windows without data are NaN.
+
+    """
+    U = np.atleast_2d(U)
+    if mask is None:
+        mask = np.ones(U.shape, dtype=bool)
+
+    # Shear is normalised by the window mean buoyancy frequency.
+    with np.errstate(invalid='ignore'):
+        N_mean = wv.window_mean(np.sqrt(np.atleast_2d(N2_ref)), mask)
+    N_mean = N_mean[:, np.newaxis]
+
+    Ys = np.stack((np.atleast_2d(dUdz)/N_mean, np.atleast_2d(dVdz)/N_mean, U,
+                   np.atleast_2d(V), np.atleast_2d(strain)))
+    F = window_ffts(Ys, mask, 1./dz, window, nfft, detrend, scaling)
+    FdU, FdV, FU, FV, Fstrain = F
+
+    def auto(Fx):
+        return Fx.real**2 + Fx.imag**2
+
+    PdU = auto(FdU)
+    PdV = auto(FdV)
+    QS = (FdU*FdV.conj()).imag
+
+    # Clockwise and counter clockwise spectra, see CW_ps and CCW_ps.
+    PCW = (PdU + PdV - 2.*QS)/2.
+    PCCW = (PdU + PdV + 2.*QS)/2.
+    Pshear = PdU + PdV
+    Pstrain = auto(Fstrain)
+    PEK = (auto(FU) + auto(FV))/2.
+
+    if T is not None:
+        for P in (Pshear, PCW, PCCW, PEK):
+            P /= T
+
+    m = wavenumbers(mask.shape[-1], dz, nfft)
+
+    return m, Pshear, Pstrain, PCW, PCCW, PEK
+
+
+def band_integral(m, P, m_c, m_0, npts=100):
+    """
+    Integral of spectra P, (..., len(m)), between wavenumbers m_0 and m_c,
+    the same as integrated_ps of each spectrum.
+    """
+    m_int = np.logspace(np.log10(m_0), np.log10(m_c), npts)
+    i = np.clip(np.searchsorted(m, m_int, side='right') - 1, 0, m.size - 2)
+    frac = np.clip((m_int - m[i])/(m[i + 1] - m[i]), 0., 1.)
+    P_int = P[..., i]*(1. - frac) + P[..., i + 1]*frac
+    return np.sum(0.5*(P_int[..., 1:] + P_int[..., :-1])*np.diff(m_int),
+                  axis=-1)
+
+
+def _init_worker(params):
+    _shared.clear()
+    _shared.update(params)
+
+
+def _block_spectra(profiles):
+    """Window and transform a block of profiles in one batch."""
+    p = _shared
+    L = max(int(np.round(p['width']/p['dz'])), 1)
+    zs, Xs, masks = [], [], []
+    for z, U, V, dUdz, dVdz, strain, N2_ref in profiles:
+        wz, wX, mask = wv.window_views(z, [U, V, dUdz, dVdz, strain, N2_ref],
+                                       p['width'], p['overlap'], p['x_0'])
+        if mask.shape[1] != L:
+            raise ValueError("Profiles must be on a regular grid {} apart."
+                             .format(p['dz']))
+        zs.append(wz)
+        Xs.append(wX)
+        masks.append(mask)
+
+    nwin = np.array([mask.shape[0] for mask in masks])
+    wz = np.vstack(zs)
+    wX = [np.vstack(X) for X in zip(*Xs)]
+    mask = np.vstack(masks)
+
+    z_mean = wv.window_mean(wz, mask)
+    N2_mean = wv.window_mean(wX[-1], mask)
+    out = window_spectra(p['dz'], *wX, mask=mask, window=p['window'],
+                         nfft=p['nfft'], detrend=p['detrend'],
+                         scaling=p['scaling'], T=p['T'])
+
+    return (nwin, z_mean, N2_mean) + out
+
+
+def section_spectra(profiles, dz, width, overlap=0., x_0=None,
+                    window='sin2taper', nfft=None, detrend='linear',
+                    scaling='density', T=None, processes=1, block_size=16):
+    """
+    Finescale spectra of every window of many profiles, e.g. a whole float.
+
+    Parameters
+    ----------
+    profiles : list of tuples
+        (z, U, V, dUdz, dVdz, strain, N2_ref) of each profile, 1D arrays on
+        a regular grid dz apart and free of NaN.
+    dz : float
+        Grid spacing.
+    width, overlap, x_0 : floats
+        Windows, see window_views.
+    window, nfft, detrend, scaling, T : optional
+        See window_spectra.
+    processes : int, optional
+        Processes over which blocks of profiles are shared. Results do not
+        depend on the number of processes.
+    block_size : int, optional
+        Profiles per block, the windows of a block being transformed
+        together.
+
+    Returns
+    -------
+    pidx : 1D int array
+        Profile of each window, its index in profiles.
+    z_mean, N2_mean : 1D arrays
+        Mean height and buoyancy frequency squared of each window.
+    m : 1D array
+        Wavenumbers.
+    Pshear, Pstrain, PCW, PCCW, PEK : 2D arrays
+        Spectra, (n_windows, len(m)).
+
+    """
+    params = {'dz': dz, 'width': width, 'overlap': overlap, 'x_0': x_0,
+              'window': window, 'nfft': nfft, 'detrend': detrend,
+              'scaling': scaling, 'T': T}
+
+    blocks = [profiles[i:i + block_size]
+              for i in range(0, len(profiles), block_size)]
+
+    if processes > 1 and len(blocks) > 1:
+        pool = mp.Pool(processes, initializer=_init_worker,
+                       initargs=(params,))
+        try:
+            results = pool.map(_block_spectra, blocks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init_worker(params)
+        try:
+            results = [_block_spectra(block) for block in blocks]
+        finally:
+            _shared.clear()
+
+    nwin, z_mean, N2_mean, m, Pshear, Pstrain, PCW, PCCW, PEK = \
+        zip(*results)
+    pidx = np.repeat(np.arange(len(profiles)), np.hstack(nwin))
+
+    return (pidx, np.hstack(z_mean), np.hstack(N2_mean), m[0],
+            np.vstack(Pshear), np.vstack(Pstrain), np.vstack(PCW),
+            np.vstack(PCCW), np.vstack(PEK))
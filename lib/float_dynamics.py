@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:36:05 2026
+
+@author: jc3e13
+
+Unsteady equation of motion of EM-APEX floats, for many profiles or
+parameter sets at once.
+
+The float's environment (density, pressure, piston position...) is sampled
+once per profile onto a uniform grid in height, so the right hand side looks
+values up by computing an index rather than searching with np.interp at every
+evaluation. Tables of all profiles are stacked and every float in a batch
+says which profile it is in, so whole missions are integrated together with
+batch_ode.rk4.
+
+    import float_dynamics as fd
+    import batch_ode as bo
+    table = fd.EnvironmentTable(zs, {'rho': rhos, 'p': ps, 'ppos': pposs})
+    args = (table, np.arange(n), V_0, M, alpha_p, alpha_k, p_0, k_0, CA)
+    X = bo.rk4(fd.still_water_rhs, X_0, t, args)
+
+"""
+
+import numpy as np
+
+import gravity_wave_fields as gwf
+
+
+G = -9.8
+
+
+class EnvironmentTable(object):
+    """
+    Profiles of environmental variables on a shared uniform height grid.
+
+    Parameters
+    ----------
+    z : 1D array or list of 1D arrays
+        Heights of the measurements of each profile, in any order. NaNs are
+        dropped.
+    columns : dict
+        Variable name to 1D array or list of 1D arrays, matching z.
+    dz : float, optional
+        Grid spacing. Lookups are linear interpolation between grid points,
+        so this should resolve the measurements.
+
+    Outside the measured range of a profile its values are held constant, as
+    np.interp does.
+
+    """
+
+    def __init__(self, z, columns, dz=1.):
+        if np.ndim(z[0]) == 0:
+            z = [z]
+            columns = {name: [col] for name, col in columns.items()}
+
+        self.names = sorted(columns.keys())
+        self.dz = float(dz)
+
+        zmin = min(np.nanmin(zp) for zp in z)
+        zmax = max(np.nanmax(zp) for zp in z)
+        self.z0 = zmin
+        self.nz = int(np.ceil((zmax - zmin)/dz)) + 1
+        self.z = self.z0 + self.dz*np.arange(self.nz)
+
+        self.values = np.empty((len(z), self.nz, len(self.names)))
+        for i, zp in enumerate(z):
+            zp = np.asarray(zp, dtype=float)
+            for j, name in enumerate(self.names):
+                v = np.asarray(columns[name][i], dtype=float)
+                good = ~np.isnan(zp) & ~np.isnan(v)
+                order = np.argsort(zp[good])
+                self.values[i, :, j] = np.interp(self.z, zp[good][order],
+                                                 v[good][order])
+
+        # Differences between neighbouring grid points, so a lookup is one
+        # multiply add.
+        self._diffs = np.zeros_like(self.values)
+        self._diffs[:, :-1] = np.diff(self.values, axis=1)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def lookup(self, zs, pidx):
+        """
+        All variables at heights zs of floats in profiles pidx.
+
+        Returns
+        -------
+        values : ndarray
+            (n, n_names), columns ordered as self.names.
+
+        """
+        pos = np.clip((zs - self.z0)/self.dz, 0., self.nz - 1.)
+        i = np.minimum(pos.astype(int), self.nz - 1)
+        frac = (pos - i)[:, np.newaxis]
+        return self.values[pidx, i] + frac*self._diffs[pidx, i]
+
+    def column(self, name):
+        return self.names.index(name)
+
+
+def still_water_rhs(X, t, table, pidx, V_0, M, alpha_p, alpha_k, p_0, k_0,
+                    CA, g=G):
+    """
+    Fully nonlinear equation of motion of floats in still water.
+
+    X is (n, 2) height and vertical velocity, table holds rho, p and ppos
+    and pidx gives the profile of each float. Float parameters are scalars
+    or (n,) arrays.
+
+    """
+    zs = X[:, 0]
+    ws = X[:, 1]
+
+    env = table.lookup(zs, pidx)
+    rhoi = env[:, table.column('rho')]
+    pi = env[:, table.column('p')]
+    ki = env[:, table.column('ppos')]
+
+    F_grav = g
+    F_buoy = -g*rhoi*V_0/M
+    F_comp = g*rhoi*V_0/M*alpha_p*(pi - p_0)
+    F_pist = -g*rhoi/M*alpha_k*(ki - k_0)
+    F_drag = -rhoi/M*CA*ws**2
+
+    dwsdt = F_grav + F_buoy + F_comp + F_pist + F_drag
+
+    return np.column_stack((ws, dwsdt))
+
+
+def wave_rhs(X, t, table, pidx, wave, V_0, M, alpha_p, alpha_k, p_0, k_0, CA,
+             g=G):
+    """
+    Fully nonlinear equation of motion of floats in a plane wave, with drag
+    on the velocity relative to the water.
+
+    wave is (k, l, m, om, phi_0, N), scalars or (n,) arrays, other arguments
+    as for still_water_rhs.
+
+    """
+    zs = X[:, 0]
+    ws = X[:, 1]
+
+    k, l, m, om, phi_0, N = wave
+
+    env = table.lookup(zs, pidx)
+    rhoi = env[:, table.column('rho')]
+    pi = env[:, table.column('p')]
+    pposi = env[:, table.column('ppos')]
+    wi = gwf.fields(0., 0., zs, t, phi_0, k, l, m, om, N)[2]
+
+    V = V_0*(1 + alpha_p*(pi + p_0)) + alpha_k*(pposi - k_0)
+
+    F_buoy = g - g*rhoi*V/M
+    F_drag = -(rhoi/M)*CA*np.abs(ws - wi)*(ws - wi)
+
+    dwsdt = F_buoy + F_drag
+
+    return np.column_stack((ws, dwsdt))
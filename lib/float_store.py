@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:31 2026
+
+@author: jc3e13
+
+Columnar on-disk store for EMApexFloat objects.
+
+Parsing an allprof*.mat file and rebuilding every (depth x profile) array
+takes far longer than most analyses that follow it. This module converts a
+loaded float once into a directory containing one .npy file per array
+attribute plus a small JSON header. Arrays are written in Fortran order so
+that each profile column is contiguous on disk and are opened as memory maps,
+so only the variables and columns a script actually touches are paged in.
+
+Typical use is as a drop in replacement for emapex.load:
+
+    import float_store as fst
+    E76 = fst.load(4976)
+
+The first call converts the float, subsequent calls open the store directly.
+Run this module as a script to convert a batch of floats up front.
+
+"""
+
+import os
+import json
+import glob
+import pickle
+import warnings
+import argparse
+import numpy as np
+
+import emapex
+import interp_cache as ic
+
+
+STORE_DIR = '/noc/users/jc3e13/storage/float_store'
+HEADER_NAME = 'header.json'
+OBJECTS_NAME = 'objects.p'
+STORE_VERSION = 1
+
+# Where the w model fits and reference N2 that emapex.load applies are kept,
+# and the patterns of their file names.
+INPUT_DIRS = [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           os.pardir, 'full_float_analysis', 'processed_data')]
+W_FIT_PATTERN = '*{}*wfi*.p'
+STRAIN_PATTERN = '*{}*N2_ref*.p'
+
+
+def _is_columnar(value):
+    """True if value can be stored as a memory mapped array."""
+    if not isinstance(value, np.ndarray) or isinstance(value, np.ma.MaskedArray):
+        return False
+    # Zero length files cannot be memory mapped.
+    return value.dtype.kind in 'biufcmM' and value.size > 0
+
+
+def _source_mtime(source):
+    if source is None or not os.path.exists(source):
+        return None
+    return os.path.getmtime(source)
+
+
+def find_inputs(floatID, apply_w=True, apply_strain=True,
+                input_dirs=INPUT_DIRS):
+    """
+    Processed files, besides the raw data, that a float loaded with these
+    options may depend on: w model fits if apply_w and reference N2 if
+    apply_strain. All candidates are listed, so that changing any of them
+    marks the store as stale.
+    """
+    patterns = []
+    if apply_w:
+        patterns.append(W_FIT_PATTERN.format(int(floatID)))
+    if apply_strain:
+        patterns.append(STRAIN_PATTERN.format(int(floatID)))
+
+    inputs = set()
+    for dirpath in input_dirs:
+        for pattern in patterns:
+            inputs.update(os.path.normpath(p)
+                          for p in glob.glob(os.path.join(dirpath, pattern)))
+    return sorted(inputs)
+
+
+def store_path(floatID, apply_w=True, apply_strain=True, apply_iso=True,
+               store_dir=STORE_DIR):
+    """Directory of the store for a float and set of load options."""
+    name = "{:d}_w{:d}s{:d}i{:d}".format(int(floatID), apply_w, apply_strain,
+                                         apply_iso)
+    return os.path.join(store_dir, name)
+
+
+def convert(Float, dirpath, load_options=None, source=None, inputs=None):
+    """
+    Write the state of an EMApexFloat to a columnar store.
+
+    Parameters
+    ----------
+    Float : EMApexFloat
+        Loaded float object.
+    dirpath : str
+        Store directory, created if it does not exist.
+    load_options : dict, optional
+        Options used to load Float, recorded in the header.
+    source : str, optional
+        Path of the file Float was loaded from. Its modification time is
+        recorded so that stale stores can be detected.
+    inputs : list of str, optional
+        Other files Float depends on, e.g. w model fits, see find_inputs.
+        Their modification times are recorded too.
+
+    """
+
+    if not os.path.exists(dirpath):
+        os.makedirs(dirpath)
+
+    # Remove the header first so a partially rewritten store is never opened.
+    header_file = os.path.join(dirpath, HEADER_NAME)
+    if os.path.exists(header_file):
+        os.remove(header_file)
+
+    variables = {}
+    objects = {}
+
+    for name, value in vars(Float).items():
+        if name.startswith('_'):
+            continue
+
+        if not _is_columnar(value):
+            objects[name] = value
+            continue
+
+        arr = np.lib.format.open_memmap(os.path.join(dirpath, name + '.npy'),
+                                        mode='w+', dtype=value.dtype,
+                                        shape=value.shape,
+                                        fortran_order=value.ndim > 1)
+        arr[...] = value
+        arr.flush()
+        del arr
+
+        variables[name] = {'dtype': value.dtype.str,
+                           'shape': list(value.shape)}
+
+    with open(os.path.join(dirpath, OBJECTS_NAME), 'wb') as f:
+        pickle.dump(objects, f, pickle.HIGHEST_PROTOCOL)
+
+    header = {
+        'version': STORE_VERSION,
+        'floatID': int(Float.floatID),
+        'load_options': load_options if load_options is not None else {},
+        'source': source,
+        'source_mtime': _source_mtime(source),
+        'inputs': dict((p, _source_mtime(p)) for p in (inputs or [])),
+        'variables': variables,
+        'objects': sorted(objects.keys()),
+        }
+
+    tmp_file = header_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(header, f, indent=1, sort_keys=True)
+    os.rename(tmp_file, header_file)
+
+
+def read_header(dirpath):
+    """Read the header of a store, returning None if it does not exist."""
+    header_file = os.path.join(dirpath, HEADER_NAME)
+    if not os.path.exists(header_file):
+        return None
+    with open(header_file, 'r') as f:
+        return json.load(f)
+
+
+def _newer(path, recorded_mtime):
+    mtime = _source_mtime(path)
+    if mtime is None or recorded_mtime is None:
+        # Can't check the file (e.g. working offline) so trust the store.
+        return False
+    return mtime > recorded_mtime
+
+
+def is_stale(dirpath, source=None, inputs=None):
+    """
+    True if the store is missing, from an old version, or older than the raw
+    data or any of its other input files. If inputs is given, a store built
+    from a different set of input files is also stale.
+    """
+    header = read_header(dirpath)
+    if header is None or header['version'] != STORE_VERSION:
+        return True
+
+    if source is None:
+        source = header['source']
+
+    if _newer(source, header['source_mtime']):
+        return True
+
+    recorded = header.get('inputs', {})
+    if inputs is not None and set(inputs) != set(recorded.keys()):
+        return True
+
+    return any(_newer(p, mtime) for p, mtime in recorded.items())
+
+
+class StoredFloat(ic.CachedInterpMixin, emapex.EMApexFloat):
+    """
+    EMApexFloat opened from a columnar store.
+
+    EMApexFloat.__init__ is deliberately not called. Array attributes are
+    opened as memory maps the first time they are accessed and all other
+    attributes (e.g. the Profile objects) are unpickled together on first
+    access to any of them. The default mmap_mode 'c' is copy-on-write, so
+    methods that modify arrays in place (apply_w_model, apply_strain, ...)
+    work as usual but never write back to the store.
+
+    Methods that iterate over __dict__ only see attributes that have been
+    touched, call load_all first if that matters.
+
+    get_interp_grid is memoised, see interp_cache.CachedInterpMixin.
+
+    """
+
+    def __init__(self, dirpath, mmap_mode='c'):
+        header = read_header(dirpath)
+        if header is None:
+            raise IOError("No float store found in {}.".format(dirpath))
+
+        self.__dict__['_store'] = {
+            'dirpath': dirpath,
+            'mmap_mode': mmap_mode,
+            'header': header,
+            'objects_loaded': False,
+            }
+
+        self.floatID = header['floatID']
+
+    def __getattr__(self, name):
+        # Only called when normal attribute lookup fails.
+        store = self.__dict__.get('_store')
+        if store is None or name.startswith('__'):
+            raise AttributeError(name)
+
+        header = store['header']
+
+        if name in header['variables']:
+            fname = os.path.join(store['dirpath'], name + '.npy')
+            value = np.load(fname, mmap_mode=store['mmap_mode'])
+            self.__dict__[name] = value
+            return value
+
+        if name in header['objects'] and not store['objects_loaded']:
+            self._load_objects()
+            return self.__dict__[name]
+
+        raise AttributeError("'{}' object has no attribute '{}'"
+                             .format(type(self).__name__, name))
+
+    def _load_objects(self):
+        store = self.__dict__['_store']
+        with open(os.path.join(store['dirpath'], OBJECTS_NAME), 'rb') as f:
+            objects = pickle.load(f)
+
+        for name, value in objects.items():
+            # Don't clobber anything set since the store was opened.
+            if name not in self.__dict__:
+                self.__dict__[name] = value
+
+        store['objects_loaded'] = True
+
+    @property
+    def stored_variables(self):
+        """Names of the memory mapped array attributes."""
+        return sorted(self.__dict__['_store']['header']['variables'].keys())
+
+    def load_all(self):
+        """Open every stored attribute."""
+        for name in self.stored_variables:
+            getattr(self, name)
+        if not self.__dict__['_store']['objects_loaded']:
+            self._load_objects()
+
+
+def load(floatID, apply_w=True, apply_strain=True, apply_iso=True,
+         verbose=True, store_dir=STORE_DIR, refresh=False, mmap_mode='c',
+         cache_bytes=ic.INTERP_CACHE_BYTES, inputs=None):
+    """
+    Drop in replacement for emapex.load backed by a columnar store.
+
+    If no up to date store exists for the float and load options, the float
+    is loaded with emapex.load and converted first.
+
+    Parameters
+    ----------
+    floatID : int
+        EM-APEX float ID number.
+    apply_w, apply_strain, apply_iso, verbose : bool, optional
+        Passed to emapex.load. Each combination of the apply options gets its
+        own store.
+    store_dir : str, optional
+        Root directory of the stores.
+    refresh : bool, optional
+        Force reconversion from the raw data.
+    mmap_mode : str, optional
+        Memory map mode, see numpy.load.
+    cache_bytes : int, optional
+        Byte budget of the get_interp_grid cache, 0 disables it.
+    inputs : list of str, optional
+        The w model fit and reference N2 files that emapex.load applies,
+        checked along with the raw data to decide whether the store is
+        stale. Found with find_inputs by default.
+
+    Returns
+    -------
+    Float : StoredFloat
+
+    """
+
+    load_options = {'apply_w': apply_w, 'apply_strain': apply_strain,
+                    'apply_iso': apply_iso}
+    dirpath = store_path(floatID, store_dir=store_dir, **load_options)
+
+    try:
+        source = emapex.find_file(floatID)
+    except Exception:
+        source = None
+
+    if inputs is None:
+        inputs = find_inputs(floatID, apply_w, apply_strain)
+        if (apply_w or apply_strain) and not inputs:
+            warnings.warn("No w fit or N2 files found for float {}, the "
+                          "store can only be checked against the raw data."
+                          .format(floatID))
+
+    if refresh or is_stale(dirpath, source, inputs):
+        if verbose:
+            print("Converting float {} to columnar store.".format(floatID))
+        Float = emapex.load(floatID, verbose=verbose, **load_options)
+        convert(Float, dirpath, load_options, source, inputs)
+        del Float
+
+    if verbose:
+        print("Opening float {} from {}.".format(floatID, dirpath))
+
+    Float = StoredFloat(dirpath, mmap_mode=mmap_mode)
+    Float.set_interp_cache(cache_bytes)
+
+    return Float
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Convert floats to the columnar store.')
+    parser.add_argument('--floatIDs', type=int, nargs='+',
+                        default=emapex.FIDS_DIMES,
+                        help='EM-APEX float ID numbers')
+    parser.add_argument('--raw', action='store_true',
+                        help='store without w, strain or isopycnal fields')
+    parser.add_argument('--store_dir', type=str, default=STORE_DIR,
+                        help='root directory of the stores')
+    args = parser.parse_args()
+
+    apply = not args.raw
+
+    for floatID in args.floatIDs:
+        load(floatID, apply_w=apply, apply_strain=apply, apply_iso=apply,
+             store_dir=args.store_dir, refresh=True)
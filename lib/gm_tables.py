@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 09:37:52 2026
+
+@author: jc3e13
+
+Tabulated Garrett-Munk reference spectra.
+
+Finescale and turbulence estimates normalise every window by a Garrett-Munk
+spectrum, and its integral over a band of wavenumbers, at the mean buoyancy
+frequency of the window. Here a GM spectrum function is evaluated once on the
+wavenumbers of the analysis for a dense, logarithmic grid of N, together with
+its band integrals, and the values for any N are then interpolated linearly
+in log N of the log spectrum. The amplitude of GM spectra is a power of N,
+which this interpolation reproduces exactly, so only the slow change of
+shape with N is approximated. Powers of N and constant factors used to
+normalise a spectrum are applied analytically at lookup rather than
+tabulated. Tables are memoised, so each is built once per run.
+
+    import gm_tables as gmt
+    table = gmt.get_table(GM79.E_she_z, m, 2.*np.pi, m_0=1./150., m_c=1./15.)
+    IGMshear = table.integral(N_mean, N_power=1)
+
+"""
+
+import numpy as np
+
+import finescale_spectra as fsp
+import interp_cache as ic
+
+
+GM_TABLE_BYTES = 64*2**20
+
+# Buoyancy frequencies of the tables, rad s-1.
+N_TABLE = np.logspace(-5., -1.5, 401)
+
+_tables = ic.InterpCache(GM_TABLE_BYTES)
+
+
+def _log_interp(logN, logx, values, positive):
+    """Interpolate rows of values, on the grid logx, to logN, logarithmically
+    where positive."""
+    i = np.clip(np.searchsorted(logx, logN, side='right') - 1, 0,
+                logx.size - 2)
+    frac = ((logN - logx[i])/(logx[i + 1] - logx[i]))[..., np.newaxis]
+    v0, v1 = values[i], values[i + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logv = np.log(np.where(positive, v0, 1.))*(1. - frac) \
+            + np.log(np.where(positive, v1, 1.))*frac
+    return np.where(positive, np.exp(logv), v0*(1. - frac) + v1*frac)
+
+
+class GMTable(object):
+    """
+    A spectrum function tabulated in buoyancy frequency.
+
+    Parameters
+    ----------
+    func : function
+        Spectrum func(m, N), e.g. GM79.E_she_z, taking an array of
+        wavenumbers and a scalar buoyancy frequency.
+    m : 1D array
+        Wavenumbers of the analysis.
+    m_scale : float, optional
+        func is evaluated at m_scale*m, e.g. 2 pi for cyclical wavenumbers m
+        and a func of angular wavenumber.
+    m_0, m_c : float, optional
+        Band of the integrals, as for integrated_ps. Without them only the
+        spectra are tabulated.
+    N : 1D array, optional
+        Increasing buoyancy frequencies of the table. Values outside it are
+        evaluated directly.
+
+    """
+
+    def __init__(self, func, m, m_scale=1., m_0=None, m_c=None, N=None):
+        self.func = func
+        self.m = np.asarray(m, dtype=float)
+        self.m_scale = m_scale
+        self.m_0 = m_0
+        self.m_c = m_c
+        self.N = N_TABLE if N is None else np.asarray(N, dtype=float)
+        self._logN = np.log(self.N)
+
+        self.S = np.array([self._evaluate(N_) for N_ in self.N])
+        self._S_positive = (self.S > 0.).all(axis=0)
+
+        if m_0 is not None and m_c is not None:
+            self.I = fsp.band_integral(self.m, self.S, m_c, m_0)
+            self._I_positive = (self.I > 0.).all()
+        else:
+            self.I = None
+
+    def _evaluate(self, N):
+        return np.broadcast_to(self.func(self.m_scale*self.m, N),
+                               self.m.shape).astype(float)
+
+    def _lookup(self, N, values, positive, direct):
+        N = np.asarray(N, dtype=float)
+        Nf = N.ravel()
+        out = np.full((Nf.size,) + values.shape[1:], np.nan)
+
+        inside = (Nf >= self.N[0]) & (Nf <= self.N[-1])
+        if inside.any():
+            out[inside] = _log_interp(np.log(Nf[inside]), self._logN, values,
+                                      positive)
+        for j in np.flatnonzero(~inside & ~np.isnan(Nf)):
+            out[j] = direct(Nf[j])
+
+        return out.reshape(N.shape + values.shape[1:])
+
+    def spectrum(self, N, amplitude=1., N_power=0):
+        """
+        amplitude*func(m_scale*m, N)/N**N_power, (len(m),) for a scalar N
+        and N.shape + (len(m),) otherwise.
+        """
+        S = self._lookup(N, self.S, self._S_positive, self._evaluate)
+        N = np.asarray(N, dtype=float)[..., np.newaxis]
+        return amplitude*S/N**N_power
+
+    def integral(self, N, amplitude=1., N_power=0):
+        """Integral of spectrum(N, amplitude, N_power) between m_0 and m_c,
+        the shape of N."""
+        if self.I is None:
+            raise ValueError("The table was built without a band.")
+
+        def direct(N_):
+            return fsp.band_integral(self.m, self._evaluate(N_), self.m_c,
+                                     self.m_0)
+
+        I = self._lookup(N, self.I[:, np.newaxis],
+                         np.array([self._I_positive]), direct)[..., 0]
+        return amplitude*I/np.asarray(N, dtype=float)**N_power
+
+
+def get_table(func, m, m_scale=1., m_0=None, m_c=None, N=None):
+    """Memoised GMTable, built once for each spectrum function, wavenumbers,
+    band and grid of N."""
+    m = np.ascontiguousarray(m, dtype=float)
+    Nk = None if N is None else np.ascontiguousarray(N, dtype=float).tobytes()
+    key = (func, m.shape, m.tobytes(), m_scale, m_0, m_c, Nk)
+    table = _tables.get(key)
+    if table is None:
+        table = GMTable(func, m, m_scale, m_0, m_c, N)
+        # The arrays are listed so that the cache can count their bytes.
+        _tables.put(key, (table.S, table.I, table))
+        return table
+    return table[-1]
+
+
+def clear_tables():
+    """Empty the cache of get_table."""
+    _tables.clear()
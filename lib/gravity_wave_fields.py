@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:20:14 2026
+
+@author: jc3e13
+
+Fused evaluation of the fields of a plane internal gravity wave.
+
+gravity_waves evaluates u, v, w, b and phi with separate functions, each
+recomputing the frequency, the phase and a complex exponential. Fitting
+routines want all five at once, usually for many parameter sets, so here the
+phase and its sine and cosine are computed once and every field is a real
+linear combination of the two. The conventions are those of gravity_waves,
+a wave with pressure perturbation amplitude phi_0 and phase
+
+    theta = k*x + l*y + m*z - (om + k*U + l*V + m*W)*t + phase_0,
+
+has polarisation relations
+
+    u = Re{(k*om + i*l*f)/(om**2 - f**2) phi_0 exp(i*theta)}
+    v = Re{(l*om - i*k*f)/(om**2 - f**2) phi_0 exp(i*theta)}
+    w = Re{-m*om/(N**2 - om**2) phi_0 exp(i*theta)}
+    b = Re{i*m*N**2/(N**2 - om**2) phi_0 exp(i*theta)}
+    phi = Re{phi_0 exp(i*theta)}
+
+"""
+
+import numpy as np
+
+
+def omega(N, k, m, l=0., f=0.):
+    """Dispersion relation, same argument order as gravity_waves.omega."""
+    kh2 = k**2 + l**2
+    return np.sqrt((f**2*m**2 + N**2*kh2)/(kh2 + m**2))
+
+
+def fields(x, y, z, t, phi_0, k, l, m, om, N, f=0., U=0., V=0., W=0.,
+           phase_0=0.):
+    """
+    All five fields of a plane wave from a single phase evaluation.
+
+    Arguments are as for the gravity_waves field functions and broadcast
+    against each other.
+
+    Returns
+    -------
+    u, v, w, b, phi : ndarrays
+
+    """
+    theta = k*x + l*y + m*z - (om + k*U + l*V + m*W)*t + phase_0
+    c = np.cos(theta)
+    s = np.sin(theta)
+
+    # Real and imaginary parts of the complex amplitudes.
+    horiz = phi_0/(om**2 - f**2)
+    vert = phi_0/(N**2 - om**2)
+
+    u = horiz*(k*om*c - l*f*s)
+    v = horiz*(l*om*c + k*f*s)
+    w = -vert*m*om*c
+    b = -vert*m*N**2*s
+    phi = phi_0*c
+
+    return u, v, w, b, phi
+
+
+def _expand(params, ndim):
+    """Split parameter columns, adding trailing axes so that a batch of
+    parameter vectors broadcasts against observations with ndim dims."""
+    params = np.asarray(params, dtype=float)
+    if params.ndim == 1:
+        return [p for p in params]
+    shape = params.shape[:-1] + (1,)*ndim
+    return [params[..., i].reshape(shape) for i in range(params.shape[-1])]
+
+
+def model_fields(params, data):
+    """
+    Fields of the wave model used in the MCMC fitting scripts.
+
+    Parameters
+    ----------
+    params : array_like
+        [phi_0, X, Y, Z, phase_0] with wavelengths X, Y, Z, or an array of
+        shape (n_params, 5) to evaluate a batch of parameter vectors at once.
+    data : list
+        [t, x, y, z, U, V, N, f], observation times and positions and the
+        background flow, stratification and Coriolis parameter.
+
+    Returns
+    -------
+    u, v, w, b, phi : ndarrays
+        Shape of the observations, or (n_params,) + that shape for a batch.
+
+    """
+    t, x, y, z, U, V, N, f = data
+    phi_0, X, Y, Z, phase_0 = _expand(params, np.ndim(t + x + y + z))
+
+    k = 2*np.pi/X
+    l = 2*np.pi/Y
+    m = 2*np.pi/Z
+
+    om = omega(N, k, m, l, f)
+
+    return fields(x, y, z, t, phi_0, k, l, m, om, N, f=f, U=U, V=V,
+                  phase_0=phase_0)
+
+
+def full_model(params, data, scales=(1., 1., 1., 1., 1.)):
+    """Scaled u, v, w, b and phi stacked end to end along the last axis,
+    (n_params, 5*n_obs) for a batch of parameter vectors."""
+    return np.concatenate([scale*field for scale, field in
+                           zip(scales, model_fields(params, data))], axis=-1)
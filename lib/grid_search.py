@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:12:53 2026
+
+@author: jc3e13
+
+Brute force searches of parameter space on regular grids.
+
+The grid is the outer product of one axis per parameter. It is walked in
+chunks of flat indices, each chunk turned into an (n, n_params) array of
+parameter vectors and handed to a cost function that evaluates the whole
+batch at once, so vectorised models do the work in numpy rather than in a
+Python loop over points. Chunks are shared out over a process pool and the
+result is a cost cube with one dimension per axis.
+
+coarse_to_fine searches a coarse grid, then repeatedly searches finer grids
+spanning the neighbouring cells of the best points found so far.
+
+    import grid_search as gs
+    axes = [Xs, Ys, Zs, phases]
+    cost = gs.grid_search(cost_func, axes, processes=8)
+    p_best, c_best, __ = gs.best_cells(axes, cost, 10)
+
+"""
+
+import multiprocessing as mp
+import numpy as np
+
+
+# Cost function and axes used by the workers, set by _init_worker.
+_shared = {}
+
+
+def _init_worker(cost_func, axes):
+    _shared.clear()
+    _shared['cost_func'] = cost_func
+    _shared['axes'] = axes
+
+
+def grid_points(axes, flat_idxs):
+    """Parameter vectors (n, n_params) at flat indices of the grid."""
+    idxs = np.unravel_index(flat_idxs, [len(ax) for ax in axes])
+    return np.column_stack([ax[i] for ax, i in zip(axes, idxs)])
+
+
+def _evaluate_chunk(bounds):
+    start, stop = bounds
+    points = grid_points(_shared['axes'], np.arange(start, stop))
+    return np.asarray(_shared['cost_func'](points), dtype=float)
+
+
+def grid_search(cost_func, axes, chunk_size=4096, processes=1,
+                verbose=False):
+    """
+    Evaluate a cost function on every point of a grid.
+
+    Parameters
+    ----------
+    cost_func : function
+        Takes an (n, n_params) array of parameter vectors and returns n
+        costs, or an (n, ...) array of any other per point output. Must be
+        picklable (e.g. defined at module level) if the start method of
+        multiprocessing is not fork.
+    axes : list of 1D arrays
+        Values of each parameter.
+    chunk_size : int, optional
+        Number of points per batch.
+    processes : int, optional
+        Number of processes, None for all cores.
+    verbose : bool, optional
+        Print progress.
+
+    Returns
+    -------
+    cost : ndarray
+        Costs with shape (len(axes[0]), len(axes[1]), ...) followed by the
+        shape of the per point output, if any.
+
+    """
+    axes = [np.asarray(ax, dtype=float) for ax in axes]
+    shape = tuple(len(ax) for ax in axes)
+    npoints = int(np.prod(shape))
+
+    bounds = [(start, min(start + chunk_size, npoints))
+              for start in range(0, npoints, chunk_size)]
+
+    if processes is None:
+        processes = mp.cpu_count()
+
+    if verbose:
+        print("Evaluating {} points in {} chunks on {} processes.".format(
+            npoints, len(bounds), processes))
+
+    if processes > 1:
+        pool = mp.Pool(processes, initializer=_init_worker,
+                       initargs=(cost_func, axes))
+        try:
+            # map keeps the chunks in order.
+            costs = pool.map(_evaluate_chunk, bounds, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+            _shared.clear()
+    else:
+        _init_worker(cost_func, axes)
+        try:
+            costs = [_evaluate_chunk(b) for b in bounds]
+        finally:
+            _shared.clear()
+
+    costs = np.concatenate(costs)
+    return costs.reshape(shape + costs.shape[1:])
+
+
+def best_cells(axes, cost, n=1):
+    """
+    Lowest cost points of a grid, NaNs ignored.
+
+    Returns
+    -------
+    points : ndarray
+        (n, n_params) parameter vectors, best first.
+    costs : ndarray
+        Their costs.
+    idxs : tuple of arrays
+        Their indices into the cost cube.
+
+    """
+    flat = np.where(np.isnan(cost), np.inf, cost).ravel()
+    n = min(n, flat.size)
+    best = np.argpartition(flat, n - 1)[:n]
+    best = best[np.argsort(flat[best])]
+    return (grid_points(axes, best), flat[best],
+            np.unravel_index(best, cost.shape))
+
+
+def local_axes(axes, idx, factor=4):
+    """
+    Finer axes spanning the cells either side of a grid point.
+
+    Each axis runs from the neighbouring grid value below the point to the
+    one above with factor times the original resolution. Points on the edge
+    of the grid are refined inside the grid only.
+
+    """
+    new_axes = []
+    for ax, i in zip(axes, idx):
+        if len(ax) == 1:
+            new_axes.append(ax.copy())
+            continue
+        lo = ax[max(i - 1, 0)]
+        hi = ax[min(i + 1, len(ax) - 1)]
+        ncells = (min(i + 1, len(ax) - 1) - max(i - 1, 0))*factor
+        new_axes.append(np.linspace(lo, hi, ncells + 1))
+    return new_axes
+
+
+def coarse_to_fine(cost_func, axes, levels=2, n_best=5, factor=4,
+                   chunk_size=4096, processes=1, verbose=False):
+    """
+    Grid search followed by finer searches around the best points.
+
+    Parameters
+    ----------
+    cost_func, axes, chunk_size, processes, verbose :
+        See grid_search.
+    levels : int, optional
+        Number of refinements after the coarse search.
+    n_best : int, optional
+        Number of best points refined at every level. Taking several guards
+        against refining a local minimum only.
+    factor : int, optional
+        Resolution increase per level.
+
+    Returns
+    -------
+    grids : list
+        (axes, cost) of every grid searched, the coarse grid first.
+    point : ndarray
+        Lowest cost parameter vector found.
+    cost : float
+        Its cost.
+
+    """
+    axes = [np.asarray(ax, dtype=float) for ax in axes]
+    grids = [(axes, grid_search(cost_func, axes, chunk_size, processes,
+                                verbose))]
+    current = grids[:]
+
+    for level in range(levels):
+        # Best points over all grids of the previous level.
+        candidates = []
+        for ax, cost in current:
+            points, costs, idxs = best_cells(ax, cost, n_best)
+            for j in range(len(costs)):
+                idx = tuple(i[j] for i in idxs)
+                candidates.append((costs[j], tuple(points[j]), ax, idx))
+        candidates.sort(key=lambda c: c[0])
+
+        current = []
+        seen = set()
+        for c, point, ax, idx in candidates:
+            if point in seen:
+                continue
+            seen.add(point)
+            new_axes = local_axes(ax, idx, factor)
+            current.append((new_axes, grid_search(cost_func, new_axes,
+                                                  chunk_size, processes,
+                                                  verbose)))
+            if len(seen) == n_best:
+                break
+
+        grids.extend(current)
+
+        if verbose:
+            best = min(np.nanmin(cost) for __, cost in current)
+            print("Level {}: best cost {}".format(level + 1, best))
+
+    best_point, best_cost = None, np.inf
+    for ax, cost in grids:
+        points, costs, __ = best_cells(ax, cost, 1)
+        if costs[0] < best_cost:
+            best_point, best_cost = points[0], costs[0]
+
+    return grids, best_point, best_cost
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:41:09 2026
+
+@author: jc3e13
+
+Memoised interpolation of floats onto grids.
+
+Analyses call get_interp_grid with the same half profiles, grid and
+variables over and over, e.g. once per branch of a loop over coordinates. The
+mixin here keeps the results in a least recently used cache with a byte
+budget. The cache is emptied whenever the float's data changes, that is when
+apply_w_model, apply_strain or calculate_pressure_perturbation is called or
+an array attribute is assigned. Arrays modified in place by other means are
+not noticed, call clear_interp_cache after doing that.
+
+    class StoredFloat(interp_cache.CachedInterpMixin, emapex.EMApexFloat):
+        ...
+
+    Float.set_interp_cache(512*2**20)
+    ng, __, X = Float.get_interp_grid(hpids, x, 'dUTC', 'z')
+
+"""
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+INTERP_CACHE_BYTES = 256*2**20
+
+
+def _nbytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _copy(value):
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _update(h, arg):
+    arr = np.asarray(arg)
+    if arr.dtype.kind in 'biuf':
+        # hpids of 1 and 1. must give the same key.
+        arr = arr.astype(float)
+    h.update(repr(arr.shape).encode())
+    h.update(arr.dtype.str.encode())
+    h.update(np.ascontiguousarray(arr).tobytes())
+
+
+def grid_key(*args, **kwargs):
+    """Hash of the arguments of get_interp_grid, arrays by their contents."""
+    h = hashlib.sha1()
+    for arg in args:
+        _update(h, arg)
+    for name in sorted(kwargs.keys()):
+        h.update(name.encode())
+        _update(h, kwargs[name])
+    return h.hexdigest()
+
+
+class InterpCache(object):
+    """
+    Least recently used cache of arrays with a byte budget.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Total size of the cached arrays. The least recently used entries are
+        dropped to make room, entries larger than the budget are not cached.
+
+    """
+
+    def __init__(self, max_bytes=INTERP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Cached value or None, marking it as recently used."""
+        value = self._entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        nbytes = _nbytes(value)
+        if key in self._entries:
+            self.nbytes -= _nbytes(self._entries.pop(key))
+        if nbytes > self.max_bytes:
+            return
+        while self.nbytes + nbytes > self.max_bytes:
+            __, old = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(old)
+        self._entries[key] = value
+        self.nbytes += nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+class CachedInterpMixin(object):
+    """
+    Memoises get_interp_grid of an EMApexFloat subclass. It must come before
+    EMApexFloat in the bases. Results are returned as copies, so they can be
+    modified without corrupting the cache.
+    """
+
+    def _get_interp_cache(self):
+        cache = self.__dict__.get('_interp_cache')
+        if cache is None:
+            cache = InterpCache()
+            self.__dict__['_interp_cache'] = cache
+        return cache
+
+    def set_interp_cache(self, max_bytes):
+        """Set the byte budget of the cache, 0 disables it."""
+        cache = self._get_interp_cache()
+        cache.max_bytes = max_bytes
+        if cache.nbytes > max_bytes:
+            cache.clear()
+
+    def clear_interp_cache(self):
+        self._get_interp_cache().clear()
+
+    def get_interp_grid(self, *args, **kwargs):
+        cache = self._get_interp_cache()
+        key = grid_key(*args, **kwargs)
+        value = cache.get(key)
+        if value is None:
+            value = super(CachedInterpMixin, self).get_interp_grid(*args,
+                                                                   **kwargs)
+            cache.put(key, _copy(value))
+            return value
+        return _copy(value)
+
+    def __setattr__(self, name, value):
+        if isinstance(value, np.ndarray) and '_interp_cache' in self.__dict__:
+            self.__dict__['_interp_cache'].clear()
+        super(CachedInterpMixin, self).__setattr__(name, value)
+
+    def apply_w_model(self, *args, **kwargs):
+        out = super(CachedInterpMixin, self).apply_w_model(*args, **kwargs)
+        self.clear_interp_cache()
+        return out
+
+    def apply_strain(self, *args, **kwargs):
+        out = super(CachedInterpMixin, self).apply_strain(*args, **kwargs)
+        self.clear_interp_cache()
+        return out
+
+    def calculate_pressure_perturbation(self, *args, **kwargs):
+        out = super(CachedInterpMixin,
+                    self).calculate_pressure_perturbation(*args, **kwargs)
+        self.clear_interp_cache()
+        return out
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:05:52 2026
+
+@author: jc3e13
+
+Local job runner for fanning scripts out over floats and profiles.
+
+Runs command line jobs in a bounded pool of subprocesses. Each job gets its
+own log file, failed jobs are retried, jobs whose outputs already exist are
+skipped and the state of every job is kept in a JSON status file so that an
+interrupted run can simply be started again. A summary is printed at the end.
+
+    import job_runner as jr
+    jobs = [jr.Job('fit_{}'.format(fid),
+                   ['python', 'fit_w_model_alt.py', '--floatID', str(fid)],
+                   outputs=['../processed_data/{}_wfi.p'.format(fid)])
+            for fid in emapex.FIDS_DIMES]
+    jr.run_jobs(jobs, workers=4, log_dir='../logs/fit_w_model')
+
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import subprocess
+import multiprocessing as mp
+
+
+class Job(object):
+    """
+    A command to run.
+
+    Parameters
+    ----------
+    name : str
+        Unique name, also used for the log file name.
+    args : list of str
+        Command and arguments, passed to subprocess.Popen.
+    outputs : list of str, optional
+        Files (glob patterns allowed) the job produces. If they all exist the
+        job is skipped.
+    cwd : str, optional
+        Working directory of the command.
+
+    """
+
+    def __init__(self, name, args, outputs=None, cwd=None):
+        self.name = name
+        self.args = [str(arg) for arg in args]
+        self.outputs = [] if outputs is None else list(outputs)
+        self.cwd = cwd
+
+    def outputs_exist(self):
+        if len(self.outputs) == 0:
+            return False
+        return all(len(glob.glob(output)) > 0 for output in self.outputs)
+
+    def __repr__(self):
+        return "Job({!r}, {!r})".format(self.name, ' '.join(self.args))
+
+
+def python_job(name, script, script_args=(), outputs=None, cwd=None):
+    """Job that runs a python script with the current interpreter."""
+    return Job(name, [sys.executable, script] + list(script_args),
+               outputs=outputs, cwd=cwd)
+
+
+def _save_status(status, status_file):
+    tmp_file = status_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(status, f, indent=1, sort_keys=True)
+    os.rename(tmp_file, status_file)
+
+
+def _print_summary(status, names):
+    counts = {}
+    for name in names:
+        state = status[name]['state']
+        counts[state] = counts.get(state, 0) + 1
+
+    print("Job summary: " + ", ".join("{} {}".format(n, state) for state, n in
+                                      sorted(counts.items())))
+
+    for name in names:
+        if status[name]['state'] == 'failed':
+            print("  FAILED {} (exit code {}, {} attempts), see {}".format(
+                name, status[name]['returncode'], status[name]['attempts'],
+                status[name]['log']))
+
+
+def run_jobs(jobs, workers=None, log_dir='logs', retries=1, skip_existing=True,
+             status_file=None, poll_interval=1., verbose=True):
+    """
+    Run jobs in a bounded pool of subprocesses.
+
+    Parameters
+    ----------
+    jobs : list of Job
+        Jobs to run, started in order.
+    workers : int, optional
+        Maximum number of jobs running at once, default the number of cores.
+    log_dir : str, optional
+        Directory for the log files and the default status file.
+    retries : int, optional
+        Number of times a failed job is rerun.
+    skip_existing : bool, optional
+        Skip jobs whose outputs all exist, and jobs the status file records
+        as done. If False every job is run.
+    status_file : str, optional
+        JSON file recording the state of every job. With skip_existing, jobs
+        recorded as done whose outputs still exist (or that have no outputs)
+        are not rerun. Defaults to status.json in log_dir.
+    poll_interval : float, optional
+        Seconds between checks on running jobs.
+    verbose : bool, optional
+        Print progress and the summary.
+
+    Returns
+    -------
+    status : dict
+        State ('skipped', 'done' or 'failed'), attempts, return code, log file
+        and run time of every job, keyed by job name.
+
+    """
+    if workers is None:
+        workers = mp.cpu_count()
+
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError('Job names must be unique.')
+
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    if status_file is None:
+        status_file = os.path.join(log_dir, 'status.json')
+
+    old_status = {}
+    if os.path.exists(status_file):
+        with open(status_file, 'r') as f:
+            old_status = json.load(f)
+
+    status = {}
+    queue = []
+
+    for job in jobs:
+        old = old_status.get(job.name, {})
+        done_before = (old.get('state') in ('done', 'skipped') and
+                       (len(job.outputs) == 0 or job.outputs_exist()))
+
+        if skip_existing and (done_before or job.outputs_exist()):
+            status[job.name] = dict(old, state='skipped')
+            status[job.name].setdefault('log', None)
+            continue
+
+        status[job.name] = {'state': 'queued', 'attempts': 0,
+                            'returncode': None, 'runtime': None,
+                            'log': os.path.join(log_dir, job.name + '.log')}
+        queue.append(job)
+
+    _save_status(status, status_file)
+
+    if verbose:
+        print("{} jobs queued, {} skipped, running {} at a time.".format(
+            len(queue), len(jobs) - len(queue), workers))
+
+    running = {}  # name -> (job, process, log file, start time)
+
+    try:
+        while queue or running:
+            while queue and len(running) < workers:
+                job = queue.pop(0)
+                info = status[job.name]
+                info['attempts'] += 1
+                info['state'] = 'running'
+
+                log = open(info['log'], 'a')
+                log.write("\n# Attempt {}: {}\n".format(info['attempts'],
+                                                       ' '.join(job.args)))
+                log.flush()
+
+                proc = subprocess.Popen(job.args, cwd=job.cwd, stdout=log,
+                                        stderr=subprocess.STDOUT)
+                running[job.name] = (job, proc, log, time.time())
+
+                if verbose:
+                    print("Started {}".format(job.name))
+
+                _save_status(status, status_file)
+
+            time.sleep(poll_interval if running else 0.)
+
+            for name in list(running.keys()):
+                job, proc, log, t0 = running[name]
+                returncode = proc.poll()
+                if returncode is None:
+                    continue
+
+                log.close()
+                del running[name]
+
+                info = status[name]
+                info['returncode'] = returncode
+                info['runtime'] = time.time() - t0
+
+                if returncode == 0:
+                    info['state'] = 'done'
+                elif info['attempts'] <= retries:
+                    info['state'] = 'queued'
+                    queue.append(job)
+                else:
+                    info['state'] = 'failed'
+
+                if verbose:
+                    print("Finished {} with exit code {} ({})".format(
+                        name, returncode, info['state']))
+
+                _save_status(status, status_file)
+
+    finally:
+        # Don't leave orphans behind if interrupted.
+        for job, proc, log, t0 in running.values():
+            proc.terminate()
+            proc.wait()
+            log.close()
+            status[job.name]['state'] = 'failed'
+            status[job.name]['returncode'] = proc.returncode
+        _save_status(status, status_file)
+
+    if verbose:
+        _print_summary(status, names)
+
+    return status
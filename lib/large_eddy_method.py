@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:05:37 2026
+
+@author: jc3e13
+
+Large eddy method estimates of turbulent dissipation for whole floats.
+
+The vertical velocity of many half profiles is interpolated onto one grid,
+(x by profile), and every step of the method then works along axis 0 of the
+whole grid: Butterworth filtering with filtfilt, the variance of the
+filtered velocity in a window centred on every grid point, and scaling to
+dissipation,
+
+    epsilon = c N <w'^2>,    kappa = eff epsilon / N^2,
+
+with N^2 averaged over the same window. Profiles are NaN padded on the grid
+and each column is filtered over its own valid span exactly as filtfilt
+would filter that span alone. Blocks of profiles may be spread over a
+process pool, results do not depend on the number of processes.
+
+    import large_eddy_method as lem
+    epsilon, kappa = lem.w_scales_float(Float, hpids, 'height', z, width=15.,
+                                        lc=(40., 15.), btype='bandpass')
+
+"""
+
+import multiprocessing as mp
+import numpy as np
+import scipy.signal as sig
+
+import batch_interp as bi
+import profile_spectra as ps
+
+
+# Grids and parameters used by the workers, set by _init_worker.
+_shared = {}
+
+
+def filtfilt_columns(b, a, X, padlen=None):
+    """
+    sig.filtfilt along axis 0 of X, each column over its valid span.
+
+    The odd extension at both ends of every span is built by indexing, the
+    forward pass runs on spans aligned at their start and the backward pass
+    on spans aligned at their end, so each pass is one lfilter call over all
+    columns and the result equals filtfilt applied column by column. Columns
+    not longer than padlen (default 3*max(len(a), len(b))) are NaN.
+
+    """
+    X = np.asarray(X, dtype=float)
+    n, ncols = X.shape
+    if padlen is None:
+        padlen = 3*max(len(a), len(b))
+
+    start, stop = ps.valid_spans(X)
+    length = stop - start
+    ok = length > padlen
+    out = np.full(X.shape, np.nan)
+    if not ok.any():
+        return out
+
+    cols = np.flatnonzero(ok)
+    start, length = start[cols], length[cols]
+    n_ext = length + 2*padlen
+    m = n_ext.max()
+
+    # Extended spans aligned at their start, j indexing the extended span.
+    j = np.arange(m)[:, np.newaxis]
+    k = j - padlen  # Position within the span.
+    first = X[start, cols]
+    last = X[start + length - 1, cols]
+    ki = np.clip(k, 0, length - 1)
+    inner = X[start + ki, cols]
+    left = 2.*first - X[start + np.clip(-k, 0, length - 1), cols]
+    right = 2.*last - X[start + np.clip(2*(length - 1) - k, 0, length - 1),
+                        cols]
+    ext = np.where(k < 0, left, np.where(k >= length, right, inner))
+    ext[j >= n_ext] = 0.
+
+    zi = sig.lfilter_zi(b, a)[:, np.newaxis]
+    y, __ = sig.lfilter(b, a, ext, axis=0, zi=zi*ext[0])
+
+    # Reverse each extended span in place, so it is aligned at its end.
+    r = np.clip(n_ext - 1 - j, 0, m - 1)
+    yr = np.take_along_axis(y, r, axis=0)
+    yr[j >= n_ext] = 0.
+    yr, __ = sig.lfilter(b, a, yr, axis=0, zi=zi*yr[0])
+    y = np.take_along_axis(yr, r, axis=0)
+
+    # Strip the extensions and put the spans back.
+    rows = start + np.arange(length.max())[:, np.newaxis]
+    inside = rows < start + length
+    src = np.minimum(padlen + np.arange(length.max())[:, np.newaxis], m - 1)
+    vals = np.take_along_axis(y, np.broadcast_to(src, inside.shape), axis=0)
+    out[rows[inside], np.broadcast_to(cols, inside.shape)[inside]] = \
+        vals[inside]
+
+    return out
+
+
+def sliding_mean(X, npts):
+    """
+    Mean of X in a window of npts points centred on every point along axis
+    0. NaN where the window is not entirely valid data or runs off the
+    grid.
+    """
+    n, ncols = X.shape
+    half = npts//2
+    bad = np.isnan(X)
+    Xz = np.where(bad, 0., X)
+    cs = np.zeros((n + 1, ncols))
+    np.cumsum(Xz, axis=0, out=cs[1:])
+    cb = np.zeros((n + 1, ncols))
+    np.cumsum(bad, axis=0, out=cb[1:])
+
+    out = np.full(X.shape, np.nan)
+    lo = np.arange(n) - half
+    hi = lo + npts
+    inside = (lo >= 0) & (hi <= n)
+    lo, hi = lo[inside], hi[inside]
+    mean = (cs[hi] - cs[lo])/npts
+    mean[(cb[hi] - cb[lo]) > 0] = np.nan
+    out[inside] = mean
+    return out
+
+
+def sliding_variance(X, npts):
+    """Variance of X in a window of npts points centred on every point along
+    axis 0, see sliding_mean."""
+    # Deviations are taken from the column mean first, which keeps the
+    # difference of sums accurate.
+    good = ~np.isnan(X)
+    col_mean = np.where(good, X, 0.).sum(axis=0)/np.maximum(good.sum(axis=0),
+                                                            1)
+    Xc = X - col_mean
+    mean = sliding_mean(Xc, npts)
+    var = sliding_mean(Xc**2, npts) - mean**2
+    return np.maximum(var, 0.)
+
+
+def filter_coefficients(dx, lc, btype='highpass', order=4):
+    """
+    Butterworth filter for data dx apart. lc is the cutoff wavelength or
+    period, a (long, short) pair for a bandpass. The order of 4 is that of
+    the filters of the TKED scripts.
+    """
+    Wn = 2.*dx/np.asarray(lc, dtype=float)
+    if btype == 'bandpass':
+        Wn = np.sort(Wn)
+    return sig.butter(order, Wn, btype)
+
+
+def _init_worker(w, N2, params):
+    _shared.clear()
+    _shared['w'] = w
+    _shared['N2'] = N2
+    _shared['params'] = params
+
+
+def _block_scales(bounds):
+    i0, i1 = bounds
+    return w_scales_grid(_shared['w'][:, i0:i1], _shared['N2'][:, i0:i1],
+                         **_shared['params'])
+
+
+def w_scales_grid(w, N2, dx=1., width=10., c=1., eff=0.2, we=1e-3, b=None,
+                  a=None):
+    """
+    Large eddy method on a grid of profiles.
+
+    Parameters
+    ----------
+    w : 2D array
+        Vertical velocity, (nx, n_profiles), NaN padded.
+    N2 : 2D array
+        Buoyancy frequency squared on the same grid.
+    dx : float, optional
+        Grid spacing.
+    width : float, optional
+        Width of the variance window in units of x.
+    c : float, optional
+        Large eddy method constant.
+    eff : float, optional
+        Mixing efficiency.
+    we : float, optional
+        Noise level of w.
+    b, a : arrays
+        Filter coefficients, see filter_coefficients.
+
+    Returns
+    -------
+    epsilon, kappa, ep_noise : 2D arrays
+        Dissipation, diffusivity and the dissipation of noise alone.
+    noise : 2D boolean array
+        Where epsilon is below the noise level.
+
+    """
+    w = filtfilt_columns(b, a, w)
+
+    npts = max(int(np.round(width/dx)), 1)
+    w_var = sliding_variance(w, npts)
+    N2_mean = sliding_mean(N2, npts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        N = np.sqrt(np.abs(N2_mean))
+        epsilon = c*N*w_var
+        kappa = eff*epsilon/np.abs(N2_mean)
+        ep_noise = c*N*we**2
+        noise = epsilon < ep_noise
+
+    return epsilon, kappa, ep_noise, noise
+
+
+def w_scales_float(Float, hpids, xvar, x, width=10., overlap=-1., lc=30.,
+                   c=1., eff=0.2, btype='highpass', we=1e-3, ret_noise=False,
+                   order=4, dt=1., t_max=15000., processes=1,
+                   block_size=64):
+    """
+    Large eddy method estimates for many profiles of a float.
+
+    Parameters
+    ----------
+    Float : EMApexFloat
+        Float with Ww and N2_ref.
+    hpids : array_like
+        Half profile numbers.
+    xvar : str
+        Coordinate of the filter and windows. 'time' (dUTC), 'height' (z) or
+        'eheight' (zw) filter and window in that coordinate. 'timeheight'
+        and 'timeeheight' first low pass in time with cutoff period lc[0], on
+        a grid dt apart up to t_max, then high pass with cutoff lc[1] and
+        window in z or zw.
+    x : 1D array
+        Regularly spaced grid of the windowing coordinate.
+    width : float, optional
+        Window width in units of x.
+    overlap : float, optional
+        Only -1, a window centred on every grid point, is supported.
+    lc : float or pair of floats, optional
+        Filter cutoff wavelength or period, (long, short) for a bandpass.
+    c, eff, we : floats, optional
+        See w_scales_grid.
+    btype : str, optional
+        'highpass' or 'bandpass'.
+    ret_noise : bool, optional
+        Also return the noise dissipation and flag.
+    order : int, optional
+        Butterworth filter order.
+    dt, t_max : float, optional
+        Time grid of the low pass of the time then height options.
+    processes : int, optional
+        Processes over which blocks of profiles are shared.
+    block_size : int, optional
+        Profiles per block.
+
+    Returns
+    -------
+    epsilon, kappa : 2D arrays
+        (len(x), n_profiles).
+    ep_noise, noise : 2D arrays, if ret_noise
+        See w_scales_grid.
+
+    """
+    if overlap != -1:
+        raise ValueError("Only overlap=-1, sliding windows, is supported.")
+
+    x = np.asarray(x, dtype=float)
+    dx = x[1] - x[0]
+
+    coords = {'time': 'dUTC', 'height': 'z', 'eheight': 'zw',
+              'timeheight': 'z', 'timeeheight': 'zw'}
+    if xvar not in coords:
+        raise ValueError("Unknown xvar {!r}.".format(xvar))
+    coord = coords[xvar]
+
+    if xvar in ('timeheight', 'timeeheight'):
+        # First low pass in time, then resample the filtered velocity at the
+        # times each profile passes the grid heights and high pass there.
+        t = np.arange(0., t_max, dt)
+        __, __, wt = Float.get_interp_grid(hpids, t, 'dUTC', 'Ww')
+        b, a = filter_coefficients(dt, lc[0], 'lowpass', order)
+        wt = filtfilt_columns(b, a, wt)
+
+        __, __, it = Float.get_interp_grid(hpids, x, coord, 'dUTC')
+        w = bi.interp_columns(it, np.broadcast_to(t[:, np.newaxis],
+                                                  wt.shape), wt)
+
+        btype = 'highpass'
+        lc = lc[1]
+    else:
+        __, __, w = Float.get_interp_grid(hpids, x, coord, 'Ww')
+
+    __, __, N2 = Float.get_interp_grid(hpids, x, coord, 'N2_ref')
+
+    b, a = filter_coefficients(dx, lc, btype, order)
+    params = {'dx': dx, 'width': width, 'c': c, 'eff': eff, 'we': we,
+              'b': b, 'a': a}
+
+    ncols = w.shape[1]
+    bounds = [(i, min(i + block_size, ncols))
+              for i in range(0, ncols, block_size)]
+
+    if processes > 1 and len(bounds) > 1:
+        pool = mp.Pool(processes, initializer=_init_worker,
+                       initargs=(w, N2, params))
+        try:
+            results = pool.map(_block_scales, bounds, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+            _shared.clear()
+    else:
+        _init_worker(w, N2, params)
+        try:
+            results = [_block_scales(bd) for bd in bounds]
+        finally:
+            _shared.clear()
+
+    epsilon, kappa, ep_noise, noise = [np.hstack(r) for r in zip(*results)]
+
+    if ret_noise:
+        return epsilon, kappa, ep_noise, noise
+    else:
+        return epsilon, kappa
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:02:18 2026
+
+@author: jc3e13
+
+Spectra of many profiles at once.
+
+Spectral diagnostics used to interpolate a float onto a grid with
+get_interp_grid and then loop over the columns calling periodogram on each.
+Here all columns are transformed in a single FFT along the grid. Profiles
+rarely span the whole grid and get_interp_grid pads them with NaN, so each
+column is windowed over its own valid span only and padded with zeros, which
+keeps every column on the same frequencies.
+
+    import profile_spectra as ps
+    t = np.arange(1000., 10000., 1.)
+    f, PP, PPmed = ps.get_spectra(Float, hpids, t, 'dUTC', 'P', quantiles=50.)
+
+"""
+
+import numpy as np
+import scipy.signal as sig
+
+
+# Below this product of angular frequency and series length the sums of
+# lombscargle are computed directly.
+LOW_OMEGA_T = 2.
+
+
+def valid_spans(X):
+    """
+    First and one past the last non-NaN index of each column of X. Columns
+    with no valid data have zero length spans.
+    """
+    good = ~np.isnan(X)
+    n = X.shape[0]
+    anygood = good.any(axis=0)
+    start = np.where(anygood, np.argmax(good, axis=0), 0)
+    stop = np.where(anygood, n - np.argmax(good[::-1], axis=0), 0)
+    return start, stop
+
+
+def masked_windows(start, stop, n, window='hann'):
+    """
+    Window each column over its span [start, stop) and zero elsewhere, shape
+    (n, ncols). Windows are only computed once per distinct span length.
+    """
+    W = np.zeros((n, len(start)))
+    lengths = stop - start
+    for length in np.unique(lengths):
+        if length == 0:
+            continue
+        win = sig.get_window(window, length)
+        for i in np.flatnonzero(lengths == length):
+            W[start[i]:stop[i], i] = win
+    return W
+
+
+def grid_spectra(X, fs=1., window='hann', detrend='constant',
+                 scaling='density', min_length=2):
+    """
+    One sided spectra of every column of a grid with NaN padded ends.
+
+    Where a column is complete the result is the same as
+    sig.periodogram(X, fs, window, detrend=detrend, scaling=scaling,
+    axis=0). Shorter columns are detrended and windowed over their valid span
+    and zero padded to the length of the grid. NaNs within a span are treated
+    as zero after detrending.
+
+    Parameters
+    ----------
+    X : 2D array
+        Data, (n, ncols).
+    fs : float, optional
+        Sampling frequency.
+    window : str or tuple, optional
+        Window, see sig.get_window.
+    detrend : 'constant', 'linear' or False, optional
+        Detrending of each column over its valid span.
+    scaling : 'density' or 'spectrum', optional
+        As for sig.periodogram.
+    min_length : int, optional
+        Columns with shorter spans are returned as NaN.
+
+    Returns
+    -------
+    f : 1D array
+        Frequencies.
+    P : 2D array
+        Spectra, (len(f), ncols).
+
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[:, np.newaxis]
+    n, ncols = X.shape
+
+    start, stop = valid_spans(X)
+    short = (stop - start) < min_length
+    stop[short] = start[short]
+
+    idx = np.arange(n)[:, np.newaxis]
+    inspan = (idx >= start) & (idx < stop)
+    good = inspan & ~np.isnan(X)
+    Xg = np.where(good, X, 0.)
+
+    if detrend == 'constant':
+        ngood = np.maximum(good.sum(axis=0), 1)
+        Xg -= good*(Xg.sum(axis=0)/ngood)
+    elif detrend == 'linear':
+        # Least squares line through the valid points of each column.
+        ngood = np.maximum(good.sum(axis=0), 1)
+        s = np.where(good, idx, 0.)
+        sm = s.sum(axis=0)/ngood
+        xm = Xg.sum(axis=0)/ngood
+        ds = good*(s - sm)
+        slope = (ds*(Xg - xm)).sum(axis=0)/np.maximum((ds**2).sum(axis=0),
+                                                       1e-300)
+        Xg -= good*(xm + slope*(idx - sm))
+    elif detrend is not False:
+        raise ValueError("Unknown detrend {!r}.".format(detrend))
+
+    W = masked_windows(start, stop, n, window)
+
+    f = np.fft.rfftfreq(n, 1./fs)
+    P = np.abs(np.fft.rfft(W*Xg, axis=0))**2
+
+    if scaling == 'density':
+        norm = fs*np.sum(W**2, axis=0)
+    elif scaling == 'spectrum':
+        norm = np.sum(W, axis=0)**2
+    else:
+        raise ValueError("Unknown scaling {!r}.".format(scaling))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        P /= norm
+
+    # Everything but the mean and, for even lengths, the Nyquist frequency
+    # gets the power of the negative frequencies.
+    if n % 2 == 0:
+        P[1:-1] *= 2.
+    else:
+        P[1:] *= 2.
+
+    P[:, short] = np.nan
+
+    return f, P
+
+
+def get_spectra(Float, hpids, x, coord, var, window='hann',
+                detrend='constant', scaling='density', min_length=2,
+                quantiles=None):
+    """
+    Spectra of a variable of many profiles of a float.
+
+    Parameters
+    ----------
+    Float : EMApexFloat
+        Float.
+    hpids : array_like
+        Half profile numbers.
+    x : 1D array
+        Regularly spaced values of coord to interpolate to, as for
+        Float.get_interp_grid.
+    coord : str
+        Coordinate, e.g. 'dUTC' or 'z'.
+    var : str
+        Variable, e.g. 'P' or 'Ww'.
+    window, detrend, scaling, min_length : optional
+        See grid_spectra.
+    quantiles : float or sequence of floats, optional
+        Percentiles (0 to 100) across profiles to also return, e.g. 50 for
+        the median. Profiles without a spectrum are ignored.
+
+    Returns
+    -------
+    f : 1D array
+        Frequencies, cycles per unit of coord.
+    P : 2D array
+        Spectra, (len(f), n_profiles).
+    Pq : ndarray, only if quantiles is given
+        Percentiles of the spectra, (len(f),) for a single percentile or
+        (len(quantiles), len(f)).
+
+    """
+    x = np.asarray(x, dtype=float)
+    __, __, X = Float.get_interp_grid(hpids, x, coord, var)
+
+    f, P = grid_spectra(X, 1./(x[1] - x[0]), window, detrend, scaling,
+                        min_length)
+
+    if quantiles is None:
+        return f, P
+
+    if np.isnan(P[0]).all():
+        Pq = np.full(np.shape(quantiles) + f.shape, np.nan)
+    else:
+        Pq = np.nanpercentile(P, quantiles, axis=1)
+
+    return f, P, Pq
+
+
+def _lagrange_weights(x, order, n):
+    """
+    Indices and weights of Lagrange interpolation of the given order at
+    fractional grid positions x, on a grid of n points.
+
+    Returns
+    -------
+    idx : int array
+        Grid points, x.shape + (order,).
+    w : array
+        Weights, x.shape + (order,).
+
+    """
+    x = np.asarray(x, dtype=float)
+    ilo = np.floor(x).astype(int) - (order - 1)//2
+    ilo = np.clip(ilo, 0, n - order)
+    idx = ilo[..., np.newaxis] + np.arange(order)
+    d = x[..., np.newaxis] - idx
+
+    w = np.ones(idx.shape)
+    for j in range(order):
+        for l in range(order):
+            if l != j:
+                w[..., j] *= d[..., l]/(j - l)
+
+    return idx, w
+
+
+def lombscargle(ts, ys, freqs, precenter=False, oversampling=8, order=8):
+    """
+    Lomb-Scargle periodograms of a ragged batch of unevenly sampled series.
+
+    Fast method of Press and Rybicki (1989). Each series is extirpolated
+    onto a regular grid (the data spread to its nearest grid points with
+    Lagrange weights) and the trigonometric sums of the periodogram for all
+    series are computed by one FFT on a uniform frequency grid, oversampled
+    relative to the longest series. The sums are then interpolated to the
+    requested frequencies, which need not be uniform. The cost is
+    O(N log N) rather than O(N_samples N_freqs) per series. Frequencies at
+    which a series spans less than LOW_OMEGA_T radians are summed directly,
+    since the periodogram there is too sensitive to errors in the sums.
+
+    The result is the classical unnormalised periodogram of
+    sp.signal.lombscargle(t, y, freqs) for each series.
+
+    Parameters
+    ----------
+    ts : list of 1D arrays
+        Sample times of each series.
+    ys : list of 1D arrays
+        Values of each series, matching ts.
+    freqs : 1D array
+        Angular frequencies.
+    precenter : bool, optional
+        Subtract the mean of each series first.
+    oversampling : int, optional
+        Oversampling of the internal frequency grid. Higher is more accurate.
+    order : int, optional
+        Number of grid points used in extirpolation and in interpolation
+        between frequencies. Higher is more accurate. With the defaults the
+        error is within 1e-4 of the peak power of each series. Doubling the
+        oversampling or raising the order by two gains about an order of
+        magnitude each, down to about 1e-9 at oversampling=16, order=12.
+        Memory and time grow in proportion to the oversampling.
+
+    Returns
+    -------
+    pgram : 2D array
+        Periodograms, (len(freqs), len(ts)). Series with fewer than two
+        samples are NaN.
+
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    nseries = len(ts)
+
+    ts = [np.asarray(t, dtype=float) for t in ts]
+    ys = [np.asarray(y, dtype=float) for y in ys]
+    ns = np.array([t.size for t in ts])
+    ok = ns > 1
+
+    if not ok.any():
+        return np.full((freqs.size, nseries), np.nan)
+
+    spans = np.array([np.ptp(t) if t.size > 1 else 0. for t in ts])
+    T = max(spans.max(), 1e-300)
+
+    # Uniform frequency grid in cycles, df apart, up to twice the highest
+    # frequency requested since the sums are needed at 2 omega too. The FFT
+    # is four times as long again, putting the top of the grid at or below a
+    # quarter of its Nyquist frequency. With only a factor of two the error
+    # of extirpolation near the top of the grid stops improving with order
+    # at about 1e-5 of the peak power. The regular time grid is then
+    # 1/(nfft df) apart and the series occupy at most the first
+    # 1/oversampling of it.
+    df = 1./(oversampling*T)
+    fmax = 2.*freqs.max()/(2.*np.pi)
+    nf = int(np.ceil(fmax/df)) + order + 1
+    nfft = 2**int(np.ceil(np.log2(max(8*nf, oversampling*order))))
+    dt = 1./(nfft*df)
+
+    # Extirpolate the data and ones of every series onto its own row of the
+    # grid, all series at once.
+    use = np.flatnonzero(ok)
+    x = np.hstack([(ts[i] - ts[i].min())/dt for i in use])
+    y = np.hstack([ys[i] - np.mean(ys[i]) if precenter else ys[i]
+                   for i in use])
+    row = np.repeat(use, ns[use])
+    idx, w = _lagrange_weights(x, order, nfft)
+    idx += (row*nfft)[:, np.newaxis]
+    grids = np.vstack((np.bincount(idx.ravel(), (w*y[:, np.newaxis]).ravel(),
+                                   nseries*nfft),
+                       np.bincount(idx.ravel(), w.ravel(), nseries*nfft)))
+
+    # Sum of g exp(2 pi i f_k t_j) for all series and grid frequencies.
+    sums = np.conj(np.fft.rfft(grids.reshape(2, nseries, nfft), axis=-1))
+    sums = sums[..., :nf]
+
+    # Interpolate the sums to the requested frequencies, those of the data
+    # at omega and those of the ones at 2 omega.
+    fidx, fw = _lagrange_weights(freqs/(2.*np.pi*df), order, nf)
+    Sy = np.sum(sums[0][:, fidx]*fw, axis=-1)
+    fidx, fw = _lagrange_weights(2.*freqs/(2.*np.pi*df), order, nf)
+    S1 = np.sum(sums[1][:, fidx]*fw, axis=-1)
+
+    # Where a series spans a small fraction of a period N - hypo below is
+    # about N (omega T)**2/6, so the interpolation error of the sums is
+    # amplified by 6/(omega T)**2. The few frequencies concerned are summed
+    # directly.
+    for i, j in zip(use, np.cumsum(ns[use]) - ns[use]):
+        low = np.flatnonzero(freqs*spans[i] < LOW_OMEGA_T)
+        if low.size == 0:
+            continue
+        wt = np.outer(freqs[low], x[j:j + ns[i]]*dt)
+        Sy[i, low] = np.exp(1j*wt).dot(y[j:j + ns[i]])
+        S1[i, low] = np.exp(2j*wt).sum(axis=1)
+
+    Ch, Sh = Sy.real, Sy.imag
+    C2, S2 = S1.real, S1.imag
+    N = ns[:, np.newaxis].astype(float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hypo = np.sqrt(C2**2 + S2**2)
+        cos2wt = np.where(hypo > 0., C2/hypo, 1.)
+        coswt = np.sqrt(0.5*(1. + cos2wt))
+        sinwt = np.copysign(np.sqrt(0.5*(1. - cos2wt)), S2)
+        YC = Ch*coswt + Sh*sinwt
+        YS = Sh*coswt - Ch*sinwt
+        pgram = 0.5*(YC**2/(0.5*(N + hypo)) + YS**2/(0.5*(N - hypo)))
+
+    pgram[~ok] = np.nan
+
+    return pgram.T
@@ -0,0 +1,717 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:40:05 2026
+
+@author: jc3e13
+
+Steady flight model of an EM-APEX float in still water with analytic
+derivatives, and a fitter that uses them.
+
+In steady flight buoyancy balances quadratic drag,
+
+    g*(V - M/rho) = CA*w*|w|,
+
+    V = V_0*(1 - alpha_p*(p - p_0) + alpha_ppos*(ppos - ppos_0)),
+
+so w = sign(s)*sqrt(|s|) with s = g*(V - M/rho)/CA. The parameters follow
+the ordering of vertical_velocity_fitter:
+
+    profiles='all':    V_0, CA, alpha_p, p_0, alpha_ppos, ppos_0, M
+    profiles='updown': V_0, CA_up, CA_down, alpha_p, p_0, alpha_ppos, ppos_0, M
+
+and a fixed list of the same length holds values for fixed parameters and
+None for free ones. Model functions take (params, data, fixed) where data is
+[ppos, P, rho] or, for 'updown', [ppos, P, rho, hpid]. Ascending profiles have
+even hpid.
+
+Because every residual has an analytic gradient the fit can use a
+trust-region least squares solver, which converges in tens of iterations
+rather than the thousands of simplex steps Nelder-Mead needs.
+
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import scipy.optimize as opt
+
+
+G = 9.8  # Gravitational acceleration [m s-2].
+
+# Floor on |s| in the derivative of sqrt(|s|), which is singular at s = 0.
+S_MIN = 1e-12
+
+PARAM_NAMES = {
+    'all': ['V_0', 'CA', 'alpha_p', 'p_0', 'alpha_ppos', 'ppos_0', 'M'],
+    'updown': ['V_0', 'CA_up', 'CA_down', 'alpha_p', 'p_0', 'alpha_ppos',
+               'ppos_0', 'M'],
+    }
+
+DATA_NAMES = {
+    'all': ['ppos', 'P', 'rho'],
+    'updown': ['ppos', 'P', 'rho', 'hpid'],
+    }
+
+# Methods of scipy.optimize.minimize that cannot use a gradient.
+GRADIENT_FREE = ['Nelder-Mead', 'Powell']
+LEAST_SQUARES = ['trf', 'dogbox', 'lm']
+
+
+def apply_fixed(params, fixed):
+    """Copy of params with fixed values substituted."""
+    params = np.array(params, dtype=float)
+    if fixed is not None:
+        for i, val in enumerate(fixed):
+            if val is not None:
+                params[i] = val
+    return params
+
+
+def free_idxs(fixed):
+    """Indices of the free parameters."""
+    return np.array([i for i, val in enumerate(fixed) if val is None],
+                    dtype=int)
+
+
+def _model_ud(params, ppos, p, rho, up, ret_jac=False):
+    """Still water velocity and, optionally, its derivatives with respect to
+    the eight 'updown' parameters stacked along the last axis."""
+    V_0, CA_up, CA_down, alpha_p, p_0, alpha_ppos, ppos_0, M = params
+
+    CA = np.where(up, CA_up, CA_down)
+    vol = 1. - alpha_p*(p - p_0) + alpha_ppos*(ppos - ppos_0)
+    s = G*(V_0*vol - M/rho)/CA
+    w = np.sign(s)*np.sqrt(np.abs(s))
+
+    if not ret_jac:
+        return w
+
+    dwds = 0.5/np.sqrt(np.maximum(np.abs(s), S_MIN))
+    gV_0CA = G*V_0/CA
+    dsdCA = -s/CA
+
+    dsdp = [G*vol/CA,  # V_0
+            np.where(up, dsdCA, 0.),  # CA_up
+            np.where(up, 0., dsdCA),  # CA_down
+            -gV_0CA*(p - p_0),  # alpha_p
+            gV_0CA*alpha_p,  # p_0
+            gV_0CA*(ppos - ppos_0),  # alpha_ppos
+            -gV_0CA*alpha_ppos,  # ppos_0
+            -G/(rho*CA)]  # M
+
+    shape = np.shape(w)
+    jac = np.stack([dwds*np.broadcast_to(d, shape) for d in dsdp], axis=-1)
+
+    return w, jac
+
+
+def _all_to_ud(params):
+    return np.insert(params, 2, params[1])
+
+
+def still_water_model(params, data, fixed=None):
+    """Still water float velocity with a single drag coefficient."""
+    ppos, p, rho = data[:3]
+    params = _all_to_ud(apply_fixed(params, fixed))
+    return _model_ud(params, ppos, p, rho, True)
+
+
+def still_water_jac(params, data, fixed=None):
+    """Derivatives of still_water_model with respect to each parameter,
+    stacked along the last axis. Columns of fixed parameters are zero."""
+    ppos, p, rho = data[:3]
+    params_ud = _all_to_ud(apply_fixed(params, fixed))
+    __, jac = _model_ud(params_ud, ppos, p, rho, True, ret_jac=True)
+    # CA_up and CA_down are the same parameter.
+    jac = np.delete(jac, 2, axis=-1)
+    if fixed is not None:
+        jac[..., [i for i, val in enumerate(fixed) if val is not None]] = 0.
+    return jac
+
+
+def still_water_model_ud(params, data, fixed=None):
+    """Still water float velocity with different drag coefficients for
+    ascending and descending profiles."""
+    ppos, p, rho, hpid = data
+    params = apply_fixed(params, fixed)
+    return _model_ud(params, ppos, p, rho, hpid % 2 == 0)
+
+
+def still_water_jac_ud(params, data, fixed=None):
+    """Derivatives of still_water_model_ud, see still_water_jac."""
+    ppos, p, rho, hpid = data
+    params = apply_fixed(params, fixed)
+    __, jac = _model_ud(params, ppos, p, rho, hpid % 2 == 0, ret_jac=True)
+    if fixed is not None:
+        jac[..., [i for i, val in enumerate(fixed) if val is not None]] = 0.
+    return jac
+
+
+MODELS = {
+    'all': (still_water_model, still_water_jac),
+    'updown': (still_water_model_ud, still_water_jac_ud),
+    }
+
+
+def get_fit_data(Float, hpids=None, profiles='all', Plims=(60., 1500.)):
+    """
+    Gather the samples used in the fit.
+
+    Returns
+    -------
+    data : list of 1D arrays
+        Model data (see DATA_NAMES) for every usable sample, grouped by
+        profile.
+    Wz : 1D array
+        Float vertical velocity of every usable sample.
+    pidx : 1D array
+        Index of the profile (0 to number of profiles - 1) of every sample,
+        used for bootstrapping by profile.
+    hpids : 1D array
+        Half profile numbers.
+
+    """
+    if hpids is None:
+        hpids = Float.hpid
+
+    __, idxs = Float.get_profiles(hpids, ret_idxs=True)
+    hpids = Float.hpid[idxs]
+
+    P = Float.P[:, idxs]
+    fields = {'ppos': Float.ppos[:, idxs], 'P': P, 'rho': Float.rho[:, idxs],
+              'hpid': np.broadcast_to(hpids, P.shape)}
+    Wz = Float.Wz[:, idxs]
+    pidx = np.broadcast_to(np.arange(len(idxs)), P.shape)
+
+    use = (P > Plims[0]) & (P < Plims[1]) & np.isfinite(Wz)
+    for name in DATA_NAMES[profiles]:
+        use &= np.isfinite(fields[name])
+
+    # Transposing before masking keeps samples grouped by profile.
+    data = [np.asarray(fields[name]).T[use.T] for name in DATA_NAMES[profiles]]
+
+    return data, np.asarray(Wz).T[use.T], pidx.T[use.T], hpids
+
+
+def fit(p0, fixed, data, Wz, profiles='all', method='trf', **kwargs):
+    """
+    Fit the still water model to float velocity.
+
+    Parameters
+    ----------
+    p0 : array_like
+        Initial parameters, including those that are fixed.
+    fixed : list
+        Fixed values, None for free parameters.
+    data : list of arrays
+        Model data, see DATA_NAMES.
+    Wz : array
+        Float vertical velocity.
+    profiles : {'all', 'updown'}, optional
+        Model variant.
+    method : str, optional
+        'trf', 'dogbox' or 'lm' use scipy.optimize.least_squares with the
+        analytic Jacobian of the residuals. Anything else is passed to
+        scipy.optimize.minimize with the analytic gradient of the cost, unless
+        the method is gradient free (e.g. 'Nelder-Mead').
+    kwargs
+        Passed to the optimiser.
+
+    Returns
+    -------
+    p : array
+        Best fit parameters, including those that are fixed.
+    res : OptimizeResult
+
+    """
+    model, model_jac = MODELS[profiles]
+
+    p0 = apply_fixed(p0, fixed)
+    free = free_idxs(fixed)
+
+    def params(x):
+        p = p0.copy()
+        p[free] = x
+        return p
+
+    def residuals(x):
+        return Wz - model(params(x), data, fixed)
+
+    def residuals_jac(x):
+        return -model_jac(params(x), data, fixed)[:, free]
+
+    if method in LEAST_SQUARES:
+        # Parameters range over ten orders of magnitude, scaling by the
+        # Jacobian keeps the trust region sensible.
+        kwargs.setdefault('x_scale', 'jac')
+        res = opt.least_squares(residuals, p0[free], jac=residuals_jac,
+                                method=method, **kwargs)
+    else:
+        def cost(x):
+            r = residuals(x)
+            return 0.5*np.sum(r**2)
+
+        def cost_grad(x):
+            return residuals_jac(x).T.dot(residuals(x))
+
+        jac = None if method in GRADIENT_FREE else cost_grad
+        res = opt.minimize(cost, p0[free], jac=jac, method=method, **kwargs)
+
+    return params(res.x), res
+
+
+def bootstrap_idxs(pidx, rng):
+    """Sample indices for one bootstrap replicate, resampling whole profiles
+    with replacement. pidx must be grouped by profile."""
+    Npfl = pidx.max() + 1
+    starts = np.searchsorted(pidx, np.arange(Npfl), side='left')
+    ends = np.searchsorted(pidx, np.arange(Npfl), side='right')
+    chosen = rng.randint(0, Npfl, Npfl)
+    return np.hstack([np.arange(starts[i], ends[i]) for i in chosen])
+
+
+# Fit data of the bootstrap in progress. Worker processes fill this from read
+# only memory maps so the arrays are shared through the page cache rather than
+# pickled to every worker.
+_shared = {}
+
+
+def _share_arrays(arrays, dirpath):
+    """Save arrays to dirpath so that workers can memory map them."""
+    for name, arr in arrays.items():
+        np.save(os.path.join(dirpath, name + '.npy'), arr)
+
+
+def _init_bootstrap_worker(dirpath, names):
+    _shared.clear()
+    for name in names:
+        _shared[name] = np.load(os.path.join(dirpath, name + '.npy'),
+                                mmap_mode='r')
+
+
+def _bootstrap_replicate(args):
+    """Refit one bootstrap replicate using the data in _shared."""
+    seed, p, pfixed, profiles, method, kwargs = args
+    Ndata = len(DATA_NAMES[profiles])
+    data = [_shared['data{}'.format(j)] for j in range(Ndata)]
+
+    bidxs = bootstrap_idxs(_shared['pidx'], np.random.RandomState(seed))
+    bdata = [d[bidxs] for d in data]
+    pb, __ = fit(p, pfixed, bdata, _shared['Wz'][bidxs], profiles, method,
+                 **kwargs)
+
+    return pb
+
+
+def bootstrap(p, pfixed, data, Wz, pidx, seeds, profiles='all', method='trf',
+              processes=1, **kwargs):
+    """
+    Refit the model to profile resampled data, one replicate per seed.
+
+    Every replicate draws its resample from its own seed, so the result does
+    not depend on the number of processes or the order replicates finish.
+
+    Parameters
+    ----------
+    p : array
+        Best fit parameters, the starting point of every refit.
+    pfixed : list
+        Fixed values, None for free parameters.
+    data, Wz, pidx : arrays
+        Fit data, see get_fit_data.
+    seeds : array of int
+        Seed of each replicate.
+    profiles, method, kwargs
+        See fit.
+    processes : int, optional
+        Number of worker processes. 1 runs in this process.
+
+    Returns
+    -------
+    ps : array
+        Parameters of every replicate, (len(seeds), len(p)).
+
+    """
+    arrays = {'data{}'.format(j): d for j, d in enumerate(data)}
+    arrays['Wz'] = Wz
+    arrays['pidx'] = pidx
+
+    tasks = [(s, p, pfixed, profiles, method, kwargs) for s in seeds]
+
+    if processes == 1 or len(seeds) < 2:
+        _shared.clear()
+        _shared.update(arrays)
+        try:
+            ps = [_bootstrap_replicate(task) for task in tasks]
+        finally:
+            _shared.clear()
+        return np.reshape(ps, (len(seeds), len(p)))
+
+    dirpath = tempfile.mkdtemp(prefix='bootstrap_')
+    try:
+        _share_arrays(arrays, dirpath)
+        pool = mp.Pool(processes, initializer=_init_bootstrap_worker,
+                       initargs=(dirpath, list(arrays.keys())))
+        try:
+            # map preserves task order.
+            ps = pool.map(_bootstrap_replicate, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shutil.rmtree(dirpath, ignore_errors=True)
+
+    return np.reshape(ps, (len(seeds), len(p)))
+
+
+def profile_stats(p, pfixed, data, Wz, pidx, hpids, profiles='all'):
+    """
+    Contribution of every profile to the least squares problem at p.
+
+    The sums of these over any set of profiles give the cost, gradient and
+    Gauss-Newton approximation of the Hessian for that set, so profiles can
+    be added to or removed from a fit without touching the others.
+
+    Returns
+    -------
+    stats : dict
+        'hpids', 'n' samples, 'rr' sum of squared residuals, 'Jtr' and 'JtJ'
+        where J is the Jacobian of the residuals with respect to the free
+        parameters 'free'.
+
+    """
+    model, model_jac = MODELS[profiles]
+    free = free_idxs(pfixed)
+    Npfl = len(hpids)
+    Nfree = len(free)
+
+    r = Wz - model(p, data, pfixed)
+    J = -model_jac(p, data, pfixed)[:, free]
+
+    Jtr = np.empty((Npfl, Nfree))
+    JtJ = np.empty((Npfl, Nfree, Nfree))
+    for i in range(Nfree):
+        Jtr[:, i] = np.bincount(pidx, J[:, i]*r, minlength=Npfl)
+        for j in range(i, Nfree):
+            JtJ[:, i, j] = np.bincount(pidx, J[:, i]*J[:, j], minlength=Npfl)
+            JtJ[:, j, i] = JtJ[:, i, j]
+
+    return {'hpids': np.asarray(hpids), 'free': free,
+            'n': np.bincount(pidx, minlength=Npfl),
+            'rr': np.bincount(pidx, r**2, minlength=Npfl),
+            'Jtr': Jtr, 'JtJ': JtJ}
+
+
+class FitInfo(dict):
+    """
+    Fit info. A dictionary whose items can also be read and set as
+    attributes, e.g. wfi['pmean'] or wfi.pmean, like the fit info of
+    vertical_velocity_fitter.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def _fit_info(p0, p, ps, pfixed, profiles, hpids, Plims, method, seeds, data,
+              Wz, pidx):
+    model, model_jac = MODELS[profiles]
+    stats = profile_stats(p, pfixed, data, Wz, pidx, hpids, profiles)
+
+    wfi = FitInfo({
+        'model_func': model,
+        'jac_func': model_jac,
+        'param_names': PARAM_NAMES[profiles],
+        'data_names': DATA_NAMES[profiles],
+        'p0': np.asarray(p0, dtype=float),
+        'p': p,
+        'ps': ps,
+        'pmean': np.mean(ps, axis=0) if len(ps) > 0 else p,
+        'pfixed': pfixed,
+        # Older readers (vertical_velocity_error_analysis) use 'fixed'.
+        'fixed': pfixed,
+        'profiles': profiles,
+        'hpids': np.asarray(hpids),
+        'Plims': Plims,
+        'method': method,
+        'seeds': seeds,
+        'cost': np.sum(stats['rr']),
+        'profile_stats': stats,
+        })
+
+    return wfi
+
+
+def fitter(Float, p0, pfixed, profiles='all', hpids=None, Plims=(60., 1500.),
+           N_bootstrap=200, method='trf', save_name=None, seed=None,
+           processes=1, verbose=True, **kwargs):
+    """
+    Fit the still water model to a float and bootstrap the parameters by
+    resampling profiles. Equivalent to vertical_velocity_fitter.fitter but
+    with analytic derivatives.
+
+    Parameters
+    ----------
+    Float : EMApexFloat
+        Float to fit.
+    p0 : array_like
+        Initial parameters.
+    pfixed : list
+        Fixed values, None for free parameters.
+    profiles : {'all', 'updown'}, optional
+        Use a single drag coefficient or separate up and down coefficients.
+    hpids : array_like, optional
+        Half profiles to fit, default all.
+    Plims : tuple, optional
+        Pressure range of samples used in the fit.
+    N_bootstrap : int, optional
+        Number of bootstrap replicates.
+    method : str, optional
+        See fit.
+    save_name : str, optional
+        Pickle the fit info to this file.
+    seed : int, optional
+        Seed for the bootstrap resampling, from which a seed for every
+        replicate is drawn.
+    processes : int, optional
+        Number of processes to run the bootstrap on, None for all cores.
+        Results are identical to a serial run.
+    verbose : bool, optional
+        Print progress.
+    kwargs
+        Passed to the optimiser.
+
+    Returns
+    -------
+    wfi : FitInfo
+        Fit info with the keys of vertical_velocity_fitter. 'p0' is the
+        initial guess, 'pfixed' the fixed values, 'p' the best fit, 'ps' the
+        bootstrap replicates, 'pmean' their mean and 'model_func' the
+        model.
+
+    """
+    model, model_jac = MODELS[profiles]
+    data, Wz, pidx, hpids = get_fit_data(Float, hpids, profiles, Plims)
+
+    if verbose:
+        print("Fitting {} samples from {} profiles.".format(Wz.size,
+                                                            len(hpids)))
+
+    p, res = fit(p0, pfixed, data, Wz, profiles, method, **kwargs)
+
+    if verbose:
+        print("Best fit after {} function evaluations: {}".format(res.nfev, p))
+
+    if processes is None:
+        processes = mp.cpu_count()
+
+    seeds = np.random.RandomState(seed).randint(0, 2**31 - 1, N_bootstrap)
+
+    if verbose and N_bootstrap > 0:
+        print("Bootstrapping {} replicates on {} processes."
+              .format(N_bootstrap, processes))
+
+    ps = bootstrap(p, pfixed, data, Wz, pidx, seeds, profiles, method,
+                   processes, **kwargs)
+
+    wfi = _fit_info(p0, p, ps, pfixed, profiles, hpids, Plims, method, seeds,
+                    data, Wz, pidx)
+
+    if save_name is not None:
+        with open(save_name, 'wb') as f:
+            pickle.dump(wfi, f)
+
+    return wfi
+
+
+def predicted_reduction(stats, idxs=None):
+    """
+    Fractional reduction in cost promised by one Gauss-Newton step from the
+    parameters the profile statistics were computed at.
+
+    Close to zero means the current parameters are still (near) optimal for
+    the profiles idxs (default all) and refitting would barely change them.
+    """
+    if idxs is None:
+        idxs = slice(None)
+
+    JtJ = np.sum(stats['JtJ'][idxs], axis=0)
+    Jtr = np.sum(stats['Jtr'][idxs], axis=0)
+    rr = np.sum(stats['rr'][idxs])
+
+    if rr == 0.:
+        return 0.
+
+    # Parameters differ by orders of magnitude so scale before inverting. The
+    # pseudo-inverse copes with degenerate parameter combinations.
+    D = np.sqrt(np.diag(JtJ))
+    D[D == 0.] = 1.
+    A = JtJ/np.outer(D, D)
+    b = Jtr/D
+
+    return b.dot(np.linalg.pinv(A).dot(b))/rr
+
+
+def _merge_stats(stats_list, hpids):
+    """Combine profile statistics, keeping only hpids, sorted by hpid."""
+    merged = {}
+    for key in ['hpids', 'n', 'rr', 'Jtr', 'JtJ']:
+        merged[key] = np.concatenate([s[key] for s in stats_list])
+    merged['free'] = stats_list[0]['free']
+
+    keep = np.isin(merged['hpids'], hpids)
+    __, first = np.unique(merged['hpids'][keep], return_index=True)
+    order = np.flatnonzero(keep)[first]
+    for key in ['hpids', 'n', 'rr', 'Jtr', 'JtJ']:
+        merged[key] = merged[key][order]
+
+    return merged
+
+
+def refit(Float, wfi, hpids=None, refit_rtol=1e-3, N_bootstrap=None,
+          method=None, save_name=None, seed=None, processes=1, force=False,
+          Plims=(60., 1500.), verbose=True, **kwargs):
+    """
+    Update an existing fit when profiles are added (or removed).
+
+    The per profile statistics stored in the fit info are reused, so only
+    profiles that are new to the fit are evaluated. If a Gauss-Newton step
+    from the existing parameters over the combined profiles promises less
+    than refit_rtol fractional reduction in cost, the parameters are kept and
+    only the bookkeeping is updated. Otherwise the model is refitted starting
+    from the existing parameters, with the bootstrap replicates also warm
+    started.
+
+    Profiles already in the fit are assumed unchanged, use force after
+    reprocessing data.
+
+    Fits saved by vertical_velocity_fitter store the fixed parameters as
+    'fixed' and may lack the profiles and pressure limits they used. The
+    profiles are then inferred from the number of parameters and the
+    pressure limits are taken to be the fitter defaults. Pass Plims if the
+    old fit used others. Without the half profiles of the old fit, those
+    requested are treated as its profiles.
+
+    Parameters
+    ----------
+    Float : EMApexFloat
+        Float to fit.
+    wfi : dict or str
+        Existing fit info or the file it is pickled in.
+    hpids : array_like, optional
+        Half profiles the updated fit should use, default all.
+    refit_rtol : float, optional
+        Threshold on the predicted fractional cost reduction above which the
+        model is refitted.
+    N_bootstrap : int, optional
+        Replicates for a refit, default as many as the existing fit.
+    method : str, optional
+        Optimiser, default that of the existing fit.
+    save_name : str, optional
+        Pickle the updated fit info to this file.
+    Plims : tuple, optional
+        Pressure limits of fits that did not record them, default those of
+        fitter.
+    seed, processes, verbose, kwargs
+        See fitter.
+    force : bool, optional
+        Refit regardless of the predicted cost reduction.
+
+    Returns
+    -------
+    wfi : FitInfo
+        Updated fit info, with 'refitted' recording whether the parameters
+        were refitted and 'predicted_reduction' the decision statistic.
+
+    """
+    if isinstance(wfi, str):
+        with open(wfi, 'rb') as f:
+            wfi = pickle.load(f)
+
+    p = wfi['p']
+    pfixed = wfi['pfixed'] if 'pfixed' in wfi else wfi['fixed']
+    profiles = wfi.get('profiles', 'updown' if len(p) == 8 else 'all')
+    Plims = wfi.get('Plims', Plims)
+
+    if method is None:
+        method = wfi.get('method', 'trf')
+    if N_bootstrap is None:
+        N_bootstrap = len(wfi['ps'])
+
+    if hpids is None:
+        hpids = Float.hpid
+    __, idxs = Float.get_profiles(hpids, ret_idxs=True)
+    hpids = Float.hpid[idxs]
+
+    stats = wfi.get('profile_stats')
+    if stats is None or not np.array_equal(stats['free'], free_idxs(pfixed)):
+        # Fit made without statistics (e.g. by vertical_velocity_fitter).
+        data, Wz, pidx, old_hpids = get_fit_data(Float,
+                                                 wfi.get('hpids', hpids),
+                                                 profiles, Plims)
+        stats = profile_stats(p, pfixed, data, Wz, pidx, old_hpids, profiles)
+
+    new_hpids = hpids[~np.isin(hpids, stats['hpids'])]
+    stats_list = [stats]
+
+    if len(new_hpids) > 0:
+        data, Wz, pidx, new_hpids = get_fit_data(Float, new_hpids, profiles,
+                                                 Plims)
+        stats_list.append(profile_stats(p, pfixed, data, Wz, pidx, new_hpids,
+                                        profiles))
+
+    stats = _merge_stats(stats_list, hpids)
+    reduction = predicted_reduction(stats)
+
+    if verbose:
+        print("{} new profiles, predicted fractional cost reduction from "
+              "refitting {:1.2e}.".format(len(new_hpids), reduction))
+
+    if force or reduction > refit_rtol:
+        if verbose:
+            print("Refitting from existing parameters.")
+
+        data, Wz, pidx, hpids = get_fit_data(Float, hpids, profiles, Plims)
+        p, res = fit(p, pfixed, data, Wz, profiles, method, **kwargs)
+
+        if processes is None:
+            processes = mp.cpu_count()
+
+        seeds = np.random.RandomState(seed).randint(0, 2**31 - 1, N_bootstrap)
+        ps = bootstrap(p, pfixed, data, Wz, pidx, seeds, profiles, method,
+                       processes, **kwargs)
+
+        wfi = _fit_info(wfi['p'], p, ps, pfixed, profiles, hpids, Plims,
+                        method, seeds, data, Wz, pidx)
+        wfi['refitted'] = True
+    else:
+        if verbose:
+            print("Keeping existing parameters.")
+
+        wfi = FitInfo(wfi)
+        # Settings in the names of this module, for later updates.
+        wfi['pfixed'] = pfixed
+        wfi['fixed'] = pfixed
+        wfi['profiles'] = profiles
+        wfi['Plims'] = Plims
+        wfi['hpids'] = stats['hpids']
+        wfi['profile_stats'] = stats
+        wfi['cost'] = np.sum(stats['rr'])
+        wfi['refitted'] = False
+
+    wfi['predicted_reduction'] = reduction
+
+    if save_name is not None:
+        with open(save_name, 'wb') as f:
+            pickle.dump(wfi, f)
+
+    return wfi
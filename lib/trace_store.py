@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:04:26 2026
+
+@author: jc3e13
+
+Chunked, compressed and appendable store for MCMC traces.
+
+A trace is a directory holding one data file per variable and a JSON header.
+Samples are appended in chunks, each chunk compressed on its own (bytes are
+shuffled first so the exponents of neighbouring float samples line up, which
+compresses far better). The header lists the byte offset, length and sample
+count of every chunk, so a reader seeks straight to the chunks covering the
+requested samples of the requested variables and never touches the rest.
+Uncompressed stores are read through memory maps.
+
+The header is rewritten atomically after the data of every chunk is on disk,
+so a trace can be read while a sampler is still appending to it and a crash
+loses at most the chunk being written.
+
+    import trace_store as ts
+    with ts.TraceWriter(dirpath, ['X', 'Y'], meta={'hpid': 32}) as tw:
+        tw.append(X=Xs, Y=Ys)
+    M = ts.load(dirpath)
+    X = M.trace('X')[::10]
+
+Reading follows the pymc trace interface, M.trace('X')[:].
+
+"""
+
+import os
+import json
+import zlib
+import shutil
+import collections
+import numpy as np
+
+
+HEADER_NAME = 'header.json'
+STORE_VERSION = 1
+
+
+def _shuffle(a):
+    """Group the bytes of an array by significance."""
+    return np.ascontiguousarray(
+        a.view(np.uint8).reshape(-1, a.dtype.itemsize).T).tobytes()
+
+
+def _unshuffle(buf, dtype):
+    dtype = np.dtype(dtype)
+    b = np.frombuffer(buf, np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(b.T).view(dtype).ravel()
+
+
+def read_header(dirpath):
+    with open(os.path.join(dirpath, HEADER_NAME), 'r') as f:
+        return json.load(f)
+
+
+def _write_header(dirpath, header):
+    tmp_file = os.path.join(dirpath, HEADER_NAME + '.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(header, f, indent=1, sort_keys=True)
+    os.rename(tmp_file, os.path.join(dirpath, HEADER_NAME))
+
+
+def exists(dirpath):
+    """True if dirpath holds a trace."""
+    return os.path.exists(os.path.join(dirpath, HEADER_NAME))
+
+
+class TraceWriter(object):
+    """
+    Append samples to a trace, creating it if necessary.
+
+    Parameters
+    ----------
+    dirpath : str
+        Trace directory.
+    names : list of str
+        Variable names. Ignored when appending to an existing trace.
+    chunk_size : int, optional
+        Samples per chunk. Samples are buffered until a chunk is full.
+    compress : bool, optional
+        Compress chunks. Uncompressed traces can be memory mapped.
+    level : int, optional
+        zlib compression level.
+    dtype : str, optional
+        Sample data type.
+    meta : dict, optional
+        JSON serialisable metadata, e.g. sampler settings and diagnostics.
+        Merged into any existing metadata.
+    overwrite : bool, optional
+        Discard an existing trace instead of appending to it.
+
+    """
+
+    def __init__(self, dirpath, names=None, chunk_size=65536, compress=True,
+                 level=6, dtype='f8', meta=None, overwrite=False):
+        self.dirpath = dirpath
+
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+
+        if exists(dirpath) and not overwrite:
+            self.header = read_header(dirpath)
+            if self.header.get('version') != STORE_VERSION:
+                raise ValueError('Trace {} has an unsupported version.'
+                                 ''.format(dirpath))
+            # Drop bytes of a chunk whose header update never happened.
+            for name, var in self.header['variables'].items():
+                with open(self._data_file(name), 'ab') as f:
+                    f.truncate(var['nbytes'])
+        else:
+            if names is None:
+                raise ValueError('Variable names are needed for a new trace.')
+            self.header = {'version': STORE_VERSION,
+                           'chunk_size': int(chunk_size),
+                           'compress': bool(compress), 'level': int(level),
+                           'meta': {},
+                           'variables': {name: {'dtype': np.dtype(dtype).str,
+                                                'shape': [], 'nsamples': 0,
+                                                'nbytes': 0, 'chunks': []}
+                                         for name in names}}
+            for name in names:
+                open(self._data_file(name), 'wb').close()
+            _write_header(dirpath, self.header)
+
+        if meta is not None:
+            self.update_meta(**meta)
+
+        self.names = sorted(self.header['variables'].keys())
+        self._buffers = {name: [] for name in self.names}
+        self._nbuffered = 0
+
+    def _data_file(self, name):
+        return os.path.join(self.dirpath, name + '.bin')
+
+    def update_meta(self, **meta):
+        """Add or replace metadata entries, written straight away."""
+        self.header['meta'].update(meta)
+        _write_header(self.dirpath, self.header)
+
+    def append(self, samples=None, **kwargs):
+        """
+        Append samples of every variable.
+
+        Parameters
+        ----------
+        samples : dict, optional
+            Arrays keyed by variable name, the first axis indexes samples.
+        kwargs :
+            Alternatively, arrays as keyword arguments.
+
+        """
+        if samples is None:
+            samples = kwargs
+        if set(samples.keys()) != set(self.names):
+            raise ValueError('Samples of every variable must be appended.')
+
+        lengths = set(len(np.atleast_1d(samples[name])) for name in self.names)
+        if len(lengths) != 1:
+            raise ValueError('Variables must have the same number of samples.')
+
+        for name in self.names:
+            self._buffers[name].append(np.atleast_1d(samples[name]))
+        self._nbuffered += lengths.pop()
+
+        while self._nbuffered >= self.header['chunk_size']:
+            self._write_chunk(self.header['chunk_size'])
+
+    def _write_chunk(self, n):
+        for name in self.names:
+            var = self.header['variables'][name]
+            a = np.concatenate(self._buffers[name]).astype(var['dtype'])
+            chunk, rest = a[:n], a[n:]
+            self._buffers[name] = [rest] if len(rest) > 0 else []
+
+            if var['nsamples'] == 0:
+                var['shape'] = list(chunk.shape[1:])
+            elif list(chunk.shape[1:]) != var['shape']:
+                raise ValueError('Samples of {} changed shape.'.format(name))
+
+            if self.header['compress']:
+                buf = zlib.compress(_shuffle(chunk), self.header['level'])
+            else:
+                buf = np.ascontiguousarray(chunk).tobytes()
+
+            with open(self._data_file(name), 'ab') as f:
+                f.write(buf)
+                f.flush()
+                os.fsync(f.fileno())
+
+            var['chunks'].append([var['nbytes'], len(buf), len(chunk)])
+            var['nbytes'] += len(buf)
+            var['nsamples'] += len(chunk)
+
+        self._nbuffered -= n
+        _write_header(self.dirpath, self.header)
+
+    def flush(self):
+        """Write buffered samples as a (possibly short) chunk."""
+        if self._nbuffered > 0:
+            self._write_chunk(self._nbuffered)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceArray(object):
+    """Lazily read samples of one variable, indexed like an array."""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.var = store.header['variables'][name]
+        counts = [c[2] for c in self.var['chunks']]
+        self._starts = np.concatenate(([0], np.cumsum(counts))).astype(int)
+
+    def __len__(self):
+        return self.var['nsamples']
+
+    @property
+    def shape(self):
+        return (len(self),) + tuple(self.var['shape'])
+
+    def _chunk(self, i):
+        return self.store._read_chunk(self.name, i)
+
+    def _read_range(self, start, stop):
+        """Samples start to stop, reading only the chunks covering them."""
+        if stop <= start:
+            return np.empty((0,) + tuple(self.var['shape']),
+                            dtype=self.var['dtype'])
+        i0 = np.searchsorted(self._starts, start, side='right') - 1
+        i1 = np.searchsorted(self._starts, stop, side='left')
+        parts = [self._chunk(i) for i in range(i0, i1)]
+        a = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        offset = self._starts[i0]
+        return a[start - offset:stop - offset]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            i = idx + len(self) if idx < 0 else idx
+            if not 0 <= i < len(self):
+                raise IndexError('Sample index out of range.')
+            return self._read_range(i, i + 1)[0]
+
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step > 0:
+                return self._read_range(start, stop)[::step]
+            # Negative steps, read the span then reverse.
+            a = self._read_range(stop + 1, start + 1)
+            return a[::-1][::-step]
+
+        # Arbitrary integer or boolean indices.
+        idx = np.arange(len(self))[idx]
+        if idx.size == 0:
+            return self._read_range(0, 0)
+        a = self._read_range(np.min(idx), np.max(idx) + 1)
+        return a[idx - np.min(idx)]
+
+    def __array__(self, dtype=None):
+        a = self[:]
+        return a if dtype is None else a.astype(dtype)
+
+
+class TraceStore(object):
+    """
+    Read access to a trace.
+
+    Parameters
+    ----------
+    dirpath : str
+        Trace directory.
+    cache_bytes : int, optional
+        Decoded chunks are kept in a least recently used cache of about this
+        size, so repeated indexing does not decompress again.
+
+    """
+
+    def __init__(self, dirpath, cache_bytes=256*2**20):
+        self.dirpath = dirpath
+        self.header = read_header(dirpath)
+        if self.header.get('version') != STORE_VERSION:
+            raise ValueError('Trace {} has an unsupported version.'
+                             ''.format(dirpath))
+        self.meta = self.header['meta']
+        self.names = sorted(self.header['variables'].keys())
+        self.cache_bytes = cache_bytes
+        self._cache = collections.OrderedDict()
+        self._cached_bytes = 0
+
+    def __len__(self):
+        return min(var['nsamples'] for var in
+                   self.header['variables'].values())
+
+    def trace(self, name):
+        return TraceArray(self, name)
+
+    def samples(self, names, idx=slice(None)):
+        """Samples of several variables as columns of one array."""
+        return np.column_stack([self.trace(name)[idx] for name in names])
+
+    def _read_chunk(self, name, i):
+        key = (name, i)
+        if key in self._cache:
+            self._cache[key] = self._cache.pop(key)
+            return self._cache[key]
+
+        var = self.header['variables'][name]
+        offset, nbytes, count = var['chunks'][i]
+        shape = (count,) + tuple(var['shape'])
+        fname = os.path.join(self.dirpath, name + '.bin')
+
+        if self.header['compress']:
+            with open(fname, 'rb') as f:
+                f.seek(offset)
+                buf = zlib.decompress(f.read(nbytes))
+            a = _unshuffle(buf, var['dtype']).reshape(shape)
+        else:
+            a = np.memmap(fname, dtype=var['dtype'], mode='r', offset=offset,
+                          shape=shape)
+
+        a.flags.writeable = False
+        self._cache[key] = a
+        self._cached_bytes += a.nbytes
+        while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+            __, old = self._cache.popitem(last=False)
+            self._cached_bytes -= old.nbytes
+
+        return a
+
+
+def load(dirpath, cache_bytes=256*2**20):
+    """Open a trace for reading."""
+    return TraceStore(dirpath, cache_bytes)
+
+
+def save(dirpath, traces, meta=None, chunk_size=65536, compress=True):
+    """
+    Write a dictionary of whole traces, replacing any existing trace. The
+    trace is written next to dirpath and moved into place when complete.
+
+    Parameters
+    ----------
+    dirpath : str
+        Trace directory.
+    traces : dict
+        Arrays of samples keyed by variable name.
+    meta : dict, optional
+        JSON serialisable metadata.
+
+    """
+    dirpath = os.path.normpath(dirpath)
+    tmp_dir = dirpath + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+
+    with TraceWriter(tmp_dir, list(traces.keys()), chunk_size=chunk_size,
+                     compress=compress, meta=meta) as tw:
+        tw.append(traces)
+
+    if os.path.exists(dirpath):
+        shutil.rmtree(dirpath)
+    os.rename(tmp_dir, dirpath)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:02:18 2026
+
+@author: jc3e13
+
+Persistent cache and interpolating surrogate for modelled float
+trajectories.
+
+float_advection_routines.model_verbose integrates a float through a wave for
+every set of wave parameters, which makes searches over thousands of
+parameter sets slow and repeats work every time a script is rerun. ModelCache
+stores each output on disk under a hash of the arguments and of the params
+dictionary (including the code of functions such as Ufunc), so the same
+trajectory is only ever integrated once. It is safe to share between the
+processes of a grid search.
+
+ProfileSurrogate goes further for cost functions that only need the modelled
+u, v, w and b interpolated to fixed depths. The profiles are computed once
+on a grid of wave parameters for a given params configuration (z_0, N, U...)
+and are then interpolated for any parameter set, a whole batch at a time.
+
+    import trajectory_cache as tc
+    mc = tc.ModelCache()
+    X = mc(LX, LY, LZ, Phase, params=params)
+    sur = tc.surrogate([Xs, Ys, Zs, Phases], zf, params, cache=mc,
+                       periodic=[False, False, False, True])
+    u, v, w, b = sur(ps)
+
+"""
+
+import os
+import pickle
+import hashlib
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+import float_advection_routines as far
+import grid_search as gs
+
+
+CACHE_DIR = '/noc/users/jc3e13/storage/trajectory_cache'
+
+
+def _code(code, seen):
+    """Bytecode, constants and referenced names of a code object, including
+    those of nested functions."""
+    consts = [_code(c, seen) if hasattr(c, 'co_code') else _canonical(c, seen)
+              for c in code.co_consts]
+    return (code.co_code + b'(' + b','.join(consts) + b')' +
+            repr(code.co_names).encode())
+
+
+def _function(func, seen):
+    """Functions are identified by where they are defined, their code and
+    the values they were created with (defaults and closed over variables),
+    not by their address, so the key survives restarts."""
+    if id(func) in seen:
+        # A function referring to itself through its closure.
+        return b'func-recursive'
+    seen = seen | {id(func)}
+    name = getattr(func, '__qualname__', getattr(func, '__name__', ''))
+    cells = []
+    for cell in getattr(func, '__closure__', None) or ():
+        try:
+            cells.append(_canonical(cell.cell_contents, seen))
+        except ValueError:
+            # Cell not yet assigned.
+            cells.append(b'empty')
+    return (b'func' + repr(getattr(func, '__module__', '')).encode() +
+            name.encode() + _code(func.__code__, seen) +
+            _canonical(getattr(func, '__defaults__', None), seen) +
+            _canonical(getattr(func, '__kwdefaults__', None), seen) +
+            b'(' + b','.join(cells) + b')')
+
+
+def _canonical(obj, seen=frozenset()):
+    """Deterministic byte representation of arguments for hashing."""
+    if isinstance(obj, dict):
+        return b'{' + b','.join(_canonical(k, seen) + b':' +
+                                _canonical(obj[k], seen)
+                                for k in sorted(obj.keys(), key=repr)) + b'}'
+    if isinstance(obj, (list, tuple)):
+        return b'(' + b','.join(_canonical(o, seen) for o in obj) + b')'
+    if isinstance(obj, np.ndarray):
+        return (b'array' + obj.dtype.str.encode() + repr(obj.shape).encode() +
+                np.ascontiguousarray(obj).tobytes())
+    if hasattr(obj, '__code__'):
+        return _function(obj, seen)
+    if isinstance(obj, (float, np.floating)):
+        return repr(float(obj)).encode()
+    if isinstance(obj, (int, np.integer)):
+        return repr(int(obj)).encode()
+    return repr(obj).encode()
+
+
+def params_key(args, params):
+    """Hash of model arguments and the params dictionary."""
+    return hashlib.sha1(_canonical(tuple(args)) +
+                        _canonical(params)).hexdigest()
+
+
+class ModelCache(object):
+    """
+    Disk cache of model outputs.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory for the cached outputs, one pickle per call, spread over
+        subdirectories by the first two characters of the key.
+    model_func : function, optional
+        Model called as model_func(*args, params), default
+        far.model_verbose.
+
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, model_func=None):
+        self.cache_dir = cache_dir
+        self.model_func = far.model_verbose if model_func is None else \
+            model_func
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.p')
+
+    def __call__(self, *args, **kwargs):
+        params = kwargs['params']
+        key = params_key(args, params)
+        fname = self.path(key)
+
+        if os.path.exists(fname):
+            try:
+                with open(fname, 'rb') as f:
+                    out = pickle.load(f)
+                self.hits += 1
+                return out
+            except (EOFError, pickle.UnpicklingError):
+                # Truncated by a crash, recompute.
+                pass
+
+        out = self.model_func(*args + (params,))
+        self.misses += 1
+
+        dirpath = os.path.dirname(fname)
+        if not os.path.exists(dirpath):
+            try:
+                os.makedirs(dirpath)
+            except OSError:
+                # Made by another process in the meantime.
+                pass
+
+        # Write then rename so that concurrent readers never see a partial
+        # file.
+        tmp_file = "{}.{}.tmp".format(fname, os.getpid())
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(out, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, fname)
+
+        return out
+
+
+def model_profiles(X, zf, bscale=1.):
+    """Modelled u, v, w and b interpolated to depths zf, shape (4, nz)."""
+    z = X.r[:, 2]
+    return np.vstack((np.interp(zf, z, X.u[:, 0]),
+                      np.interp(zf, z, X.u[:, 1]),
+                      np.interp(zf, z, X.u[:, 2]),
+                      bscale*np.interp(zf, z, X.b)))
+
+
+class ProfileSurrogate(object):
+    """
+    Interpolate model profiles between precomputed wave parameter sets.
+
+    Parameters
+    ----------
+    axes : list of 1D arrays
+        Grid of wave parameters the profiles were computed on.
+    profiles : ndarray
+        Profiles on the grid, shape [len(ax) for ax in axes] + [4, nz].
+    zf : 1D array
+        Depths of the profiles.
+    periodic : list of bool, optional
+        Axes that are periodic with period equal to the axis length plus one
+        spacing (e.g. a phase axis that excludes 2 pi). Periodic axes wrap
+        around rather than being clipped.
+
+    """
+
+    def __init__(self, axes, profiles, zf, periodic=None):
+        self.axes = [np.asarray(ax, dtype=float) for ax in axes]
+        self.zf = np.asarray(zf)
+        self.periodic = [False]*len(axes) if periodic is None else \
+            list(periodic)
+        self.profiles = profiles
+
+        grid_axes = []
+        values = profiles
+        self._periods = []
+        for i, (ax, per) in enumerate(zip(self.axes, self.periodic)):
+            if per:
+                # Append the first slice one period on.
+                period = ax[-1] - ax[0] + (ax[1] - ax[0])
+                ax = np.hstack((ax, ax[0] + period))
+                values = np.concatenate((values, np.take(values, [0], axis=i)),
+                                        axis=i)
+                self._periods.append((ax[0], period))
+            else:
+                self._periods.append(None)
+            grid_axes.append(ax)
+
+        self._interp = RegularGridInterpolator(grid_axes, values,
+                                               bounds_error=False,
+                                               fill_value=np.nan)
+
+    def __call__(self, ps):
+        """
+        Profiles for a batch of parameter vectors.
+
+        Returns
+        -------
+        u, v, w, b : ndarrays
+            Shape (n, nz), NaN outside the grid.
+
+        """
+        ps = np.atleast_2d(np.array(ps, dtype=float))
+        for i, per in enumerate(self._periods):
+            if per is not None:
+                start, period = per
+                ps[:, i] = start + np.mod(ps[:, i] - start, period)
+        out = self._interp(ps)
+        return out[:, 0], out[:, 1], out[:, 2], out[:, 3]
+
+
+def _profile_func(cache, zf, bscale, fixed_args, params):
+    """Batch function returning model profiles, for grid_search."""
+    def func(ps):
+        out = np.empty((len(ps), 4, len(zf)))
+        for i, p in enumerate(ps):
+            X = cache(*(tuple(fixed_args) + tuple(p)), params=params)
+            out[i] = model_profiles(X, zf, bscale)
+        return out
+    return func
+
+
+def surrogate(axes, zf, params, cache=None, fixed_args=(), bscale=1.,
+              periodic=None, processes=1, rebuild=False, verbose=False):
+    """
+    Load or build the profile surrogate for a params configuration.
+
+    Surrogates are themselves cached, keyed by the axes, depths, fixed
+    arguments and params, so each configuration is only ever built once.
+
+    Parameters
+    ----------
+    axes : list of 1D arrays
+        Grid of the varying model arguments.
+    zf : 1D array
+        Depths of the profiles.
+    params : dict
+        Model params, e.g. far.default_params with z_0, N and Ufunc set.
+    cache : ModelCache, optional
+        Cache of model outputs, default ModelCache().
+    fixed_args : tuple, optional
+        Model arguments before the varying ones, e.g. (phi_0,).
+    bscale : float, optional
+        Scale factor applied to b.
+    periodic : list of bool, optional
+        See ProfileSurrogate.
+    processes : int, optional
+        Processes used to build the grid.
+    rebuild : bool, optional
+        Ignore a stored surrogate.
+    verbose : bool, optional
+        Print progress.
+
+    Returns
+    -------
+    sur : ProfileSurrogate
+
+    """
+    if cache is None:
+        cache = ModelCache()
+
+    axes = [np.asarray(ax, dtype=float) for ax in axes]
+    key = params_key([axes, np.asarray(zf, dtype=float), tuple(fixed_args),
+                      bscale, periodic], params)
+    fname = os.path.join(cache.cache_dir, 'surrogates', key + '.p')
+
+    if os.path.exists(fname) and not rebuild:
+        with open(fname, 'rb') as f:
+            return pickle.load(f)
+
+    func = _profile_func(cache, zf, bscale, fixed_args, params)
+    profiles = gs.grid_search(func, axes, chunk_size=16, processes=processes,
+                              verbose=verbose)
+    sur = ProfileSurrogate(axes, profiles, zf, periodic)
+
+    dirpath = os.path.dirname(fname)
+    if not os.path.exists(dirpath):
+        os.makedirs(dirpath)
+    with open(fname + '.tmp', 'wb') as f:
+        pickle.dump(sur, f, pickle.HIGHEST_PROTOCOL)
+    os.rename(fname + '.tmp', fname)
+
+    return sur
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:26:41 2026
+
+@author: jc3e13
+
+Overlapping windows of a profile as 2D arrays.
+
+Bin averages and finescale spectra split a profile into windows of a given
+width and overlap. Rather than a list of (x, y) copies, one per window, the
+windows here are rows of a (n_windows, window_len) array with a mask that is
+False past the end of the data, where the last window is ragged. On a
+regularly spaced x the rows are strided views of the profile, so nothing is
+copied unless a window runs off an end, in which case the profile is copied
+once into a NaN padded buffer. Unevenly spaced profiles are gathered into
+the same layout. Statistics of every window are then single array
+operations.
+
+    import window_views as wv
+    zw, (U, V), mask = wv.window_views(z, [U, V], width=240., overlap=180.)
+    U_mean = wv.window_mean(U, mask)
+
+"""
+
+import numpy as np
+
+
+def window_edges(x, width, overlap=0., x_0=None):
+    """
+    Left edges of windows width wide and width - overlap apart, starting at
+    x_0 (default the first x). Windows start from the first containing any
+    of x and stop at the first reaching past the last x, later windows
+    would only hold the tail of that one. There are none if x_0 is past the
+    last x. x must be increasing.
+    """
+    if overlap >= width:
+        raise ValueError("The overlap must be smaller than the width.")
+    step = width - overlap
+    if x_0 is None:
+        x_0 = x[0]
+    kmin = max(int(np.floor((x[0] - width - x_0)/step)) + 1, 0)
+    kmax = min(int(np.floor((x[-1] - width - x_0)/step)) + 1,
+               int(np.floor((x[-1] - x_0)/step)))
+    return x_0 + step*np.arange(kmin, kmax + 1)
+
+
+def _is_regular(x, rtol):
+    if x.size < 3:
+        return True
+    d = np.diff(x)
+    return np.allclose(d, d[0], rtol=rtol, atol=0.)
+
+
+def _strided(a, starts, npts, step):
+    """Rows of npts points of a at starts, step apart, padding the ends."""
+    n = a.size
+    lo = starts[0]
+    hi = starts[-1] + npts
+    if lo < 0 or hi > n:
+        # One copy of the whole profile, never one per window.
+        buf = np.full(hi - lo, np.nan)
+        buf[max(-lo, 0):min(n, hi) - lo] = a[max(lo, 0):min(n, hi)]
+        a, lo = buf, 0
+    s = a.strides[0]
+    return np.lib.stride_tricks.as_strided(a[lo:], (starts.size, npts),
+                                           (step*s, s), writeable=False)
+
+
+def _gathered(a, idx, mask):
+    out = a[np.minimum(idx, a.size - 1)]
+    out[~mask] = np.nan
+    return out
+
+
+def window_views(x, ys, width, overlap=0., x_0=None, rtol=1e-6):
+    """
+    Split profiles into overlapping windows.
+
+    Window k covers x_0 + k*(width - overlap) <= x < that + width. Windows
+    run from the first containing data to the first reaching past the end
+    of the data, so the first and last may be partly empty.
+
+    Parameters
+    ----------
+    x : 1D array
+        Monotonic coordinate, e.g. height or pressure. Windows run in the
+        direction of increasing x.
+    ys : 1D array or list of 1D arrays
+        Data at x.
+    width : float
+        Window width in units of x.
+    overlap : float, optional
+        Overlap of neighbouring windows, smaller than width.
+    x_0 : float, optional
+        Left edge of the first window, the smallest x by default.
+    rtol : float, optional
+        Relative tolerance on the spacing of x for it to count as regular.
+
+    Returns
+    -------
+    X : 2D array
+        Coordinates of each window, (n_windows, window_len).
+    Ys : 2D array or list of 2D arrays
+        Data of each window.
+    mask : 2D boolean array
+        True where the window has data. Elsewhere X and Ys are NaN.
+
+    Window k holds the points with x_0 + k*(width - overlap) <= x < that +
+    width whatever the spacing of x. When x is regularly spaced and the
+    windows all start a whole number of points apart with the same number
+    of points, X and Ys are read only views, sharing memory with x and ys
+    when no window runs off the data. Otherwise they are copies, as long as
+    the window with the most points. Without windows they are empty.
+
+    """
+    x = np.asarray(x, dtype=float)
+    single = not isinstance(ys, (list, tuple))
+    if single:
+        ys = [ys]
+    ys = [np.asarray(y, dtype=float) for y in ys]
+    for y in ys:
+        if y.shape != x.shape:
+            raise ValueError("Data have shape {}, x has shape {}."
+                             .format(y.shape, x.shape))
+
+    # Reversed arrays are views too.
+    if x.size > 1 and x[-1] < x[0]:
+        x = x[::-1]
+        ys = [y[::-1] for y in ys]
+
+    left = window_edges(x, width, overlap, x_0) if x.size > 0 else x
+    n = x.size
+    regular = n > 1 and _is_regular(x, rtol)
+
+    if regular:
+        # Index of the first point at or past each edge, rounded so that
+        # edges falling on points are not lost to floating point error.
+        # Indices may run off either end of the data.
+        dx = x[1] - x[0]
+        start = np.ceil(np.round((left - x[0])/dx, 6)).astype(int)
+        stop = np.ceil(np.round((left + width - x[0])/dx, 6)).astype(int)
+    else:
+        start = np.searchsorted(x, left, side='left')
+        stop = np.searchsorted(x, left + width, side='left')
+
+    # Rounding can leave an empty window at either end.
+    keep = np.minimum(stop, n) > np.maximum(start, 0)
+    start, stop = start[keep], stop[keep]
+
+    if start.size == 0:
+        empty = np.empty((0, 0))
+        return empty, empty if single else [empty]*len(ys), \
+            np.zeros((0, 0), dtype=bool)
+
+    npts = stop - start
+    step = np.diff(start)
+    if regular and (npts == npts[0]).all() and (step == step[:1]).all():
+        npts = npts[0]
+        step = step[0] if step.size > 0 else 1
+        X = _strided(x, start, npts, step)
+        Ys = [_strided(y, start, npts, step) for y in ys]
+        idx = start[:, np.newaxis] + np.arange(npts)
+        mask = (idx >= 0) & (idx < n)
+    else:
+        start = np.maximum(start, 0)
+        stop = np.minimum(stop, n)
+        idx = start[:, np.newaxis] + np.arange((stop - start).max())
+        mask = idx < stop[:, np.newaxis]
+        X = _gathered(x, idx, mask)
+        Ys = [_gathered(y, idx, mask) for y in ys]
+
+    return X, Ys[0] if single else Ys, mask
+
+
+def window_mean(Y, mask):
+    """Mean of the data in each window, NaN for empty windows."""
+    count = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(mask, Y, 0.).sum(axis=1)/count
+
+
+def window_trapz(Y, X, mask):
+    """Trapezoidal integral of the data in each window over its points."""
+    both = mask[:, 1:] & mask[:, :-1]
+    dX = np.where(both, np.diff(np.where(mask, X, 0.), axis=1), 0.)
+    Ym = np.where(mask, Y, 0.)
+    return np.sum(0.5*(Ym[:, 1:] + Ym[:, :-1])*dX, axis=1)